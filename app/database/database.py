@@ -1,5 +1,8 @@
 import os
-from sqlalchemy import create_engine
+from typing import Dict, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -7,12 +10,115 @@ from dotenv import load_dotenv
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
-
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
+# Same database through an asyncio driver, for endpoints and workers running on the event loop
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or (
+    DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1) if DATABASE_URL.startswith("sqlite://") else DATABASE_URL
 )
+
+# Applied to every new SQLite connection. WAL lets admin reads run while webhook workers write,
+# and the busy timeout makes a writer wait for the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB, i.e. 64 MiB
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+# Sized for Starlette's threadpool (40 threads), so sync endpoints do not queue for a connection
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+
+
+def _engine_args(url: str, pragmas: Dict[str, object], connect_args: Dict[str, object]) -> Dict[str, object]:
+    if not url.startswith("sqlite"):
+        return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW,
+                "pool_timeout": DB_POOL_TIMEOUT, "pool_pre_ping": True}
+    busy_timeout = pragmas.get("busy_timeout")
+    if busy_timeout is not None:
+        connect_args["timeout"] = int(busy_timeout) / 1000
+    args = {"connect_args": connect_args}
+    if url.split("://", 1)[1] not in ("", "/:memory:"):
+        args.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return args
+
+
+def _apply_pragmas_on_connect(sync_engine: Engine, pragmas: Dict[str, object]) -> None:
+    @event.listens_for(sync_engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def create_app_engine(url: str, pragmas: Optional[Dict[str, object]] = None) -> Engine:
+    """Engine for `url`; SQLite connections get `pragmas` (default: SQLITE_PRAGMAS, {} for SQLite's defaults)."""
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+    app_engine = create_engine(url, **_engine_args(url, pragmas, {"check_same_thread": False}))
+    if url.startswith("sqlite"):
+        _apply_pragmas_on_connect(app_engine, pragmas)
+    return app_engine
+
+
+def _begin_immediate(sync_engine: Engine) -> None:
+    """
+    Start every transaction with BEGIN IMMEDIATE. A deferred transaction that reads first and
+    writes later has to upgrade its lock, and if another connection committed in between, the
+    upgrade fails at once with "database is locked" (SQLITE_BUSY_SNAPSHOT) instead of waiting out
+    the busy timeout. IMMEDIATE takes the write lock up front, where the busy timeout applies.
+    """
+    @event.listens_for(sync_engine, "connect")
+    def disable_driver_begin(dbapi_connection, connection_record):
+        # Otherwise the driver emits its own deferred BEGIN before the first write
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(sync_engine, "begin")
+    def begin(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def create_app_async_engine(url: str, pragmas: Optional[Dict[str, object]] = None,
+                            writer: bool = False) -> AsyncEngine:
+    """
+    Async counterpart of create_app_engine(), e.g. for sqlite+aiosqlite:// URLs.
+
+    With `writer`, a SQLite engine has a single connection whose transactions start with
+    BEGIN IMMEDIATE. SQLite has one writer at a time anyway; waiting for this pool is first come,
+    first served, whereas waiting in SQLite's busy handler is polling that can starve a writer
+    past the busy timeout when many coroutines write at once.
+    """
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+    args = _engine_args(url, pragmas, {})
+    if writer and url.startswith("sqlite"):
+        args.update(pool_size=1, max_overflow=0)
+    app_engine = create_async_engine(url, **args)
+    if url.startswith("sqlite"):
+        _apply_pragmas_on_connect(app_engine.sync_engine, pragmas)
+        if writer:
+            _begin_immediate(app_engine.sync_engine)
+    return app_engine
+
+
+engine = create_app_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_app_async_engine(ASYNC_DATABASE_URL)
+# Objects stay readable after commit, since lazy loads are not possible on an AsyncSession
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+# For read-then-write work (webhook enqueue, inbox and outbox claims, ledger writes). On SQLite these
+# transactions take the write lock when they begin, so keep them short and never await other I/O inside one.
+# An in-memory database only exists on its own connection, so it keeps the shared engine.
+async_write_engine = (
+    create_app_async_engine(ASYNC_DATABASE_URL, writer=True)
+    if ASYNC_DATABASE_URL.split("://", 1)[1] not in ("", "/:memory:") else async_engine
+)
+AsyncWriteSessionLocal = async_sessionmaker(async_write_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -21,3 +127,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_write_db():
+    async with AsyncWriteSessionLocal() as db:
+        yield db
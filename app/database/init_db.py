@@ -2,15 +2,18 @@
 
 # Import the engine and Base from your database configuration
 from app.database.database import engine, Base
+from app.database.migrations import migrate
 
 # !!! IMPORTANT: Explicitly import all your models here !!!
 # This ensures that SQLAlchemy's Base object knows about them before creating the tables.
-from app.database.models import Patient, Doctor, Appointment
+from app.database.models import Patient, Doctor, Appointment, ChatMessage, RecommendationCacheEntry, WebhookEvent, ProcessedWebhook, EventTypeMapping, SyncState, EmailOutbox, AppointmentReminder, SchemaMigration
 
 def init_database():
     print("Creating database and tables...")
     # Base.metadata.create_all() will now create all tables for the imported models.
     Base.metadata.create_all(bind=engine)
+    # Brings indexes and columns of tables that already existed up to date
+    migrate(engine)
     print("Database and tables created successfully.")
 
 if __name__ == "__main__":
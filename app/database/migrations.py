@@ -0,0 +1,202 @@
+"""
+Versioned schema migrations.
+
+`Base.metadata.create_all()` creates missing tables but never touches the ones
+that already exist, so indexes and columns added to the models later have to
+reach older databases through here. Each migration runs once, in its own
+transaction, and is recorded in the `schema_migrations` table. New databases
+run them too; they are written to be no-ops when create_all already did the work.
+Every migration names the indexes and columns it creates, rather than reading
+them off the current models, so it does the same thing however the models
+change later.
+
+Several processes may start at once (uvicorn workers, the reminder cron), so
+each step takes a database-wide lock first and re-checks what is already
+applied; the others wait for it and then find nothing left to do.
+
+    python -m app.database.migrations
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator, List, Sequence, Tuple
+
+from sqlalchemy import bindparam, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+from app.database import models
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 5000
+# How long a process waits for another one to finish migrating (a large backfill can take minutes)
+LOCK_TIMEOUT_SECONDS = float(os.getenv("MIGRATION_LOCK_TIMEOUT_SECONDS", "600"))
+MIGRATION_LOCK_KEY = 20230801  # Any constant shared by every process migrating this database
+
+
+def _create_index(connection: Connection, name: str, table: str, columns: Sequence[str]) -> None:
+    connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+
+
+def _query_indexes(connection: Connection) -> None:
+    """Composite indexes for the admin listings, doctor statistics, per-patient view and active-doctor lookups."""
+    _create_index(connection, "ix_appointments_status_appointment_time", "appointments",
+                  ("status", "appointment_time", "appointment_id"))
+    _create_index(connection, "ix_appointments_appointment_time", "appointments", ("appointment_time", "appointment_id"))
+    _create_index(connection, "ix_appointments_patient_id_appointment_time", "appointments",
+                  ("patient_id", "appointment_time"))
+    _create_index(connection, "ix_appointments_doctor_id_status", "appointments", ("doctor_id", "status"))
+    _create_index(connection, "ix_doctors_is_active", "doctors", ("is_active", "doctor_id"))
+    # Gives the query planner row counts for the new indexes
+    connection.execute(text("ANALYZE"))
+
+
+def _patient_lookup_columns(connection: Connection) -> None:
+    """Normalized email and name columns for patient verification, backfilled from the existing rows."""
+    Patient = models.Patient.__table__
+    existing = {column["name"] for column in inspect(connection).get_columns("patients")}
+    for name in ("email_normalized", "first_name_normalized", "last_name_normalized"):
+        if name not in existing:
+            connection.execute(text(f"ALTER TABLE patients ADD COLUMN {name} VARCHAR"))
+
+    # Casefolding is done in Python, the same way the model does it on write;
+    # SQLite's lower() only folds ASCII
+    last_id = ""
+    while True:
+        rows = connection.execute(
+            select(Patient.c.patient_id, Patient.c.email, Patient.c.first_name, Patient.c.last_name)
+            .where(Patient.c.patient_id > last_id)
+            .order_by(Patient.c.patient_id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            update(Patient).where(Patient.c.patient_id == bindparam("key")).values(
+                email_normalized=bindparam("email_key"),
+                first_name_normalized=bindparam("first_name_key"),
+                last_name_normalized=bindparam("last_name_key"),
+            ),
+            [{"key": row.patient_id, "email_key": models.normalize_lookup(row.email),
+              "first_name_key": models.normalize_lookup(row.first_name),
+              "last_name_key": models.normalize_lookup(row.last_name)} for row in rows]
+        )
+        last_id = rows[-1].patient_id
+
+    _create_index(connection, "ix_patients_lookup", "patients",
+                  ("email_normalized", "last_name_normalized", "first_name_normalized"))
+    connection.execute(text("ANALYZE patients"))
+
+
+def _appointment_doctor_time_index(connection: Connection) -> None:
+    """Lets the paginated admin listing filtered by doctor read appointments in time order."""
+    _create_index(connection, "ix_appointments_doctor_id_appointment_time", "appointments",
+                  ("doctor_id", "appointment_time", "appointment_id"))
+    connection.execute(text("ANALYZE appointments"))
+
+
+def _webhook_event_invitee(connection: Connection) -> None:
+    """Invitee URI on inbox events, so the workers process one invitee's events in order."""
+    existing = {column["name"] for column in inspect(connection).get_columns("webhook_events")}
+    if "invitee_uri" not in existing:
+        connection.execute(text("ALTER TABLE webhook_events ADD COLUMN invitee_uri VARCHAR"))
+    # Only events still waiting to run can hold up another one; their dedupe key is "<event type>:<invitee URI>"
+    Event = models.WebhookEvent.__table__
+    rows = connection.execute(select(Event.c.event_id, Event.c.dedupe_key).where(
+        Event.c.status.in_(('pending', 'processing')), Event.c.dedupe_key.isnot(None)
+    )).all()
+    if rows:
+        connection.execute(
+            update(Event).where(Event.c.event_id == bindparam("key")).values(invitee_uri=bindparam("invitee")),
+            [{"key": row.event_id, "invitee": row.dedupe_key.split(":", 1)[-1]} for row in rows]
+        )
+    _create_index(connection, "ix_webhook_events_invitee_uri_event_id", "webhook_events", ("invitee_uri", "event_id"))
+
+
+Migration = Tuple[int, str, Callable[[Connection], None]]
+
+MIGRATIONS: List[Migration] = [
+    (1, "appointment and doctor query indexes", _query_indexes),
+    (2, "normalized patient lookup columns", _patient_lookup_columns),
+    (3, "appointment doctor and time index", _appointment_doctor_time_index),
+    (4, "webhook event invitee ordering", _webhook_event_invitee),
+]
+
+
+@contextmanager
+def _locked(engine: Engine) -> Iterator[Connection]:
+    """
+    A transaction that only one process at a time can be in. On SQLite it starts with
+    BEGIN IMMEDIATE, which takes the database write lock up front; on PostgreSQL it holds a
+    transaction-scoped advisory lock. Waiting past the busy timeout is retried until
+    LOCK_TIMEOUT_SECONDS.
+    """
+    if engine.dialect.name != "sqlite":
+        with engine.begin() as connection:
+            if engine.dialect.name == "postgresql":
+                connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            yield connection
+        return
+
+    deadline = time.monotonic() + LOCK_TIMEOUT_SECONDS
+    # The driver must not open transactions of its own, so BEGIN/COMMIT are issued here
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        while True:
+            try:
+                connection.exec_driver_sql("BEGIN IMMEDIATE")
+                break
+            except OperationalError as e:
+                if "locked" not in str(e) or time.monotonic() > deadline:
+                    raise
+                logger.info("Waiting for another process to finish migrating the database")
+        try:
+            yield connection
+        except BaseException:
+            connection.exec_driver_sql("ROLLBACK")
+            raise
+        connection.exec_driver_sql("COMMIT")
+
+
+def _applied_versions(connection: Connection) -> List[int]:
+    return [row[0] for row in connection.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+
+
+def applied_versions(engine: Engine) -> List[int]:
+    models.SchemaMigration.__table__.create(bind=engine, checkfirst=True)
+    with engine.connect() as connection:
+        return _applied_versions(connection)
+
+
+def migrate(engine: Engine) -> List[int]:
+    """
+    Create missing tables, then apply pending migrations in order; returns the versions that
+    this call applied. Safe to run from several processes at once.
+    """
+    with _locked(engine) as connection:
+        models.Base.metadata.create_all(bind=connection)
+        done = set(_applied_versions(connection))
+    applied = []
+    for version, name, upgrade in MIGRATIONS:
+        if version in done:
+            continue
+        with _locked(engine) as connection:
+            # Another process may have applied it while this one waited for the lock
+            if version in _applied_versions(connection):
+                continue
+            logger.info(f"Applying migration {version}: {name}")
+            upgrade(connection)
+            connection.execute(models.SchemaMigration.__table__.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+        applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    from app.database.database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    print(f"Applied migrations: {migrate(engine) or 'none pending'}")
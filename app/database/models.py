@@ -1,8 +1,18 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, Text, ForeignKey, Boolean, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Date, DateTime, Text, ForeignKey, Boolean, JSON, Index
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime
+from typing import Optional
+import unicodedata
 from .database import Base
 
+
+def normalize_lookup(value: Optional[str]) -> Optional[str]:
+    """Form names and emails are compared in: NFKC, casefolded, surrounding and repeated whitespace removed."""
+    if value is None:
+        return None
+    return " ".join(unicodedata.normalize("NFKC", value).split()).casefold()
+
+
 class Patient(Base):
     __tablename__ = "patients"
     
@@ -67,9 +77,24 @@ class Patient(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Lookup keys for patient verification, kept in sync by normalize_lookup_columns()
+    email_normalized = Column(String)
+    first_name_normalized = Column(String)
+    last_name_normalized = Column(String)
+
     # Relationships
     appointments = relationship("Appointment", back_populates="patient")
 
+    # Created on existing databases by migration 2 (app/database/migrations.py)
+    __table_args__ = (
+        Index("ix_patients_lookup", "email_normalized", "last_name_normalized", "first_name_normalized"),
+    )
+
+    @validates("email", "first_name", "last_name")
+    def normalize_lookup_columns(self, key, value):
+        setattr(self, f"{key}_normalized", normalize_lookup(value))
+        return value
+
 class Doctor(Base):
     __tablename__ = "doctors"
     doctor_id = Column(Integer, primary_key=True, autoincrement=True)
@@ -82,6 +107,10 @@ class Doctor(Base):
     is_active = Column(Boolean, default=True)
     appointments = relationship("Appointment", back_populates="doctor")
 
+    __table_args__ = (
+        Index("ix_doctors_is_active", "is_active", "doctor_id"),
+    )
+
 class Appointment(Base):
     __tablename__ = "appointments"
     appointment_id = Column(Integer, primary_key=True, autoincrement=True)
@@ -100,4 +129,113 @@ class Appointment(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     patient = relationship("Patient", back_populates="appointments")
-    doctor = relationship("Doctor", back_populates="appointments")
\ No newline at end of file
+    doctor = relationship("Doctor", back_populates="appointments")
+
+    # Created on existing databases by migration 1 (app/database/migrations.py)
+    __table_args__ = (
+        Index("ix_appointments_status_appointment_time", "status", "appointment_time", "appointment_id"),
+        Index("ix_appointments_appointment_time", "appointment_time", "appointment_id"),
+        Index("ix_appointments_patient_id_appointment_time", "patient_id", "appointment_time"),
+        Index("ix_appointments_doctor_id_status", "doctor_id", "status"),
+        # Migration 3: the admin listing filtered by doctor
+        Index("ix_appointments_doctor_id_appointment_time", "doctor_id", "appointment_time", "appointment_id"),
+    )
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+    message_id = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(String, nullable=False)
+    role = Column(String, nullable=False)  # human, ai
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_chat_messages_session_id_message_id", "session_id", "message_id"),
+    )
+
+class RecommendationCacheEntry(Base):
+    __tablename__ = "recommendation_cache"
+    cache_key = Column(String, primary_key=True)
+    value = Column(JSON, nullable=False)  # Serialized DoctorRecommendation
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class WebhookEvent(Base):
+    __tablename__ = "webhook_events"
+    event_id = Column(Integer, primary_key=True, autoincrement=True)
+    event_type = Column(String, nullable=False)
+    dedupe_key = Column(String, index=True)  # event type + invitee URI, shared by redeliveries
+    invitee_uri = Column(String)  # Events of one invitee are processed one at a time, in arrival order
+    body = Column(Text, nullable=False)  # Raw webhook body as received
+    
+    status = Column(String, default='pending', nullable=False)  # pending, processing, done, dead
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_until = Column(DateTime)
+    last_error = Column(Text)
+    
+    received_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_webhook_events_status_next_attempt_at", "status", "next_attempt_at"),
+        Index("ix_webhook_events_invitee_uri_event_id", "invitee_uri", "event_id"),
+    )
+
+
+class ProcessedWebhook(Base):
+    __tablename__ = "processed_webhooks"
+    dedupe_key = Column(String, primary_key=True)  # e.g. "invitee.created:https://api.calendly.com/.../invitees/..."
+    event_type = Column(String, nullable=False)
+    invitee_uri = Column(String, index=True)
+    result = Column(String)
+    processed_at = Column(DateTime, default=datetime.utcnow)
+
+class EventTypeMapping(Base):
+    __tablename__ = "event_type_mappings"
+    event_type_uri = Column(String, primary_key=True)
+    scheduling_url = Column(String, nullable=False)
+    resolved_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class SyncState(Base):
+    __tablename__ = "sync_state"
+    name = Column(String, primary_key=True)  # e.g. "calendly_scheduled_events"
+    high_water_mark = Column(String)  # Last Calendly updated_at applied, ISO 8601
+    last_run_at = Column(DateTime)
+    last_run_stats = Column(JSON)
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    email_id = Column(Integer, primary_key=True, autoincrement=True)
+    dedupe_key = Column(String, unique=True)  # e.g. "confirmation:<invitee uri>", so retries never email twice
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    html_body = Column(Text, nullable=False)
+    
+    status = Column(String, default='pending', nullable=False)  # pending, sending, sent, dead
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_until = Column(DateTime)
+    last_error = Column(Text)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+class AppointmentReminder(Base):
+    __tablename__ = "appointment_reminders"
+    appointment_id = Column(Integer, ForeignKey('appointments.appointment_id'), primary_key=True)
+    status = Column(String, nullable=False)  # sent, failed
+    attempts = Column(Integer, default=1, nullable=False)
+    last_error = Column(Text)
+    sent_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+    version = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,116 @@
+"""
+Statements behind the admin and doctor endpoints.
+
+Built here rather than inline in the endpoints so `benchmarks.query_plans` can
+EXPLAIN and time exactly what the endpoints execute, against the indexes that
+`app.database.migrations` creates.
+"""
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import ColumnElement, Select, case, func, select, tuple_
+
+from app.database import models
+
+
+def appointment_filters(status: Optional[str] = None, doctor_id: Optional[int] = None,
+                        date_from: Optional[date] = None, date_to: Optional[date] = None,
+                        patient_email: Optional[str] = None) -> List[ColumnElement]:
+    """Filters of /api/admin/appointments; each maps onto one of the appointment indexes."""
+    filters = [models.Appointment.appointment_time.isnot(None)]
+    if status:
+        filters.append(models.Appointment.status == status)
+    if doctor_id is not None:
+        filters.append(models.Appointment.doctor_id == doctor_id)
+    if date_from:
+        filters.append(models.Appointment.appointment_time >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        filters.append(models.Appointment.appointment_time < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    if patient_email:
+        filters.append(models.Patient.email_normalized == models.normalize_lookup(patient_email))
+    return filters
+
+
+def appointments_page(filters: List[ColumnElement], cursor: Optional[Tuple[datetime, int]] = None,
+                      limit: int = 50) -> Select:
+    """
+    One page of appointments with patient and doctor details, newest first. The keyset condition
+    on (appointment_time, appointment_id) starts the page where the last one ended; one extra row
+    is fetched to tell whether there is a next page.
+    """
+    query = select(
+        models.Appointment.appointment_id,
+        models.Appointment.appointment_time,
+        models.Appointment.end_time,
+        models.Appointment.status,
+        models.Appointment.created_at,
+        models.Patient.first_name.label("patient_first_name"),
+        models.Patient.last_name.label("patient_last_name"),
+        models.Patient.email.label("patient_email"),
+        models.Doctor.doctor_name
+    ).join(
+        models.Patient, models.Appointment.patient_id == models.Patient.patient_id
+    ).join(
+        models.Doctor, models.Appointment.doctor_id == models.Doctor.doctor_id
+    ).where(*filters)
+    if cursor:
+        query = query.where(tuple_(models.Appointment.appointment_time, models.Appointment.appointment_id)
+                            < tuple_(*cursor))
+    return query.order_by(
+        models.Appointment.appointment_time.desc(),
+        models.Appointment.appointment_id.desc()
+    ).limit(limit + 1)
+
+
+def appointments_count(filters: List[ColumnElement], patient_email: Optional[str] = None) -> Select:
+    """Total for the same filters, counted on the appointment indexes; patients are only joined for the email filter."""
+    query = select(func.count(models.Appointment.appointment_id)).where(*filters)
+    if patient_email:
+        query = query.join(models.Patient, models.Appointment.patient_id == models.Patient.patient_id)
+    return query
+
+
+def doctor_stats() -> Select:
+    """Appointment counts per doctor, doctors without appointments included."""
+    return select(
+        models.Doctor.doctor_id,
+        models.Doctor.doctor_name,
+        models.Doctor.specialization,
+        func.count(models.Appointment.appointment_id).label("total_appointments"),
+        func.sum(case(
+            (models.Appointment.status == 'scheduled', 1),
+            else_=0
+        )).label("scheduled_count"),
+        func.sum(case(
+            (models.Appointment.status == 'canceled', 1),
+            else_=0
+        )).label("cancelled_count")
+    ).outerjoin(
+        models.Appointment, models.Doctor.doctor_id == models.Appointment.doctor_id
+    ).group_by(
+        models.Doctor.doctor_id,
+        models.Doctor.doctor_name,
+        models.Doctor.specialization
+    )
+
+
+def patient_appointments(patient_id: str) -> Select:
+    """A patient's appointments with the doctor's name, newest first."""
+    return select(
+        models.Appointment.appointment_id,
+        models.Appointment.appointment_time,
+        models.Appointment.end_time,
+        models.Appointment.status,
+        models.Appointment.created_at,
+        models.Doctor.doctor_name
+    ).join(
+        models.Doctor, models.Appointment.doctor_id == models.Doctor.doctor_id
+    ).where(
+        models.Appointment.patient_id == patient_id
+    ).order_by(
+        models.Appointment.appointment_time.desc()
+    )
+
+
+def active_doctors() -> Select:
+    return select(models.Doctor).where(models.Doctor.is_active == True)
@@ -1,23 +1,43 @@
-from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import Any, List, Dict, Optional
+from typing import Any, List, Dict, Optional, Tuple
 from pydantic import BaseModel, EmailStr, Field, validator
+import base64
 import uuid
+import json
+import asyncio
+import time
 from datetime import date, datetime
 import logging
-from app.database import models, database
+from app.database import models, database, queries
+from app.database.migrations import migrate
 from app.services.ai_service import MedicalAIService, DoctorRecommendation
 from app.services.email_service import EmailService
-from app.services.calendly_service import CalendlyService, verify_webhook_signature
+from app.services.email_outbox import EmailOutboxSender
+from app.services.calendly_service import get_calendly_service, verify_webhook_signature
+from app.services.async_calendly_service import close_async_calendly_service, get_async_calendly_service
+from app.services.webhook_inbox import WebhookInbox
+from app.services.webhook_ledger import WebhookLedger, dedupe_key
+from app.services.doctor_resolver import DoctorResolver
+from app.services.calendly_sync import CalendlyReconciler, ReconciliationInProgress, ensure_patient
+from starlette.concurrency import run_in_threadpool
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-models.Base.metadata.create_all(bind=database.engine)
+_started = time.perf_counter()
+# Every uvicorn worker imports this module; the migration lock lets one of them create the tables and
+# migrate while the others wait, then find nothing left to do
+migrate(database.engine)
 
 app = FastAPI()
 ai_service = MedicalAIService()
 email_service = EmailService()
-calendly_service = CalendlyService()
+email_outbox = EmailOutboxSender(email_service)
+startup_timings: Dict[str, Optional[float]] = {"ready_seconds": None}
+calendly_startup: Dict[str, Any] = {"state": "pending"}
 class PatientCreate(BaseModel):
     first_name: str
     middle_initial: str = ""
@@ -128,7 +148,13 @@ class AppointmentDetails(BaseModel):
     status: str
     created_at: datetime
 
+class AppointmentPage(BaseModel):
+    appointments: List[AppointmentDetails]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
 class DoctorStats(BaseModel):
+    doctor_id: int
     doctor_name: str
     specialization: str
     appointment_count: int
@@ -229,39 +255,99 @@ def create_or_get_patient(patient_data: Dict[str, Any], db: Session = Depends(da
 
 @app.get("/api/doctors", response_model=List[DoctorResponse])
 def get_doctors(db: Session = Depends(database.get_db)):
-    doctors = db.query(models.Doctor).filter(models.Doctor.is_active == True).all()
+    doctors = db.scalars(queries.active_doctors()).all()
     return doctors
 
+async def active_doctor_list(db: AsyncSession) -> List[Dict[str, str]]:
+    """Active doctors as the AI service takes them; closes `db` so no connection is held while waiting on the LLM"""
+    rows = await db.execute(select(models.Doctor.doctor_name, models.Doctor.specialization).where(
+        models.Doctor.is_active == True
+    ))
+    doctor_list = [{"doctor_name": name, "specialization": specialization} for name, specialization in rows]
+    await db.close()
+    return doctor_list
+
 @app.post("/api/recommend-doctor", response_model=DoctorRecommendation)
-def recommend_doctor_endpoint(request: Dict, db: Session = Depends(database.get_db)):
+async def recommend_doctor_endpoint(request: Dict, db: AsyncSession = Depends(database.get_async_db)):
     symptoms = request.get("symptoms")
     if not symptoms:
         raise HTTPException(400, "Symptoms are required.")
     
-    doctors = db.query(models.Doctor).filter(models.Doctor.is_active == True).all()
-    doctor_list = [{"doctor_name": d.doctor_name, "specialization": d.specialization} for d in doctors]
-    return ai_service.recommend_doctor(symptoms, doctor_list)
+    doctor_list = await active_doctor_list(db)
+    try:
+        return await ai_service.arecommend_doctor(symptoms, doctor_list)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="The AI service took too long to respond.")
 
 @app.post("/api/chat")
-def chat_with_assistant(request: ChatRequest, db: Session = Depends(database.get_db)):
+async def chat_with_assistant(request: ChatRequest, db: AsyncSession = Depends(database.get_async_db)):
     if not request.query or not request.session_id:
         raise HTTPException(status_code=400, detail="Query and session_id cannot be empty.")
     
-    doctors = db.query(models.Doctor).filter(models.Doctor.is_active == True).all()
-    doctor_list = [{"doctor_name": d.doctor_name, "specialization": d.specialization} for d in doctors]
-    
-    response = ai_service.get_chat_response(request.session_id, request.query, doctor_list)
+    doctor_list = await active_doctor_list(db)
+    try:
+        response = await ai_service.aget_chat_response(request.session_id, request.query, doctor_list)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="The AI service took too long to respond.")
     return {"response": response}
 
+@app.post("/api/chat/stream")
+async def stream_chat_with_assistant(request: ChatRequest, db: AsyncSession = Depends(database.get_async_db)):
+    """Stream the assistant's reply as server-sent events, one event per token"""
+    if not request.query or not request.session_id:
+        raise HTTPException(status_code=400, detail="Query and session_id cannot be empty.")
+    
+    doctor_list = await active_doctor_list(db)
+    
+    async def event_stream():
+        try:
+            async for token in ai_service.astream_chat_response(request.session_id, request.query, doctor_list):
+                yield f"data: {json.dumps({'token': token})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except asyncio.TimeoutError:
+            logger.error("Chat stream exceeded the LLM timeout")
+            yield f"event: error\ndata: {json.dumps({'detail': 'The AI service took too long to respond.'})}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/admin/ai-stats")
+def get_ai_statistics():
+    """Get cache and session-store counters for the AI service"""
+    return {
+        "chat_sessions": ai_service.conversations.stats(),
+        "recommendation_cache": ai_service.recommendation_cache.stats() if ai_service.recommendation_cache else None,
+        "semantic_cache": ai_service.semantic_cache.stats() if ai_service.semantic_cache else None,
+        "recommendation_batching": ai_service.batcher.stats() if ai_service.batcher else None
+    }
+
+@app.get("/api/admin/calendly-stats")
+def get_calendly_statistics():
+    """Get circuit-breaker state and per-endpoint latency of Calendly API calls"""
+    try:
+        service = get_calendly_service()
+    except ValueError as e:
+        # Calendly is not configured; report that instead of failing
+        return {"startup": {**calendly_startup, "state": "disabled", "error": str(e)}, "circuit": None,
+                "endpoints": {}, "async_client": None}
+    return {**service.stats(), "async_client": get_async_calendly_service().stats()}
+
 
 
 @app.post("/api/verify-patient", response_model=PatientResponse)
 def verify_existing_patient(verification: PatientVerification, db: Session = Depends(database.get_db)):
     """Verify if a patient exists in the database"""
+    # Exact email, names matched from the start (e.g. "Jen" for Jennifer), all on the ix_patients_lookup index
     patient = db.query(models.Patient).filter(
-        models.Patient.first_name.ilike(f"%{verification.first_name}%"),
-        models.Patient.last_name.ilike(f"%{verification.last_name}%"),
-        models.Patient.email.ilike(f"%{verification.email}%")
+        models.Patient.email_normalized == models.normalize_lookup(verification.email),
+        models.Patient.last_name_normalized.startswith(models.normalize_lookup(verification.last_name), autoescape=True),
+        models.Patient.first_name_normalized.startswith(models.normalize_lookup(verification.first_name), autoescape=True)
     ).first()
     
     if not patient:
@@ -277,29 +363,37 @@ def verify_existing_patient(verification: PatientVerification, db: Session = Dep
         gender=patient.gender
     )
 
-@app.get("/api/admin/appointments", response_model=List[AppointmentDetails])
-def get_all_appointments(db: Session = Depends(database.get_db)):
-    """Get all appointments with patient and doctor details"""
-    appointments = db.query(
-        models.Appointment.appointment_id,
-        models.Appointment.appointment_time,
-        models.Appointment.end_time,
-        models.Appointment.status,
-        models.Appointment.created_at,
-        models.Patient.first_name.label("patient_first_name"),
-        models.Patient.last_name.label("patient_last_name"),
-        models.Patient.email.label("patient_email"),
-        models.Doctor.doctor_name
-    ).join(
-        models.Patient, models.Appointment.patient_id == models.Patient.patient_id
-    ).join(
-        models.Doctor, models.Appointment.doctor_id == models.Doctor.doctor_id
-    ).order_by(
-        models.Appointment.appointment_time.desc()
-    ).all()
-    
+def encode_appointment_cursor(appointment_time: datetime, appointment_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{appointment_time.isoformat()}|{appointment_id}".encode()).decode()
+
+def decode_appointment_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        appointment_time, appointment_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(appointment_time), int(appointment_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/api/admin/appointments", response_model=AppointmentPage)
+async def get_all_appointments(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    status: Optional[str] = None,
+    doctor_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    patient_email: Optional[str] = None,
+    include_total: bool = False,
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """Get a page of appointments with patient and doctor details, newest first; pass next_cursor for the next page"""
+    filters = queries.appointment_filters(status, doctor_id, date_from, date_to, patient_email)
+    total = await db.scalar(queries.appointments_count(filters, patient_email)) if include_total else None
+    appointments = (await db.execute(queries.appointments_page(
+        filters, decode_appointment_cursor(cursor) if cursor else None, limit
+    ))).all()
+
     result = []
-    for apt in appointments:
+    for apt in appointments[:limit]:
         patient_name = f"{apt.patient_first_name} {apt.patient_last_name}".strip()
         result.append(AppointmentDetails(
             appointment_id=apt.appointment_id,
@@ -311,37 +405,21 @@ def get_all_appointments(db: Session = Depends(database.get_db)):
             status=apt.status,
             created_at=apt.created_at
         ))
-    
-    return result
+
+    next_cursor = None
+    if len(appointments) > limit:
+        next_cursor = encode_appointment_cursor(result[-1].appointment_time, result[-1].appointment_id)
+    return AppointmentPage(appointments=result, next_cursor=next_cursor, total=total)
 
 @app.get("/api/admin/doctor-stats", response_model=List[DoctorStats])
-def get_doctor_statistics(db: Session = Depends(database.get_db)):
+async def get_doctor_statistics(db: AsyncSession = Depends(database.get_async_db)):
     """Get appointment statistics for each doctor"""
-    from sqlalchemy import func, case
-    
-    stats = db.query(
-        models.Doctor.doctor_name,
-        models.Doctor.specialization,
-        func.count(models.Appointment.appointment_id).label("total_appointments"),
-        func.sum(case(
-            (models.Appointment.status == 'scheduled', 1),
-            else_=0
-        )).label("scheduled_count"),
-        func.sum(case(
-            (models.Appointment.status == 'canceled', 1),
-            else_=0
-        )).label("cancelled_count")
-    ).outerjoin(
-        models.Appointment, models.Doctor.doctor_id == models.Appointment.doctor_id
-    ).group_by(
-        models.Doctor.doctor_id,
-        models.Doctor.doctor_name,
-        models.Doctor.specialization
-    ).all()
+    stats = await db.execute(queries.doctor_stats())
     
     result = []
     for stat in stats:
         result.append(DoctorStats(
+            doctor_id=stat.doctor_id,
             doctor_name=stat.doctor_name,
             specialization=stat.specialization,
             appointment_count=int(stat.total_appointments or 0),
@@ -352,36 +430,23 @@ def get_doctor_statistics(db: Session = Depends(database.get_db)):
     return result
 
 @app.get("/api/admin/patients")
-def get_all_patients(
+async def get_all_patients(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Get all patients with pagination"""
-    patients = db.query(models.Patient).offset(skip).limit(limit).all()
-    return patients
+    patients = await db.scalars(select(models.Patient).offset(skip).limit(limit))
+    return patients.all()
 
 @app.get("/api/admin/patient/{patient_id}/appointments")
-def get_patient_appointments(patient_id: str, db: Session = Depends(database.get_db)):
+async def get_patient_appointments(patient_id: str, db: AsyncSession = Depends(database.get_async_db)):
     """Get all appointments for a specific patient"""
-    patient = db.query(models.Patient).filter(models.Patient.patient_id == patient_id).first()
+    patient = await db.get(models.Patient, patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    appointments = db.query(
-        models.Appointment.appointment_id,
-        models.Appointment.appointment_time,
-        models.Appointment.end_time,
-        models.Appointment.status,
-        models.Appointment.created_at,
-        models.Doctor.doctor_name
-    ).join(
-        models.Doctor, models.Appointment.doctor_id == models.Doctor.doctor_id
-    ).filter(
-        models.Appointment.patient_id == patient_id
-    ).order_by(
-        models.Appointment.appointment_time.desc()
-    ).all()
+    appointments = await db.execute(queries.patient_appointments(patient_id))
     
     return {
         "patient": {
@@ -389,11 +454,11 @@ def get_patient_appointments(patient_id: str, db: Session = Depends(database.get
             "name": f"{patient.first_name} {patient.last_name}",
             "email": patient.email
         },
-        "appointments": appointments
+        "appointments": appointments.mappings().all()
     }
 @app.post("/api/webhooks/calendly")
-async def handle_calendly_webhook(request: Request, db: Session = Depends(database.get_db)):
-    """Handle Calendly webhook events for appointment booking/cancellation"""
+async def handle_calendly_webhook(request: Request, db: AsyncSession = Depends(database.get_async_db)):
+    """Verify a Calendly webhook and queue it for background processing"""
     
     logger.info("Received Calendly webhook")
     signature = request.headers.get("calendly-webhook-signature")
@@ -402,23 +467,46 @@ async def handle_calendly_webhook(request: Request, db: Session = Depends(databa
         logger.error("Invalid webhook signature")
         raise HTTPException(status_code=401, detail="Invalid webhook signature")
     try:
-        payload = await request.json()
-        logger.info(f"Processing Calendly webhook: {payload}")
+        payload = json.loads(body)
     except Exception as e:
         logger.error(f"Error parsing webhook payload: {e}")
         raise HTTPException(status_code=400, detail="Invalid JSON payload")
     
     event_type = payload.get("event")
     
-    if event_type == "invitee.created":
-        return await handle_invitee_created(payload, db)
-    elif event_type == "invitee.canceled":
-        return await handle_invitee_canceled(payload, db)
-    else:
+    if event_type not in WEBHOOK_HANDLERS:
         logger.info(f"Unhandled event type: {event_type}")
         return {"status": "Event type not handled"}
+    
+    key = dedupe_key(payload)
+    if await webhook_ledger.is_processed(db, key):
+        logger.info(f"Ignoring redelivered webhook {key}")
+        return {"status": "Duplicate event ignored"}
+    
+    # Only the enqueue, which reads and then inserts, needs the write session
+    async with database.AsyncWriteSessionLocal() as write_db:
+        event, created = await webhook_inbox.enqueue(write_db, event_type, body.decode("utf-8"), dedupe_key=key,
+                                                     invitee_uri=(payload.get("payload") or {}).get("uri"))
+    if not created:
+        logger.info(f"Webhook {key} is already queued as event {event.event_id}")
+        return {"status": "Duplicate event ignored", "event_id": event.event_id}
+    logger.info(f"Queued Calendly webhook {event_type} as event {event.event_id}")
+    return {"status": "Event queued", "event_id": event.event_id}
 
-async def handle_invitee_created(payload: dict, db: Session):
+async def process_webhook_event(payload: dict, db: AsyncSession):
+    """Run the handler for a queued Calendly webhook; raising makes the inbox retry it"""
+    key = dedupe_key(payload)
+    if await webhook_ledger.is_processed(db, key):
+        logger.info(f"Skipping already processed webhook {key}")
+        return {"status": "Duplicate event ignored"}
+    logger.info(f"Processing Calendly webhook: {payload}")
+    result = await WEBHOOK_HANDLERS[payload.get("event")](payload, db)
+    # Outcomes that may change later (no matching doctor yet, a cancellation whose booking has not
+    # been applied) raise above, so the inbox retries them; whatever returns is final
+    await webhook_ledger.record(db, key, payload, result)
+    return result
+
+async def handle_invitee_created(payload: dict, db: AsyncSession):
     """Handle when a new appointment is booked"""
     try:
         data = payload.get("payload", {})
@@ -439,159 +527,299 @@ async def handle_invitee_created(payload: dict, db: Session):
         
         logger.info(f"Appointment details - Email: {patient_email}, Event Type: {event_type_uri}")
         
-        # Find the doctor based on event type URI
-        doctor = None
-        all_doctors = db.query(models.Doctor).filter(models.Doctor.is_active == True).all()
+        # A redelivered booking updates the existing appointment instead of inserting a duplicate;
+        # the confirmation email was already handled on first delivery.
+        existing_appointment = await db.scalar(select(models.Appointment).where(
+            models.Appointment.calendly_invitee_uri == invitee_uri
+        ))
+        if existing_appointment:
+            existing_appointment.calendly_event_uri = event_uri
+            existing_appointment.appointment_time = start_time
+            existing_appointment.end_time = end_time
+            existing_appointment.reschedule_url = reschedule_url
+            existing_appointment.cancel_url = cancel_url
+            await db.commit()
+            logger.info(f"Appointment {existing_appointment.appointment_id} already exists, updated it")
+            return {"status": "Appointment already recorded"}
         
-        # Get event type details from Calendly
-        try:
-            event_details = calendly_service.get_event_type_from_uri(event_type_uri)
-            if event_details:
-                scheduling_url = event_details.get("scheduling_url", "")
-                
-                # Find doctor by matching Calendly URLs
-                for doc in all_doctors:
-                    if (doc.calendly_new_patient_url == scheduling_url or 
-                        doc.calendly_existing_patient_url == scheduling_url):
-                        doctor = doc
-                        break
-        except Exception as e:
-            logger.error(f"Error fetching event details: {e}")
+        # Find the doctor based on event type URI (cached; Calendly is only asked for unknown event types).
+        # A Calendly outage raises here so the inbox retries the event. So does an event type that no
+        # doctor's booking page matches yet: it is retried until a doctor is set up for it, then kept
+        # as a dead letter that can be requeued.
+        resolution = await doctor_resolver.aresolve(db, event_type_uri)
+        doctor = await db.get(models.Doctor, resolution.doctor_id) if resolution else None
+        if not doctor:
+            logger.warning(f"Could not find doctor for event type: {event_type_uri}")
+            raise HTTPException(status_code=404, detail=f"No doctor found for event type {event_type_uri}")
+        patient_type = resolution.patient_type
         
-        patient = db.query(models.Patient).filter(models.Patient.email == patient_email).first()
+        patient = await db.run_sync(ensure_patient, patient_email, patient_name)
         
-        if not patient:
-            name_parts = patient_name.strip().split()
-            first_name = name_parts[0] if name_parts else ""
-            last_name = " ".join(name_parts[1:]) if len(name_parts) > 1 else ""
-            
-            patient = models.Patient(
-                patient_id=str(uuid.uuid4()),
-                first_name=first_name,
-                last_name=last_name,
-                email=patient_email,
-                date_of_birth=date(2000, 1, 1), 
-                gender="Not specified",
-                cell_phone="",
-                street_address="To be updated",
-                city="To be updated", 
-                state="NA",
-                zip_code="00000",
-                emergency_contact_name="To be updated",
-                emergency_contact_relationship="To be updated",
-                emergency_contact_phone="To be updated",
-                primary_insurance_company="To be updated",
-                primary_member_id="To be updated",
-                primary_reason_for_visit="Scheduled via Calendly",
-                symptom_duration="Not specified",
-                current_symptoms=[],
-                has_known_allergies="Not specified",
-                had_allergy_testing="Not specified",
-                had_severe_allergic_reaction="Not specified",
-                current_allergy_medications=[],
-                medical_conditions=[],
-                understands_medication_instructions="Not specified"
-            )
-            db.add(patient)
-            db.commit()
-            db.refresh(patient)
-            logger.info(f"Created minimal patient record: {patient_email}")
+        new_appointment = models.Appointment(
+            patient_id=patient.patient_id,
+            doctor_id=doctor.doctor_id,
+            calendly_event_uri=event_uri,
+            calendly_invitee_uri=invitee_uri,
+            appointment_time=start_time,
+            end_time=end_time,
+            reschedule_url=reschedule_url,
+            cancel_url=cancel_url,
+            status="scheduled"
+        )
+        db.add(new_appointment)
+        await db.commit()
+        await db.refresh(new_appointment)
         
-        if doctor and patient:
-            new_appointment = models.Appointment(
-                patient_id=patient.patient_id,
-                doctor_id=doctor.doctor_id,
-                calendly_event_uri=event_uri,
-                calendly_invitee_uri=invitee_uri,
-                appointment_time=start_time,
-                end_time=end_time,
-                reschedule_url=reschedule_url,
-                cancel_url=cancel_url,
-                status="scheduled"
+        logger.info(f"Created appointment: {new_appointment.appointment_id}")
+        if not email_outbox.enabled:
+            # No outbox workers run without SMTP settings, so a queued confirmation would never be sent
+            logger.warning(f"Email configuration is incomplete. No confirmation email for {patient_email}")
+            return {"status": "Appointment created"}
+        try:
+            appointment_date = start_time.strftime('%A, %B %d, %Y') if start_time else 'TBD'
+            appointment_time_formatted = start_time.strftime('%I:%M %p') if start_time else 'TBD'
+            end_time_formatted = end_time.strftime('%I:%M %p') if end_time else 'TBD'
+            duration_minutes = 60 
+            if start_time and end_time:
+                duration_minutes = int((end_time - start_time).total_seconds() / 60)
+            patient_data = {
+                'first_name': patient.first_name,
+                'middle_initial': patient.middle_initial,
+                'last_name': patient.last_name,
+                'email': patient.email,
+                'date_of_birth': patient.date_of_birth.strftime('%B %d, %Y') if patient.date_of_birth else 'Not provided',
+                'cell_phone': patient.cell_phone,
+                'home_phone': patient.home_phone,
+                'street_address': patient.street_address,
+                'city': patient.city,
+                'state': patient.state,
+                'zip_code': patient.zip_code,
+                'primary_insurance_company': patient.primary_insurance_company,
+                'primary_member_id': patient.primary_member_id,
+                'primary_reason_for_visit': patient.primary_reason_for_visit,
+                'symptom_duration': patient.symptom_duration,
+                'current_symptoms': patient.current_symptoms or [],
+                'known_allergies_list': patient.known_allergies_list,
+                'had_severe_allergic_reaction': patient.had_severe_allergic_reaction,
+                'understands_medication_instructions': patient.understands_medication_instructions
+            }
+            
+            appointment_details = {
+                'doctor_name': doctor.doctor_name,
+                'appointment_date': appointment_date,
+                'appointment_time': appointment_time_formatted,
+                'end_time': end_time_formatted,
+                'duration': duration_minutes,
+                'cancel_url': cancel_url,
+                'reschedule_url': reschedule_url
+            }
+            # Delivered by the outbox workers; the webhook never waits on SMTP
+            to_email, subject, html_content = email_service.render_appointment_confirmation(
+                patient_data, appointment_details, patient_type
             )
-            db.add(new_appointment)
-            db.commit()
-            db.refresh(new_appointment)
+            await db.run_sync(email_outbox.enqueue, to_email, subject, html_content,
+                              dedupe_key=f"confirmation:{invitee_uri}")
             
-            logger.info(f"Created appointment: {new_appointment.appointment_id}")
-            try:
-                appointment_date = start_time.strftime('%A, %B %d, %Y') if start_time else 'TBD'
-                appointment_time_formatted = start_time.strftime('%I:%M %p') if start_time else 'TBD'
-                end_time_formatted = end_time.strftime('%I:%M %p') if end_time else 'TBD'
-                duration_minutes = 60 
-                if start_time and end_time:
-                    duration_minutes = int((end_time - start_time).total_seconds() / 60)
-                patient_data = {
-                    'first_name': patient.first_name,
-                    'middle_initial': patient.middle_initial,
-                    'last_name': patient.last_name,
-                    'email': patient.email,
-                    'date_of_birth': patient.date_of_birth.strftime('%B %d, %Y') if patient.date_of_birth else 'Not provided',
-                    'cell_phone': patient.cell_phone,
-                    'home_phone': patient.home_phone,
-                    'street_address': patient.street_address,
-                    'city': patient.city,
-                    'state': patient.state,
-                    'zip_code': patient.zip_code,
-                    'primary_insurance_company': patient.primary_insurance_company,
-                    'primary_member_id': patient.primary_member_id,
-                    'primary_reason_for_visit': patient.primary_reason_for_visit,
-                    'symptom_duration': patient.symptom_duration,
-                    'current_symptoms': patient.current_symptoms or [],
-                    'known_allergies_list': patient.known_allergies_list,
-                    'had_severe_allergic_reaction': patient.had_severe_allergic_reaction,
-                    'understands_medication_instructions': patient.understands_medication_instructions
-                }
-                
-                appointment_details = {
-                    'doctor_name': doctor.doctor_name,
-                    'appointment_date': appointment_date,
-                    'appointment_time': appointment_time_formatted,
-                    'end_time': end_time_formatted,
-                    'duration': duration_minutes,
-                    'cancel_url': cancel_url,
-                    'reschedule_url': reschedule_url
-                }
-                patient_type = 'new' if doctor.calendly_new_patient_url == scheduling_url else 'existing'
-                
-                email_service.send_appointment_confirmation(
-                    patient_data=patient_data,
-                    appointment_details=appointment_details,
-                    patient_type=patient_type
-                )
-                
-                logger.info(f"Comprehensive confirmation email sent to {patient_email}")
-                
-            except Exception as e:
-                logger.error(f"Error sending confirmation email: {e}")
+            logger.info(f"Comprehensive confirmation email queued for {patient_email}")
             
-            return {"status": "Appointment created and comprehensive email sent"}
-        else:
-            logger.warning(f"Could not find doctor for event type: {event_type_uri}")
-            return {"status": "Webhook received but doctor not found"}
+        except Exception as e:
+            logger.error(f"Error queueing confirmation email: {e}")
+        
+        return {"status": "Appointment created and comprehensive email queued"}
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing invitee.created webhook: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing webhook: {str(e)}")
 
-async def handle_invitee_canceled(payload: dict, db: Session):
+async def handle_invitee_canceled(payload: dict, db: AsyncSession):
     """Handle when an appointment is canceled"""
     try:
         data = payload.get("payload", {})
         invitee_uri = data.get("uri")
-        appointment = db.query(models.Appointment).filter(
+        appointment = await db.scalar(select(models.Appointment).where(
             models.Appointment.calendly_invitee_uri == invitee_uri
-        ).first()
+        ))
         
         if appointment:
             appointment.status = 'canceled'
-            db.commit()
+            await db.commit()
             logger.info(f"Canceled appointment: {appointment.appointment_id}")
             return {"status": "Appointment canceled"}
-        else:
+        # The booking is applied before its cancellation unless it has not arrived or is still failing;
+        # retry until it is. Once the booking is recorded, a missing appointment will not come back.
+        if await webhook_ledger.is_processed(db, dedupe_key({"event": "invitee.created", "payload": data})):
             logger.warning(f"Could not find appointment for invitee URI: {invitee_uri}")
             return {"status": "Appointment not found"}
+        raise HTTPException(status_code=409, detail=f"Booking {invitee_uri} has not been applied yet")
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing invitee.canceled webhook: {e}")
-        raise HTTPException(status_code=500, detail=f"Error processing cancellation: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing cancellation: {str(e)}")
+
+WEBHOOK_HANDLERS = {
+    "invitee.created": handle_invitee_created,
+    "invitee.canceled": handle_invitee_canceled,
+}
+
+webhook_ledger = WebhookLedger()
+doctor_resolver = DoctorResolver(
+    lambda uri: get_calendly_service().get_event_type_from_uri(uri),
+    afetch_event_type=lambda uri: get_async_calendly_service().get_event_type_from_uri(uri)
+)
+webhook_inbox = WebhookInbox(process_webhook_event)
+calendly_reconciler = CalendlyReconciler(get_calendly_service, doctor_resolver)
+
+def warm_doctor_resolver():
+    db = database.SessionLocal()
+    try:
+        doctor_resolver.warm(db)
+    finally:
+        db.close()
+
+def start_calendly_service():
+    """Construct the Calendly client, resolve the organization and reconcile webhooks"""
+    try:
+        service = get_calendly_service()
+    except ValueError as e:
+        logger.error(f"Calendly integration disabled: {e}")
+        calendly_startup.update({"state": "disabled", "error": str(e)})
+        return
+    service.start()
+    calendly_startup.update(service.startup)
+
+async def run_calendly_reconciliation():
+    """Periodically repair appointments from Calendly's scheduled events, in case webhooks were lost"""
+    await app.state.calendly_startup_task
+    while calendly_startup.get("state") != "disabled":
+        try:
+            await run_in_threadpool(calendly_reconciler.run)
+        except ReconciliationInProgress:
+            logger.info("Skipping scheduled Calendly reconciliation, a manual run is in progress")
+        except Exception as e:
+            logger.error(f"Calendly reconciliation failed: {e}")
+        await asyncio.sleep(calendly_reconciler.interval_seconds)
+
+@app.on_event("startup")
+async def start_webhook_inbox():
+    await run_in_threadpool(warm_doctor_resolver)
+    await webhook_inbox.start()
+    await email_outbox.start()
+    # Calendly is reconciled in the background so startup never waits on its API
+    app.state.calendly_startup_task = asyncio.create_task(run_in_threadpool(start_calendly_service))
+    if calendly_reconciler.interval_seconds > 0:
+        app.state.reconciliation_task = asyncio.create_task(run_calendly_reconciliation())
+    startup_timings["ready_seconds"] = time.perf_counter() - _started
+
+@app.get("/api/health")
+def health_check():
+    """Report readiness, startup timings and the state of the Calendly background startup"""
+    return {
+        "status": "ready" if startup_timings["ready_seconds"] is not None else "starting",
+        "startup": startup_timings,
+        "calendly": calendly_startup
+    }
+
+@app.on_event("shutdown")
+async def stop_webhook_inbox():
+    reconciliation_task = getattr(app.state, "reconciliation_task", None)
+    if reconciliation_task:
+        reconciliation_task.cancel()
+    await webhook_inbox.stop()
+    await email_outbox.stop()
+    await close_async_calendly_service()
+
+@app.get("/api/admin/webhook-events")
+async def get_webhook_events(status: Optional[str] = None, limit: int = 100,
+                             db: AsyncSession = Depends(database.get_async_db)):
+    """Get queued webhook events, e.g. status=dead for the dead-letter list"""
+    query = select(models.WebhookEvent)
+    if status:
+        query = query.where(models.WebhookEvent.status == status)
+    events = await db.scalars(query.order_by(models.WebhookEvent.event_id.desc()).limit(limit))
+    return {
+        "counts": await webhook_inbox.stats(db),
+        "ledger": webhook_ledger.stats(),
+        "doctor_resolver": doctor_resolver.stats(),
+        "events": [
+            {
+                "event_id": e.event_id,
+                "event_type": e.event_type,
+                "status": e.status,
+                "attempts": e.attempts,
+                "last_error": e.last_error,
+                "received_at": e.received_at,
+                "processed_at": e.processed_at
+            }
+            for e in events
+        ]
+    }
+
+@app.post("/api/admin/webhook-events/{event_id}/retry")
+async def retry_webhook_event(event_id: int, db: AsyncSession = Depends(database.get_async_write_db)):
+    """Requeue a dead-lettered webhook event"""
+    event = await webhook_inbox.retry(db, event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Webhook event not found")
+    return {"status": "Event requeued", "event_id": event.event_id}
+
+@app.get("/api/admin/email-outbox")
+async def get_email_outbox(status: Optional[str] = None, limit: int = 100,
+                           db: AsyncSession = Depends(database.get_async_db)):
+    """Get queued emails and SMTP pool counters, e.g. status=dead for undeliverable mail"""
+    query = select(models.EmailOutbox)
+    if status:
+        query = query.where(models.EmailOutbox.status == status)
+    emails = await db.scalars(query.order_by(models.EmailOutbox.email_id.desc()).limit(limit))
+    return {
+        **await db.run_sync(email_outbox.stats),
+        "emails": [
+            {
+                "email_id": e.email_id,
+                "to_email": e.to_email,
+                "subject": e.subject,
+                "status": e.status,
+                "attempts": e.attempts,
+                "last_error": e.last_error,
+                "created_at": e.created_at,
+                "sent_at": e.sent_at
+            }
+            for e in emails
+        ]
+    }
+
+@app.get("/api/admin/reminders")
+async def get_reminder_run(db: AsyncSession = Depends(database.get_async_db)):
+    """Get the counters of the last appointment reminder run (python -m app.services.reminder_mailer)"""
+    state = await db.get(models.SyncState, "appointment_reminders")
+    if not state:
+        return {"last_run_at": None, "last_run_stats": None}
+    return {"last_run_at": state.last_run_at, "last_run_stats": state.last_run_stats}
+
+@app.get("/api/admin/calendly/sync")
+async def get_calendly_sync_state(db: AsyncSession = Depends(database.get_async_db)):
+    """Get the high-water mark and counters of the last Calendly reconciliation"""
+    state = await db.get(models.SyncState, "calendly_scheduled_events")
+    if not state:
+        return {"high_water_mark": None, "last_run_at": None, "last_run_stats": None}
+    return {
+        "high_water_mark": state.high_water_mark,
+        "last_run_at": state.last_run_at,
+        "last_run_stats": state.last_run_stats
+    }
+
+@app.post("/api/admin/calendly/sync")
+def run_calendly_sync():
+    """Reconcile appointments with Calendly now"""
+    try:
+        return calendly_reconciler.run()
+    except ReconciliationInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=f"Calendly integration disabled: {e}")
+    except Exception as e:
+        logger.error(f"Calendly reconciliation failed: {e}")
+        raise HTTPException(status_code=502, detail=f"Calendly reconciliation failed: {str(e)}")
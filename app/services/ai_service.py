@@ -1,33 +1,32 @@
 import os
-from typing import List, Dict
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Dict, Iterator, Optional, Tuple
+import httpx
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.runnables import Runnable
 from langchain.memory import ConversationBufferWindowMemory
 from langchain.chains import ConversationChain
 from langchain_core.prompts import MessagesPlaceholder, HumanMessagePromptTemplate, ChatPromptTemplate
+from app.services.doctor_ranker import DoctorRanker
+from app.services.session_store import SessionStore, load_turns
+from app.services.chat_history import get_chat_history_backend
+from app.services.recommendation_cache import get_recommendation_cache, roster_fingerprint
+from app.services.semantic_cache import get_semantic_cache
+from app.services.batching import MicroBatcher
+from app.services.llm_provider import make_chat_model
 load_dotenv()
-class DoctorRecommendation(BaseModel):
-    """The name and reasoning for a recommended doctor."""
-    recommended_doctor_name: str = Field(description="The full name of the single most suitable doctor from the provided list.")
-    reasoning: str = Field(description="A brief explanation for why this specific doctor was recommended based on the patient's symptoms.")
 
-class MedicalAIService:
-    def __init__(self):
-        self.llm = ChatOpenAI(model="gpt-4", temperature=0.1)
-        self.conversations: Dict[str, ConversationChain] = {}
+CHAT_MEMORY_TURNS = 4
+ROSTER_CACHE_SIZE = 64
 
-    def recommend_doctor(self, symptoms: str, doctors: List[Dict]) -> DoctorRecommendation:
-        """
-        Uses the modern LangChain .with_structured_output() method for reliable,
-        Pydantic-based recommendations.
-        """
-        doctor_list_str = "\n".join([f"- {d['doctor_name']}, Specialization: {d['specialization']}" for d in doctors])
-        
-        system_prompt = "You are a helpful medical assistant. Your task is to analyze the patient's symptoms and recommend the single most suitable doctor from the provided list."
-        
-        human_prompt = """
+RECOMMENDATION_SYSTEM_PROMPT = "You are a helpful medical assistant. Your task is to analyze the patient's symptoms and recommend the single most suitable doctor from the provided list."
+
+RECOMMENDATION_HUMAN_PROMPT = """
         Please recommend a doctor from the following list based on the patient's symptoms.
 
         **Available Doctors:**
@@ -36,33 +35,19 @@ class MedicalAIService:
         **Patient Symptoms:**
         {symptoms}
         """
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("human", human_prompt)
-        ])
-        structured_llm = self.llm.with_structured_output(DoctorRecommendation)
-        
-        chain = prompt | structured_llm
-        
-        try:
-            result = chain.invoke({
-                "doctors": doctor_list_str,
-                "symptoms": symptoms,
-            })
-            return result
-        except Exception as e:
-            print(f"CRITICAL ERROR in LangChain recommendation chain: {e}")
-            raise
 
-    def get_chat_response(self, session_id: str, query: str, doctors: List[Dict]) -> str:
-        """
-        Uses LangChain's ConversationChain with memory to provide contextual chat responses.
+BATCH_RECOMMENDATION_HUMAN_PROMPT = """
+        Please recommend a doctor from the following list for each of the patients below.
+        Return exactly one recommendation per patient, in the same order as the patients are numbered.
+
+        **Available Doctors:**
+        {doctors}
+
+        **Patients' Symptoms:**
+        {symptoms_list}
         """
-        if session_id not in self.conversations:
-            doctor_list_str = "\n".join([f"- {d['doctor_name']} specializes in {d['specialization']}." for d in doctors])
-            
-            system_prompt = f"""
+
+CHAT_SYSTEM_PROMPT = """
             You are a friendly and helpful AI assistant for the 'MediCare Wellness Center'.
             Your goal is to answer patient questions about our services, doctors, and general hospital information.
             You must not give medical advice. If asked for medical advice, politely refuse and recommend booking an appointment.
@@ -70,7 +55,7 @@ class MedicalAIService:
             Here is information about our hospital:
             - Hospital Name: MediCare Wellness Center
             - Our Doctors:
-            {doctor_list_str}
+            {doctors}
             - Our Services:
             - General Checkups
             - Pediatrics
@@ -79,25 +64,319 @@ class MedicalAIService:
             - Location: 123 Health St, Wellness City
             """
 
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", system_prompt),
-                MessagesPlaceholder(variable_name="history"),
-                HumanMessagePromptTemplate.from_template("{input}")
-            ])
-            
-            memory = ConversationBufferWindowMemory(k=4, return_messages=True)
+# Compiled once at import; per-roster variants are derived with .partial()
+RECOMMENDATION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", RECOMMENDATION_SYSTEM_PROMPT),
+    ("human", RECOMMENDATION_HUMAN_PROMPT)
+])
+
+BATCH_RECOMMENDATION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", RECOMMENDATION_SYSTEM_PROMPT),
+    ("human", BATCH_RECOMMENDATION_HUMAN_PROMPT)
+])
+
+CHAT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", CHAT_SYSTEM_PROMPT),
+    MessagesPlaceholder(variable_name="history"),
+    HumanMessagePromptTemplate.from_template("{input}")
+])
+
+class DoctorRecommendation(BaseModel):
+    """The name and reasoning for a recommended doctor."""
+    recommended_doctor_name: str = Field(description="The full name of the single most suitable doctor from the provided list.")
+    reasoning: str = Field(description="A brief explanation for why this specific doctor was recommended based on the patient's symptoms.")
+
+class BatchDoctorRecommendation(BaseModel):
+    """Recommendations for several patients, one per numbered symptom description and in the same order."""
+    recommendations: List[DoctorRecommendation] = Field(description="One recommendation per patient, in the order the patients were listed.")
+
+class MedicalAIService:
+    def __init__(self):
+        # One pooled HTTP client pair shared by every LLM call, so connections are reused
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+        )
+        self.http_client = httpx.Client(limits=limits)
+        self.http_async_client = httpx.AsyncClient(limits=limits)
+        self.llm = self._make_llm(temperature=0.1)
+        self.chat_llm = self._make_llm(temperature=0.5)
+        self.structured_llm = self.llm.with_structured_output(DoctorRecommendation)
+        self.batch_structured_llm = self.llm.with_structured_output(BatchDoctorRecommendation)
+        self._roster_objects: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._roster_lock = threading.Lock()
+        self.conversations = SessionStore(snapshot_turns=CHAT_MEMORY_TURNS)
+        self.history = get_chat_history_backend()
+        self.ranker = DoctorRanker()
+        self.recommendation_cache = get_recommendation_cache()
+        self.semantic_cache = get_semantic_cache()
+        self.llm_slots = asyncio.Semaphore(int(os.getenv("LLM_MAX_CONCURRENCY", "100")))
+        self.llm_timeout = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+        self.batcher = None
+        if os.getenv("RECOMMENDATION_BATCHING_ENABLED", "false").lower() in ("1", "true", "yes"):
+            self.batcher = MicroBatcher(
+                self._recommend_batch,
+                max_batch_size=int(os.getenv("RECOMMENDATION_BATCH_MAX_SIZE", "16")),
+                max_wait_seconds=float(os.getenv("RECOMMENDATION_BATCH_WAIT_MS", "20")) / 1000
+            )
+
+    def _rank_locally(self, symptoms: str, doctors: List[Dict]) -> Tuple[Optional[DoctorRecommendation], List[Dict]]:
+        """
+        Runs the local DoctorRanker: a clear winner is returned without calling
+        the LLM. Otherwise its short-listed candidates are sent to the model, or the
+        whole roster when the local match is too weak to short-list.
+        """
+        ranking = self.ranker.rank(symptoms, doctors)
+        if ranking.is_decisive:
+            tags = ", ".join(ranking.matched_tags.get(ranking.winner, []))
+            return DoctorRecommendation(
+                recommended_doctor_name=ranking.winner,
+                reasoning=f"The reported symptoms match {ranking.winner}'s areas of expertise: {tags}.",
+            ), doctors
+        return None, ranking.candidates or doctors
+
+    def _make_llm(self, temperature: float) -> BaseChatModel:
+        return make_chat_model(temperature, self.http_client, self.http_async_client)
+
+    def _for_roster(self, kind: str, doctors: List[Dict], build: Callable[[], Any]) -> Any:
+        """Returns the object built for this doctor roster, building it only when the roster is new."""
+        key = (kind, roster_fingerprint(doctors))
+        with self._roster_lock:
+            if key in self._roster_objects:
+                self._roster_objects.move_to_end(key)
+                return self._roster_objects[key]
+        built = build()
+        with self._roster_lock:
+            self._roster_objects[key] = built
+            while len(self._roster_objects) > ROSTER_CACHE_SIZE:
+                self._roster_objects.popitem(last=False)
+        return built
+
+    def _recommendation_chain(self, doctors: List[Dict]) -> Runnable:
+        def build():
+            doctor_list_str = "\n".join([f"- {d['doctor_name']}, Specialization: {d['specialization']}" for d in doctors])
+            return RECOMMENDATION_PROMPT.partial(doctors=doctor_list_str) | self.structured_llm
+        return self._for_roster("recommendation", doctors, build)
+
+    def _batch_recommendation_chain(self, doctors: List[Dict]) -> Runnable:
+        def build():
+            doctor_list_str = "\n".join([f"- {d['doctor_name']}, Specialization: {d['specialization']}" for d in doctors])
+            return BATCH_RECOMMENDATION_PROMPT.partial(doctors=doctor_list_str) | self.batch_structured_llm
+        return self._for_roster("batch_recommendation", doctors, build)
+
+    def _chat_prompt(self, doctors: List[Dict]) -> ChatPromptTemplate:
+        def build():
+            doctor_list_str = "\n".join([f"- {d['doctor_name']} specializes in {d['specialization']}." for d in doctors])
+            return CHAT_PROMPT.partial(doctors=doctor_list_str)
+        return self._for_roster("chat", doctors, build)
+
+    def _cached_recommendation(self, symptoms: str, doctors: List[Dict]) -> Optional[DoctorRecommendation]:
+        """Looks up a previous LLM answer for the same normalized symptoms and doctor roster."""
+        if not self.recommendation_cache:
+            return None
+        value = self.recommendation_cache.get(symptoms, doctors)
+        return DoctorRecommendation(**value) if value else None
+
+    def _similar_recommendation(self, symptoms: str, doctors: List[Dict]) -> Optional[DoctorRecommendation]:
+        """Reuses the answer to a near-duplicate symptom description, if one is close enough."""
+        if not self.semantic_cache:
+            return None
+        value = self.semantic_cache.get(symptoms, doctors)
+        return DoctorRecommendation(**value) if value else None
+
+    def _cache_recommendation(self, symptoms: str, doctors: List[Dict], result: DoctorRecommendation):
+        if not result:
+            return
+        if self.recommendation_cache:
+            self.recommendation_cache.set(symptoms, doctors, result.model_dump())
+        if self.semantic_cache:
+            self.semantic_cache.set(symptoms, doctors, result.model_dump())
+
+    async def _call_llm(self, awaitable: Awaitable):
+        """Await an LLM call under the per-process concurrency limit and timeout."""
+        async with self.llm_slots:
+            return await asyncio.wait_for(awaitable, timeout=self.llm_timeout)
+
+    def recommend_doctor(self, symptoms: str, doctors: List[Dict]) -> DoctorRecommendation:
+        """
+        Uses the modern LangChain .with_structured_output() method for reliable,
+        Pydantic-based recommendations.
+        """
+        cached = self._cached_recommendation(symptoms, doctors)
+        if cached:
+            return cached
+
+        local, candidates = self._rank_locally(symptoms, doctors)
+        if local:
+            return local
+
+        similar = self._similar_recommendation(symptoms, doctors)
+        if similar:
+            return similar
+
+        chain = self._recommendation_chain(candidates)
+        try:
+            result = chain.invoke({"symptoms": symptoms})
+            self._cache_recommendation(symptoms, doctors, result)
+            return result
+        except Exception as e:
+            print(f"CRITICAL ERROR in LangChain recommendation chain: {e}")
+            raise
+
+    async def _run_cache(self, call: Callable, *args):
+        """Run a recommendation-cache call, in a worker thread when the cache does database I/O."""
+        if self.recommendation_cache and self.recommendation_cache.blocking:
+            return await asyncio.to_thread(call, *args)
+        return call(*args)
+
+    async def arecommend_doctor(self, symptoms: str, doctors: List[Dict]) -> DoctorRecommendation:
+        """Async variant of recommend_doctor that never blocks the event loop on the LLM or a database cache."""
+        cached = await self._run_cache(self._cached_recommendation, symptoms, doctors)
+        if cached:
+            return cached
+
+        local, candidates = self._rank_locally(symptoms, doctors)
+        if local:
+            return local
+
+        similar = self._similar_recommendation(symptoms, doctors)
+        if similar:
+            return similar
+
+        try:
+            if self.batcher:
+                # Batched requests share one doctor-list preamble, so they use the full roster
+                result = await self.batcher.submit(roster_fingerprint(doctors), (symptoms, doctors))
+            else:
+                chain = self._recommendation_chain(candidates)
+                result = await self._call_llm(chain.ainvoke({"symptoms": symptoms}))
+            await self._run_cache(self._cache_recommendation, symptoms, doctors, result)
+            return result
+        except Exception as e:
+            print(f"CRITICAL ERROR in LangChain recommendation chain: {e!r}")
+            raise
+
+    async def _recommend_batch(self, items: List[Tuple[str, List[Dict]]]) -> List[DoctorRecommendation]:
+        """Answers a micro-batch of (symptoms, doctors) requests that share one roster with a single LLM call."""
+        doctors = items[0][1]
+        if len(items) == 1:
+            return [await self._call_llm(self._recommendation_chain(doctors).ainvoke({"symptoms": items[0][0]}))]
+
+        symptoms_list = "\n".join(f"{i}. {symptoms}" for i, (symptoms, _) in enumerate(items, start=1))
+        batch = await self._call_llm(self._batch_recommendation_chain(doctors).ainvoke({"symptoms_list": symptoms_list}))
+        if batch and len(batch.recommendations) == len(items):
+            return batch.recommendations
+
+        print(f"Batched recommendation returned a mismatched result for {len(items)} patients; retrying individually")
+        chain = self._recommendation_chain(doctors)
+        return await asyncio.gather(*(self._call_llm(chain.ainvoke({"symptoms": symptoms})) for symptoms, _ in items))
+
+    def _get_conversation(self, session_id: str, doctors: List[Dict]) -> ConversationChain:
+        """
+        Returns the session's ConversationChain, building it on first use.
+
+        With a persistent history backend the chain's memory is refreshed from the
+        stored window before each turn, so any worker can continue the session.
+        """
+        def build_conversation() -> ConversationChain:
+            memory = ConversationBufferWindowMemory(k=CHAT_MEMORY_TURNS, return_messages=True)
             
-            self.conversations[session_id] = ConversationChain(
-                llm=ChatOpenAI(model="gpt-4", temperature=0.5),
-                prompt=prompt,
+            return ConversationChain(
+                llm=self.chat_llm,
+                prompt=self._chat_prompt(doctors),
                 memory=memory,
                 verbose=False
             )
 
+        chain = self.conversations.get_or_create(session_id, build_conversation)
+        if self.history:
+            load_turns(chain, self.history.load_window(session_id, CHAT_MEMORY_TURNS))
+        return chain
+
+    def get_chat_response(self, session_id: str, query: str, doctors: List[Dict]) -> str:
+        """
+        Uses LangChain's ConversationChain with memory to provide contextual chat responses.
+        """
         try:
-            chain = self.conversations[session_id]
+            chain = self._get_conversation(session_id, doctors)
             response = chain.predict(input=query)
+            if self.history:
+                self.history.append_turn(session_id, query, response)
             return response
         except Exception as e:
             print(f"CRITICAL ERROR in LangChain conversation chain: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    async def aget_chat_response(self, session_id: str, query: str, doctors: List[Dict]) -> str:
+        """Async variant of get_chat_response; history I/O runs in a worker thread."""
+        try:
+            chain = await asyncio.to_thread(self._get_conversation, session_id, doctors)
+            response = await self._call_llm(chain.apredict(input=query))
+            if self.history:
+                await asyncio.to_thread(self.history.append_turn, session_id, query, response)
+            return response
+        except Exception as e:
+            print(f"CRITICAL ERROR in LangChain conversation chain: {e!r}")
+            raise
+
+    def stream_chat_response(self, session_id: str, query: str, doctors: List[Dict]) -> Iterator[str]:
+        """
+        Streams the assistant's reply token by token using the LLM's streaming interface.
+
+        The full reply is committed to the conversation memory (and history backend)
+        once the stream completes, exactly as get_chat_response would.
+        """
+        try:
+            chain = self._get_conversation(session_id, doctors)
+            history = chain.memory.load_memory_variables({})["history"]
+            messages = chain.prompt.format_messages(history=history, input=query)
+
+            chunks = []
+            for chunk in chain.llm.stream(messages):
+                if chunk.content:
+                    chunks.append(chunk.content)
+                    yield chunk.content
+
+            response = "".join(chunks)
+            chain.memory.save_context({"input": query}, {"response": response})
+            if self.history:
+                self.history.append_turn(session_id, query, response)
+        except Exception as e:
+            print(f"CRITICAL ERROR in LangChain streaming conversation: {e}")
+            raise
+
+    async def astream_chat_response(self, session_id: str, query: str, doctors: List[Dict]) -> AsyncIterator[str]:
+        """
+        Async variant of stream_chat_response. The stream holds one of the LLM
+        concurrency slots until it ends and fails with asyncio.TimeoutError once
+        it has run longer than the LLM timeout; history I/O runs in a worker thread.
+        """
+        try:
+            chain = await asyncio.to_thread(self._get_conversation, session_id, doctors)
+            history = chain.memory.load_memory_variables({})["history"]
+            messages = chain.prompt.format_messages(history=history, input=query)
+
+            chunks = []
+            async with self.llm_slots:
+                deadline = time.monotonic() + self.llm_timeout
+                stream = chain.llm.astream(messages).__aiter__()
+                try:
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(stream.__anext__(),
+                                                           timeout=max(deadline - time.monotonic(), 0))
+                        except StopAsyncIteration:
+                            break
+                        if chunk.content:
+                            chunks.append(chunk.content)
+                            yield chunk.content
+                finally:
+                    await stream.aclose()
+
+            response = "".join(chunks)
+            chain.memory.save_context({"input": query}, {"response": response})
+            if self.history:
+                await asyncio.to_thread(self.history.append_turn, session_id, query, response)
+        except Exception as e:
+            print(f"CRITICAL ERROR in LangChain streaming conversation: {e!r}")
+            raise
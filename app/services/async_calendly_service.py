@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from app.services.calendly_service import CalendlyService, CalendlyUnavailableError, get_calendly_service
+from app.services.resilience import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCalendlyService:
+    """
+    asyncio-native counterpart of CalendlyService for use inside async handlers.
+
+    Shares the synchronous service's configuration, circuit breaker, latency
+    metrics and organization URI, but talks to Calendly through one pooled
+    httpx.AsyncClient. Concurrent GETs of the same URI are coalesced into a
+    single in-flight request whose result every caller receives.
+    """
+
+    def __init__(self, service: CalendlyService):
+        self.service = service
+        self.client = httpx.AsyncClient(
+            headers=service.headers,
+            timeout=httpx.Timeout(service.timeout[1], connect=service.timeout[0]),
+            limits=httpx.Limits(max_connections=service.pool_size, max_keepalive_connections=service.pool_size)
+        )
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.coalesced = 0
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._in_flight), "coalesced": self.coalesced}
+
+    async def _request(self, method: str, endpoint: str, uri: str, **kwargs) -> httpx.Response:
+        """Same retry policy and circuit breaker as CalendlyService._request, without blocking the loop."""
+        url = self.service._url(uri)
+        call = self.service.retry_policy.call(method, endpoint, CalendlyUnavailableError)
+        while True:
+            call.begin()
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                delay = call.transport_failed(e)
+                if delay is None:
+                    raise
+            except BaseException:
+                call.aborted()
+                raise
+            else:
+                delay = call.responded(response.status_code, response.headers.get('Retry-After'))
+                if delay is None:
+                    response.raise_for_status()
+                    return response
+            await asyncio.sleep(delay)
+
+    async def _coalesced(self, key: str, call: Callable[[], Awaitable]):
+        """Run `call` once for all concurrent callers that ask for the same key."""
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+        future = asyncio.ensure_future(call())
+        self._in_flight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    async def _organization_uri(self) -> str:
+        if self.service._organization_uri is None:
+            return await asyncio.to_thread(lambda: self.service.organization_uri)
+        return self.service._organization_uri
+
+    async def get_event_type_from_uri(self, event_uri: str) -> Optional[dict]:
+        """Fetch event type details from Calendly API; like CalendlyService, None only for a 404 and raises otherwise"""
+        async def fetch():
+            try:
+                response = await self._request('GET', 'event_types/{uuid}', event_uri)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 404:
+                    logger.warning(f"Calendly has no event type {event_uri}")
+                    return None
+                logger.error(f"Failed to fetch event type from URI {event_uri}: {e}")
+                raise
+            except (httpx.HTTPError, CircuitOpenError) as e:
+                logger.error(f"Failed to fetch event type from URI {event_uri}: {e}")
+                raise
+            result = response.json().get("resource")
+            logger.info(f"Successfully fetched event type: {result.get('name', 'Unknown')}")
+            return result
+        return await self._coalesced(f"event_type:{event_uri}", fetch)
+
+    async def create_webhook(self, webhook_url: str, events: list) -> dict:
+        """Create a webhook subscription"""
+        data = {
+            'url': webhook_url,
+            'events': events,
+            'organization': await self._organization_uri(),
+            'scope': 'organization'
+        }
+        logger.info(f"Creating webhook with data: {data}")
+        try:
+            response = await self._request('POST', 'webhook_subscriptions', '/webhook_subscriptions', json=data)
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Error creating webhook: {e}")
+            logger.error(f"Response: {e.response.text}")
+            raise
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            logger.error(f"Error creating webhook: {e}")
+            raise
+        result = response.json()
+        logger.info(f"Webhook created successfully: {result}")
+        return result
+
+    async def get_webhooks(self) -> list:
+        """Get all webhook subscriptions"""
+        organization_uri = await self._organization_uri()
+
+        async def fetch():
+            try:
+                response = await self._request('GET', 'webhook_subscriptions', '/webhook_subscriptions',
+                                               params={'organization': organization_uri})
+                webhooks = response.json().get('collection', [])
+                logger.info(f"Found {len(webhooks)} existing webhooks")
+                return webhooks
+            except (httpx.HTTPError, CircuitOpenError) as e:
+                logger.error(f"Error fetching webhooks: {e}")
+                return []
+        return await self._coalesced(f"webhooks:{organization_uri}", fetch)
+
+    async def delete_webhook(self, webhook_uuid: str) -> bool:
+        """Delete a webhook subscription"""
+        try:
+            await self._request('DELETE', 'webhook_subscriptions/{uuid}', f"/webhook_subscriptions/{webhook_uuid}")
+            logger.info(f"Webhook {webhook_uuid} deleted successfully")
+            return True
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            logger.error(f"Error deleting webhook {webhook_uuid}: {e}")
+            return False
+
+
+_async_service: Optional[AsyncCalendlyService] = None
+_async_service_lock = threading.Lock()
+
+
+def get_async_calendly_service() -> AsyncCalendlyService:
+    """Shared AsyncCalendlyService, built on first use around the shared CalendlyService."""
+    global _async_service
+    if _async_service is None:
+        with _async_service_lock:
+            if _async_service is None:
+                _async_service = AsyncCalendlyService(get_calendly_service())
+    return _async_service
+
+
+async def close_async_calendly_service() -> None:
+    """Close the shared client if one was built; never constructs one (and so never needs Calendly settings)."""
+    global _async_service
+    with _async_service_lock:
+        service, _async_service = _async_service, None
+    if service is not None:
+        await service.aclose()
@@ -1,14 +1,25 @@
 import os
+import json
+import threading
 import requests
 import logging
 from dotenv import load_dotenv
 import hmac
 import hashlib
 import time
+from typing import Optional
+from requests.adapters import HTTPAdapter
+from app.services.resilience import CircuitBreaker, CircuitOpenError, LatencyRecorder, RetryPolicy
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+CALENDLY_PUBLIC_API = "https://api.calendly.com"
+
+
+class CalendlyUnavailableError(requests.exceptions.RequestException, CircuitOpenError):
+    """The Calendly circuit breaker is open; the call was not attempted."""
+
 def verify_webhook_signature(signature_header: str, body: bytes) -> bool:
     webhook_secret = os.getenv("CALENDLY_WEBHOOK_SECRET")
     if not webhook_secret or webhook_secret == "your_webhook_secret_here":
@@ -67,46 +78,167 @@ class CalendlyService:
         if not self.api_token or not self.user_uri:
             raise ValueError("Calendly API token and user URI must be set")
         
-        self.base_url = "https://api.calendly.com"
+        self.base_url = os.getenv('CALENDLY_API_BASE_URL', CALENDLY_PUBLIC_API).rstrip('/')
         self.headers = {
             'Authorization': f'Bearer {self.api_token}', 
             'Content-Type': 'application/json'
         }
+        self.timeout = (
+            float(os.getenv('CALENDLY_CONNECT_TIMEOUT_SECONDS', '3')),
+            float(os.getenv('CALENDLY_READ_TIMEOUT_SECONDS', '10'))
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv('CALENDLY_CIRCUIT_FAILURES', '5')),
+            reset_seconds=float(os.getenv('CALENDLY_CIRCUIT_RESET_SECONDS', '30'))
+        )
+        self.metrics = LatencyRecorder()
+        self.retry_policy = RetryPolicy(
+            "Calendly", self.breaker, self.metrics,
+            max_retries=int(os.getenv('CALENDLY_MAX_RETRIES', '3')),
+            base_seconds=float(os.getenv('CALENDLY_RETRY_BASE_SECONDS', '0.5')),
+            max_seconds=float(os.getenv('CALENDLY_RETRY_MAX_SECONDS', '10'))
+        )
+        
+        # One keep-alive pool for every Calendly call made by this process
+        self.pool_size = int(os.getenv('CALENDLY_POOL_SIZE', '10'))
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size))
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size))
+        
+        # Organization lookup and webhook setup happen in start(), off the import path
+        self.cache_path = os.getenv('CALENDLY_CACHE_PATH', '.calendly_cache.json')
+        self.cache_ttl_seconds = float(os.getenv('CALENDLY_CACHE_TTL_SECONDS', '604800'))
+        self._organization_uri: Optional[str] = None
+        self._organization_lock = threading.Lock()
+        self.startup = {"state": "pending", "organization_source": None, "seconds": None, "error": None}
+
+    @property
+    def organization_uri(self) -> str:
+        """Organization URI (required for webhooks), resolved once from the disk cache or /users/me."""
+        if self._organization_uri is None:
+            with self._organization_lock:
+                if self._organization_uri is None:
+                    self._organization_uri = self._load_organization_uri()
+        return self._organization_uri
+
+    def _read_cache(self) -> dict:
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _load_organization_uri(self) -> str:
+        cached = self._read_cache().get(self.user_uri)
+        if cached and time.time() - cached.get("resolved_at", 0) < self.cache_ttl_seconds:
+            self.startup["organization_source"] = "disk cache"
+            return cached["organization_uri"]
         
-        # Get organization URI (required for webhooks)
-        self.organization_uri = self._get_organization_uri()
+        org_uri = self._get_organization_uri()
+        if org_uri is not None:
+            self.startup["organization_source"] = "api"
+            cache = self._read_cache()
+            cache[self.user_uri] = {"organization_uri": org_uri, "resolved_at": time.time()}
+            try:
+                with open(self.cache_path, "w") as f:
+                    json.dump(cache, f)
+            except OSError as e:
+                logger.warning(f"Could not write Calendly cache {self.cache_path}: {e}")
+            return org_uri
         
-        # Setup webhooks on initialization
+        # Fallback - this might not work for webhooks but prevents crashes (not cached, retried next start)
+        self.startup["organization_source"] = "fallback"
+        return self.user_uri.replace('/users/', '/organizations/')
+
+    def start(self) -> None:
+        """Resolve the organization and reconcile webhook subscriptions; run as a background startup task."""
+        started = time.perf_counter()
         try:
-            self.setup_webhooks()
+            self.organization_uri
+            webhooks_ok = self.setup_webhooks()
+            fallback = self.startup["organization_source"] == "fallback"
+            self.startup["state"] = "ready" if webhooks_ok and not fallback else "degraded"
         except Exception as e:
             logger.error(f"Error setting up webhooks during initialization: {e}")
+            self.startup["state"] = "failed"
+            self.startup["error"] = str(e)
+        self.startup["seconds"] = time.perf_counter() - started
+
+    def _url(self, uri: str) -> str:
+        """Absolute URL for an API path or a Calendly resource URI, honouring CALENDLY_API_BASE_URL."""
+        if uri.startswith(CALENDLY_PUBLIC_API):
+            uri = uri[len(CALENDLY_PUBLIC_API):]
+        if uri.startswith('http://') or uri.startswith('https://'):
+            return uri
+        return f"{self.base_url}{uri}"
+
+    def _request(self, method: str, endpoint: str, uri: str, **kwargs) -> requests.Response:
+        """
+        Call the Calendly API through the pooled session under the shared retry policy
+        (see RetryPolicy): transient failures are retried with backoff, and repeated ones
+        open a circuit breaker so callers fail fast while Calendly is down. Raises requests
+        exceptions like the plain requests calls did.
+        """
+        url = self._url(uri)
+        call = self.retry_policy.call(method, endpoint, CalendlyUnavailableError)
+        while True:
+            call.begin()
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                delay = call.transport_failed(e)
+                if delay is None:
+                    raise
+            except BaseException:
+                call.aborted()
+                raise
+            else:
+                delay = call.responded(response.status_code, response.headers.get('Retry-After'))
+                if delay is None:
+                    response.raise_for_status()
+                    return response
+            time.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "startup": self.startup,
+            "circuit": self.breaker.state,
+            "endpoints": self.metrics.stats()
+        }
 
-    def _get_organization_uri(self) -> str:
+    def _get_organization_uri(self) -> Optional[str]:
         """Get organization URI from user info (required for webhook creation)"""
         try:
-            response = requests.get(f"{self.base_url}/users/me", headers=self.headers)
-            response.raise_for_status()
+            response = self._request('GET', 'users/me', '/users/me')
             user_data = response.json()
             org_uri = user_data['resource']['current_organization']
             logger.info(f"Found organization URI: {org_uri}")
             return org_uri
         except Exception as e:
             logger.error(f"Error getting organization URI: {e}")
-            # Fallback - this might not work for webhooks but prevents crashes
-            return self.user_uri.replace('/users/', '/organizations/')
+            return None
 
-    def get_event_type_from_uri(self, event_uri: str) -> dict:
-        """Fetch event type details from Calendly API"""
+    def get_event_type_from_uri(self, event_uri: str) -> Optional[dict]:
+        """
+        Fetch event type details from Calendly API; None only when Calendly has no such
+        event type (404). Outages, server errors and an open circuit raise, so callers
+        retry later instead of treating the event type as unknown.
+        """
         try:
-            response = requests.get(event_uri, headers=self.headers)
-            response.raise_for_status()
-            result = response.json().get("resource")
-            logger.info(f"Successfully fetched event type: {result.get('name', 'Unknown')}")
-            return result
+            response = self._request('GET', 'event_types/{uuid}', event_uri)
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                logger.warning(f"Calendly has no event type {event_uri}")
+                return None
+            logger.error(f"Failed to fetch event type from URI {event_uri}: {e}")
+            raise
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to fetch event type from URI {event_uri}: {e}")
-            return None
+            raise
+        result = response.json().get("resource")
+        logger.info(f"Successfully fetched event type: {result.get('name', 'Unknown')}")
+        return result
 
     def create_webhook(self, webhook_url: str, events: list) -> dict:
         """Create a webhook subscription"""
@@ -120,12 +252,7 @@ class CalendlyService:
             
             logger.info(f"Creating webhook with data: {data}")
             
-            response = requests.post(
-                f"{self.base_url}/webhook_subscriptions",
-                headers=self.headers,
-                json=data
-            )
-            response.raise_for_status()
+            response = self._request('POST', 'webhook_subscriptions', '/webhook_subscriptions', json=data)
             result = response.json()
             logger.info(f"Webhook created successfully: {result}")
             return result
@@ -140,12 +267,7 @@ class CalendlyService:
         """Get all webhook subscriptions"""
         try:
             params = {'organization': self.organization_uri}
-            response = requests.get(
-                f"{self.base_url}/webhook_subscriptions",
-                headers=self.headers,
-                params=params
-            )
-            response.raise_for_status()
+            response = self._request('GET', 'webhook_subscriptions', '/webhook_subscriptions', params=params)
             webhooks = response.json().get('collection', [])
             logger.info(f"Found {len(webhooks)} existing webhooks")
             return webhooks
@@ -157,11 +279,7 @@ class CalendlyService:
     def delete_webhook(self, webhook_uuid: str) -> bool:
         """Delete a webhook subscription"""
         try:
-            response = requests.delete(
-                f"{self.base_url}/webhook_subscriptions/{webhook_uuid}",
-                headers=self.headers
-            )
-            response.raise_for_status()
+            response = self._request('DELETE', 'webhook_subscriptions/{uuid}', f"/webhook_subscriptions/{webhook_uuid}")
             logger.info(f"Webhook {webhook_uuid} deleted successfully")
             return True
             
@@ -169,6 +287,22 @@ class CalendlyService:
             logger.error(f"Error deleting webhook {webhook_uuid}: {e}")
             return False
 
+    def list_scheduled_events(self, page_token: Optional[str] = None, min_start_time: Optional[str] = None,
+                              count: int = 100) -> dict:
+        """Get one page of the organization's scheduled events, oldest start time first"""
+        params = {'organization': self.organization_uri, 'count': count, 'sort': 'start_time:asc'}
+        if page_token:
+            params['page_token'] = page_token
+        if min_start_time:
+            params['min_start_time'] = min_start_time
+        response = self._request('GET', 'scheduled_events', '/scheduled_events', params=params)
+        return response.json()
+
+    def get_event_invitees(self, event_uri: str) -> list:
+        """Get the invitees of a scheduled event"""
+        response = self._request('GET', 'scheduled_events/{uuid}/invitees', f"{event_uri}/invitees")
+        return response.json().get('collection', [])
+
     def setup_webhooks(self) -> bool:
         """Setup required webhooks for the application"""
         try:
@@ -223,4 +357,18 @@ class CalendlyService:
             response = requests.post(test_url, json={'test': True}, timeout=5)
             return True 
         except:
-            return False
\ No newline at end of file
+            return False
+
+
+_service: Optional[CalendlyService] = None
+_service_lock = threading.Lock()
+
+
+def get_calendly_service() -> CalendlyService:
+    """Shared CalendlyService, constructed on first use so importing the app never needs Calendly settings."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = CalendlyService()
+    return _service
@@ -0,0 +1,245 @@
+import logging
+import os
+import threading
+import uuid
+
+import requests
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.database import models
+from app.database.database import SessionLocal
+from app.services.calendly_service import CalendlyService
+from app.services.doctor_resolver import DoctorResolver
+
+logger = logging.getLogger(__name__)
+
+SYNC_NAME = "calendly_scheduled_events"
+
+
+class ReconciliationInProgress(Exception):
+    """Raised by CalendlyReconciler.run while another run is still going."""
+
+
+def parse_calendly_time(value: Optional[str]) -> Optional[datetime]:
+    """Calendly ISO 8601 timestamp as a naive UTC datetime, the way appointment times are stored."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def ensure_patient(db: Session, email: str, name: str) -> models.Patient:
+    """Find a patient by email, or create a minimal record for someone who booked directly on Calendly."""
+    patient = db.query(models.Patient).filter(models.Patient.email == email).first()
+    if patient:
+        return patient
+
+    name_parts = (name or "").strip().split()
+    first_name = name_parts[0] if name_parts else ""
+    last_name = " ".join(name_parts[1:]) if len(name_parts) > 1 else ""
+
+    patient = models.Patient(
+        patient_id=str(uuid.uuid4()),
+        first_name=first_name,
+        last_name=last_name,
+        email=email,
+        date_of_birth=date(2000, 1, 1),
+        gender="Not specified",
+        cell_phone="",
+        street_address="To be updated",
+        city="To be updated",
+        state="NA",
+        zip_code="00000",
+        emergency_contact_name="To be updated",
+        emergency_contact_relationship="To be updated",
+        emergency_contact_phone="To be updated",
+        primary_insurance_company="To be updated",
+        primary_member_id="To be updated",
+        primary_reason_for_visit="Scheduled via Calendly",
+        symptom_duration="Not specified",
+        current_symptoms=[],
+        has_known_allergies="Not specified",
+        had_allergy_testing="Not specified",
+        had_severe_allergic_reaction="Not specified",
+        current_allergy_medications=[],
+        medical_conditions=[],
+        understands_medication_instructions="Not specified"
+    )
+    db.add(patient)
+    db.commit()
+    db.refresh(patient)
+    logger.info(f"Created minimal patient record: {email}")
+    return patient
+
+
+class CalendlyReconciler:
+    """
+    Brings the appointments table back in line with Calendly when webhooks were lost.
+
+    Each run pages through the organization's scheduled events starting
+    `lookback_days` ago and only looks at events whose `updated_at` is newer than
+    the high-water mark stored in `sync_state` (Calendly cannot filter on update
+    time itself). Changed events are diffed per page against Appointment rows by
+    calendly_event_uri: reschedules and cancellations become one bulk update,
+    events missing locally are created from their invitee. The mark only advances
+    after a complete run, so an interrupted run is simply repeated, and never past
+    an event that could not be reconciled (no matching doctor yet, or a Calendly
+    error while creating it), so the next run tries that event again. One run at
+    a time: a second caller gets ReconciliationInProgress instead of racing the
+    first on the same events and mark.
+    """
+
+    def __init__(self, service_factory: Callable[[], CalendlyService], resolver: DoctorResolver,
+                 session_factory: Callable[[], Session] = SessionLocal):
+        self.service_factory = service_factory
+        self.resolver = resolver
+        self.session_factory = session_factory
+        self.lookback_days = float(os.getenv("CALENDLY_RECONCILE_LOOKBACK_DAYS", "7"))
+        self.page_size = int(os.getenv("CALENDLY_RECONCILE_PAGE_SIZE", "100"))
+        self.interval_seconds = float(os.getenv("CALENDLY_RECONCILE_INTERVAL_SECONDS", "900"))
+        self._lock = threading.Lock()
+
+    def run(self) -> Dict[str, int]:
+        if not self._lock.acquire(blocking=False):
+            raise ReconciliationInProgress("A Calendly reconciliation is already running")
+        try:
+            return self._run()
+        finally:
+            self._lock.release()
+
+    def _run(self) -> Dict[str, int]:
+        service = self.service_factory()
+        db = self.session_factory()
+        try:
+            state = db.get(models.SyncState, SYNC_NAME) or models.SyncState(name=SYNC_NAME)
+            high_water_mark = parse_calendly_time(state.high_water_mark)
+            newest = high_water_mark
+            held_at = None
+            min_start_time = (datetime.utcnow() - timedelta(days=self.lookback_days)).strftime('%Y-%m-%dT%H:%M:%S.000000Z')
+
+            stats = Counter()
+            page_token = None
+            while True:
+                page = service.list_scheduled_events(page_token=page_token, min_start_time=min_start_time,
+                                                     count=self.page_size)
+                events = page.get('collection', [])
+                stats['pages'] += 1
+                stats['seen'] += len(events)
+
+                changed = []
+                for event in events:
+                    updated_at = parse_calendly_time(event.get('updated_at'))
+                    if high_water_mark is None or updated_at is None or updated_at >= high_water_mark:
+                        changed.append(event)
+                    if updated_at and (newest is None or updated_at > newest):
+                        newest = updated_at
+                if changed:
+                    for pending in self._apply(db, service, changed, stats):
+                        # Keep the mark at or before this event so the next run retries it
+                        updated_at = parse_calendly_time(pending.get('updated_at'))
+                        if updated_at and (held_at is None or updated_at < held_at):
+                            held_at = updated_at
+
+                page_token = (page.get('pagination') or {}).get('next_page_token')
+                if not page_token:
+                    break
+
+            if held_at and newest and held_at < newest:
+                newest = held_at
+            state.high_water_mark = newest.isoformat() + 'Z' if newest else state.high_water_mark
+            state.last_run_at = datetime.utcnow()
+            state.last_run_stats = dict(stats)
+            db.merge(state)
+            db.commit()
+            logger.info(f"Calendly reconciliation finished: {dict(stats)}")
+            return dict(stats)
+        finally:
+            db.close()
+
+    def _apply(self, db: Session, service: CalendlyService, events: List[dict], stats: Counter) -> List[dict]:
+        """Reconcile one page of changed events; returns the events that could not be reconciled yet."""
+        uris = [event['uri'] for event in events]
+        existing = {
+            appointment.calendly_event_uri: appointment
+            for appointment in db.query(models.Appointment).filter(models.Appointment.calendly_event_uri.in_(uris))
+        }
+
+        updates, pending = [], []
+        for event in events:
+            appointment = existing.get(event['uri'])
+            start_time = parse_calendly_time(event.get('start_time'))
+            end_time = parse_calendly_time(event.get('end_time'))
+            canceled = event.get('status') == 'canceled'
+
+            if appointment is None:
+                if canceled:
+                    stats['skipped_canceled'] += 1
+                    continue
+                try:
+                    outcome = self._create(db, service, event, start_time, end_time)
+                except requests.exceptions.RequestException as e:
+                    # Calendly outage or open circuit, raised before anything was written: retry next run
+                    logger.warning(f"Could not reconcile scheduled event {event['uri']}: {e}")
+                    outcome = 'failed'
+                stats[outcome] += 1
+                if outcome in ('unmatched', 'failed'):
+                    pending.append(event)
+                continue
+
+            changes = {}
+            if start_time and appointment.appointment_time != start_time:
+                changes['appointment_time'] = start_time
+            if end_time and appointment.end_time != end_time:
+                changes['end_time'] = end_time
+            if canceled and appointment.status != 'canceled':
+                changes['status'] = 'canceled'
+            if changes:
+                updates.append({'appointment_id': appointment.appointment_id, **changes})
+            else:
+                stats['unchanged'] += 1
+
+        if updates:
+            db.bulk_update_mappings(models.Appointment, updates)
+            stats['updated'] += len(updates)
+        db.commit()
+        return pending
+
+    def _create(self, db: Session, service: CalendlyService, event: dict,
+                start_time: Optional[datetime], end_time: Optional[datetime]) -> str:
+        """
+        Create the appointment a lost invitee.created webhook would have created. Returns the
+        outcome counted in the run stats; Calendly errors propagate so the event is retried.
+        """
+        resolution = self.resolver.resolve(db, event.get('event_type'))
+        if not resolution:
+            logger.warning(f"Could not find doctor for scheduled event {event['uri']}")
+            return 'unmatched'
+        invitees = [i for i in service.get_event_invitees(event['uri']) if i.get('status', 'active') == 'active']
+        if not invitees:
+            return 'no_active_invitee'
+        invitee = invitees[0]
+        if db.query(models.Appointment.appointment_id).filter(
+            models.Appointment.calendly_invitee_uri == invitee.get('uri')
+        ).first():
+            return 'invitee_already_booked'
+
+        patient = ensure_patient(db, invitee.get('email'), invitee.get('name', ''))
+        db.add(models.Appointment(
+            patient_id=patient.patient_id,
+            doctor_id=resolution.doctor_id,
+            calendly_event_uri=event['uri'],
+            calendly_invitee_uri=invitee.get('uri'),
+            appointment_time=start_time,
+            end_time=end_time,
+            reschedule_url=invitee.get('reschedule_url', ''),
+            cancel_url=invitee.get('cancel_url', ''),
+            status="scheduled"
+        ))
+        logger.info(f"Recovered missing appointment for {invitee.get('email')} from {event['uri']}")
+        return 'created'
@@ -0,0 +1,76 @@
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.database import models
+from app.database.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+Turn = Tuple[str, str]  # (role, content) with role in {"human", "ai"}
+
+
+class ChatHistoryBackend(ABC):
+    """Append-only store of chat turns, read back as a bounded recent window."""
+
+    @abstractmethod
+    def append_turn(self, session_id: str, human: str, ai: str) -> None:
+        ...
+
+    @abstractmethod
+    def load_window(self, session_id: str, max_turns: int) -> List[Turn]:
+        ...
+
+
+class SQLChatHistory(ChatHistoryBackend):
+    """Chat history kept in the `chat_messages` table of the application database."""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+
+    def append_turn(self, session_id: str, human: str, ai: str) -> None:
+        db = self.session_factory()
+        try:
+            db.add_all([
+                models.ChatMessage(session_id=session_id, role="human", content=human),
+                models.ChatMessage(session_id=session_id, role="ai", content=ai),
+            ])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def load_window(self, session_id: str, max_turns: int) -> List[Turn]:
+        if max_turns <= 0:
+            return []
+        db = self.session_factory()
+        try:
+            rows = db.query(models.ChatMessage.role, models.ChatMessage.content).filter(
+                models.ChatMessage.session_id == session_id
+            ).order_by(
+                models.ChatMessage.message_id.desc()
+            ).limit(max_turns * 2).all()
+            return [(row.role, row.content) for row in reversed(rows)]
+        finally:
+            db.close()
+
+
+def get_chat_history_backend() -> Optional[ChatHistoryBackend]:
+    """
+    Resolve the backend named by CHAT_HISTORY_BACKEND.
+
+    "sqlite" (default) persists turns in the application database so any worker
+    can continue a session; "memory" keeps history only in the serving process.
+    """
+    backend = os.getenv("CHAT_HISTORY_BACKEND", "sqlite").lower()
+    if backend in ("sqlite", "sql", "database"):
+        return SQLChatHistory()
+    if backend in ("memory", "none", ""):
+        return None
+    logger.warning(f"Unknown CHAT_HISTORY_BACKEND '{backend}', falling back to in-process memory")
+    return None
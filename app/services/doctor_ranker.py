@@ -0,0 +1,203 @@
+import math
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+# Patient phrasing -> specialization tags it points at. Keys are matched as whole
+# phrases against the normalized symptom text; values are tags as they appear in
+# Doctor.specialization (case-insensitive).
+DEFAULT_SYNONYMS: Dict[str, List[str]] = {
+    "sneezing": ["Rhinitis", "Environmental Allergies"],
+    "runny nose": ["Rhinitis"],
+    "stuffy nose": ["Rhinitis", "Sinus Infections"],
+    "nasal congestion": ["Rhinitis", "Sinus Infections"],
+    "congestion": ["Sinus Infections"],
+    "itchy eyes": ["Environmental Allergies"],
+    "watery eyes": ["Environmental Allergies"],
+    "hay fever": ["Environmental Allergies", "Rhinitis"],
+    "pollen": ["Environmental Allergies"],
+    "dust": ["Environmental Allergies"],
+    "pet dander": ["Environmental Allergies"],
+    "seasonal allergies": ["Environmental Allergies"],
+    "sinus": ["Sinus Infections"],
+    "cough": ["Chronic Cough"],
+    "coughing": ["Chronic Cough"],
+    "breathing": ["Shortness of Breath", "Respiratory Medicine"],
+    "breathless": ["Shortness of Breath"],
+    "chest tightness": ["Asthma"],
+    "shellfish": ["Food Allergies"],
+    "peanut": ["Food Allergies"],
+    "swelling": ["Anaphylaxis", "Allergic Skin Reactions"],
+    "penicillin": ["Drug Allergies"],
+    "itchy rash": ["Skin Rash", "Allergic Skin Reactions"],
+    "itchiness": ["Eczema", "Skin Conditions"],
+    "itchy skin": ["Eczema", "Skin Conditions"],
+    "dry skin": ["Eczema", "Skin Conditions"],
+    "red patches": ["Eczema", "Psoriasis"],
+    "redness": ["Skin Rash"],
+    "pimples": ["Acne"],
+    "breakout": ["Acne"],
+    "oily skin": ["Acne"],
+    "mole": ["Mole Removal", "Skin Cancer"],
+    "blood pressure": ["High Blood Pressure"],
+    "hypertension": ["High Blood Pressure"],
+    "blood sugar": ["Diabetes"],
+    "fatigue": ["General Health", "Primary Care"],
+    "checkup": ["Wellness Exams", "Preventive Care"],
+    "check up": ["Wellness Exams", "Preventive Care"],
+    "physical": ["Wellness Exams"],
+    "vaccine": ["Vaccinations"],
+    "child": ["Pediatrics"],
+    "fever": ["Primary Care", "General Health"],
+}
+
+_STOPWORDS = {"and", "or", "of", "the", "a", "an", "in", "on", "with", "for", "to", "my", "is", "at"}
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _stem(token: str) -> str:
+    """Very small suffix stripper so 'allergies'/'allergy' and 'rashes'/'rash' meet."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith("es") and token[-3] in "hsx":
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(t) for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _normalize_phrase(text: str) -> str:
+    return " ".join(_TOKEN_RE.findall(text.lower()))
+
+
+@dataclass
+class RankingResult:
+    """Outcome of scoring one symptom description against the doctor roster."""
+    scores: Dict[str, float]
+    matched_tags: Dict[str, List[str]]
+    winner: Optional[str] = None
+    candidates: List[Dict] = field(default_factory=list)
+
+    @property
+    def is_decisive(self) -> bool:
+        return self.winner is not None
+
+
+class _SpecializationIndex:
+    """Inverted index from specialization term to the doctors (and tags) carrying it."""
+
+    def __init__(self, doctors: List[Dict]):
+        self.doctors = doctors
+        self.postings: Dict[str, Dict[str, Set[str]]] = {}
+        self.tags_by_key: Dict[str, List[Tuple[str, str]]] = {}
+
+        for doctor in doctors:
+            name = doctor["doctor_name"]
+            for tag in (doctor.get("specialization") or "").split(","):
+                tag = tag.strip()
+                if not tag:
+                    continue
+                self.tags_by_key.setdefault(tag.lower(), []).append((name, tag))
+                for term in set(tokenize(tag)):
+                    self.postings.setdefault(term, {}).setdefault(name, set()).add(tag)
+
+        total = max(len(doctors), 1)
+        self.idf = {
+            term: 1.0 + math.log(total / len(by_doctor))
+            for term, by_doctor in self.postings.items()
+        }
+
+
+class DoctorRanker:
+    """
+    Deterministic local scorer for doctor recommendations.
+
+    Symptom text is tokenized and expanded through a synonym table, then scored
+    against an inverted index of the comma-separated Doctor.specialization tags.
+    When one doctor leads by at least `margin`, the caller can answer without the
+    LLM. When the leaders are close, `candidates` holds the short-list worth
+    sending to it (the runner-up always included); when the match is too weak to
+    trust, `candidates` is empty and the whole roster should be sent.
+    """
+
+    def __init__(self, synonyms: Optional[Dict[str, List[str]]] = None,
+                 margin: Optional[float] = None, min_score: Optional[float] = None,
+                 candidate_ratio: float = 0.5):
+        self.synonyms = {
+            _normalize_phrase(phrase): tags
+            for phrase, tags in (synonyms if synonyms is not None else DEFAULT_SYNONYMS).items()
+        }
+        self.margin = margin if margin is not None else float(os.getenv("DOCTOR_RANKER_MARGIN", "2.0"))
+        self.min_score = min_score if min_score is not None else float(os.getenv("DOCTOR_RANKER_MIN_SCORE", "3.0"))
+        self.candidate_ratio = candidate_ratio
+        # (roster fingerprint, index) swapped as one object, so a reader never pairs one roster's
+        # fingerprint with another roster's index
+        self._current: Optional[Tuple[Tuple, _SpecializationIndex]] = None
+        self._lock = threading.Lock()
+
+    def _get_index(self, doctors: List[Dict]) -> _SpecializationIndex:
+        fingerprint = tuple((d["doctor_name"], d.get("specialization") or "") for d in doctors)
+        current = self._current
+        if current and current[0] == fingerprint:
+            return current[1]
+        with self._lock:
+            current = self._current
+            if current and current[0] == fingerprint:
+                return current[1]
+            index = _SpecializationIndex(doctors)
+            self._current = (fingerprint, index)
+            return index
+
+    def rank(self, symptoms: str, doctors: List[Dict]) -> RankingResult:
+        """Score every doctor for the given symptoms; rebuilds the index if the roster changed."""
+        index = self._get_index(doctors)
+        scores: Dict[str, float] = {d["doctor_name"]: 0.0 for d in doctors}
+        matched: Dict[str, Set[str]] = {d["doctor_name"]: set() for d in doctors}
+
+        # Synonym phrases point straight at whole tags and count as a full tag hit.
+        padded = f" {_normalize_phrase(symptoms)} "
+        for phrase, tags in self.synonyms.items():
+            if f" {phrase} " not in padded:
+                continue
+            for tag in tags:
+                for name, original_tag in index.tags_by_key.get(tag.lower(), []):
+                    if original_tag not in matched[name]:
+                        matched[name].add(original_tag)
+                        scores[name] += 1.0 + max(
+                            (index.idf.get(t, 1.0) for t in tokenize(original_tag)), default=1.0
+                        )
+
+        for term in set(tokenize(symptoms)):
+            for name, tags in index.postings.get(term, {}).items():
+                scores[name] += index.idf[term]
+                matched[name].update(tags)
+
+        result = RankingResult(
+            scores=scores,
+            matched_tags={name: sorted(tags) for name, tags in matched.items() if tags},
+        )
+
+        ordered = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if not ordered or ordered[0][1] <= 0:
+            return result
+
+        top_name, top_score = ordered[0]
+        runner_up = ordered[1][1] if len(ordered) > 1 else 0.0
+        if top_score < self.min_score:
+            # Too little evidence to narrow the roster down
+            return result
+        if top_score - runner_up >= self.margin:
+            result.winner = top_name
+            return result
+
+        threshold = min(top_score * self.candidate_ratio, runner_up)
+        candidates = [d for d in doctors if scores[d["doctor_name"]] >= threshold and scores[d["doctor_name"]] > 0]
+        if len(candidates) >= 2:
+            result.candidates = candidates
+        return result
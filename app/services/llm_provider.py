@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+import typing
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_openai import ChatOpenAI
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
+
+_DOCTOR_LINE_RE = re.compile(r"^\s*- (.+?), Specialization:", re.MULTILINE)
+_NUMBERED_LINE_RE = re.compile(r"^\s*\d+\.\s", re.MULTILINE)
+
+
+class LatencyModel:
+    """
+    Samples simulated model latencies, in seconds.
+
+    Specs: "constant:MS", "uniform:MIN_MS,MAX_MS", "lognormal:MEDIAN_MS,SIGMA",
+    or "replay:PATH" to draw from recorded latencies (one millisecond value per line).
+    """
+
+    def __init__(self, spec: str = "constant:0", seed: Optional[int] = None):
+        self.spec = spec
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        kind, _, args = spec.partition(":")
+        self.kind = kind.strip().lower()
+        if self.kind == "replay":
+            with open(args.strip()) as f:
+                self._samples = [float(line) for line in f if line.strip()]
+            if not self._samples:
+                raise ValueError(f"No latency samples found in {args.strip()}")
+        else:
+            self._params = [float(value) for value in args.split(",") if value.strip()] or [0.0]
+            if self.kind not in ("constant", "uniform", "lognormal"):
+                raise ValueError(f"Unknown latency distribution '{kind}'")
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "replay":
+                ms = self._random.choice(self._samples)
+            elif self.kind == "uniform":
+                ms = self._random.uniform(self._params[0], self._params[1])
+            elif self.kind == "lognormal":
+                median, sigma = self._params[0], self._params[1] if len(self._params) > 1 else 0.5
+                ms = self._random.lognormvariate(0.0, sigma) * median
+            else:
+                ms = self._params[0]
+        return max(ms, 0.0) / 1000
+
+
+def _prompt_text(messages: List[BaseMessage]) -> str:
+    return "\n".join(str(m.content) for m in messages)
+
+
+def _stable_index(text: str, size: int) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little") % size
+
+
+def _fake_structured(schema: type, text: str) -> BaseModel:
+    """Deterministically fill a Pydantic schema from the prompt text."""
+    doctors = _DOCTOR_LINE_RE.findall(text)
+    values: Dict[str, Any] = {}
+    for name, field in schema.model_fields.items():
+        annotation = field.annotation
+        item_type = typing.get_args(annotation)[0] if typing.get_origin(annotation) in (list, List) else None
+        if name == "recommended_doctor_name":
+            values[name] = doctors[_stable_index(text, len(doctors))] if doctors else "Unknown"
+        elif item_type is not None and isinstance(item_type, type) and issubclass(item_type, BaseModel):
+            numbered = _NUMBERED_LINE_RE.split(text)[1:] or [text]
+            doctor_block = "\n".join(f"- {d}, Specialization:" for d in doctors)
+            values[name] = [_fake_structured(item_type, f"{doctor_block}\n{part}") for part in numbered]
+        else:
+            values[name] = "Offline stand-in response generated without calling a language model."
+    return schema(**values)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic offline stand-in for ChatOpenAI.
+
+    Replies are derived from a hash of the prompt, each call sleeps for a latency
+    drawn from `latency`, and streaming yields one word-token every
+    `token_delay_seconds`. with_structured_output() fills the requested Pydantic
+    schema, picking doctors from the "- Name, Specialization:" lines of the prompt.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    latency: LatencyModel = Field(default_factory=LatencyModel)
+    token_delay_seconds: float = 0.0
+    reply_words: int = 40
+
+    _calls: int = PrivateAttr(default=0)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        text = _prompt_text(messages)
+        words = re.findall(r"[A-Za-z']+", text) or ["hello"]
+        start = _stable_index(text, len(words))
+        picked = [words[(start + i * 7) % len(words)].lower() for i in range(self.reply_words)]
+        return "Thanks for your question. " + " ".join(picked) + "."
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        return re.split(r"(\s)", self._reply(messages))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self._calls += 1
+        time.sleep(self.latency.sample())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self._calls += 1
+        await asyncio.sleep(self.latency.sample())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        self._calls += 1
+        time.sleep(self.latency.sample())
+        for token in self._tokens(messages):
+            if self.token_delay_seconds:
+                time.sleep(self.token_delay_seconds)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        self._calls += 1
+        await asyncio.sleep(self.latency.sample())
+        for token in self._tokens(messages):
+            if self.token_delay_seconds:
+                await asyncio.sleep(self.token_delay_seconds)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    def with_structured_output(self, schema: Any, *, include_raw: bool = False, **kwargs: Any) -> Runnable:
+        def respond(prompt_value: Any) -> BaseModel:
+            self._calls += 1
+            time.sleep(self.latency.sample())
+            return _fake_structured(schema, _prompt_text(prompt_value.to_messages()))
+
+        async def arespond(prompt_value: Any) -> BaseModel:
+            self._calls += 1
+            await asyncio.sleep(self.latency.sample())
+            return _fake_structured(schema, _prompt_text(prompt_value.to_messages()))
+
+        return RunnableLambda(respond, afunc=arespond)
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+
+def make_chat_model(temperature: float, http_client: Optional[httpx.Client] = None,
+                    http_async_client: Optional[httpx.AsyncClient] = None) -> BaseChatModel:
+    """
+    Builds the chat model selected by LLM_PROVIDER.
+
+    "openai" (default) returns GPT-4 through ChatOpenAI; "fake" returns a
+    FakeChatModel configured by FAKE_LLM_LATENCY, FAKE_LLM_TOKEN_DELAY_MS and
+    FAKE_LLM_SEED, so the AI endpoints can be exercised without credentials.
+    """
+    provider = os.getenv("LLM_PROVIDER", "openai").lower()
+    if provider == "fake":
+        seed = os.getenv("FAKE_LLM_SEED")
+        return FakeChatModel(
+            latency=LatencyModel(os.getenv("FAKE_LLM_LATENCY", "constant:0"), seed=int(seed) if seed else None),
+            token_delay_seconds=float(os.getenv("FAKE_LLM_TOKEN_DELAY_MS", "0")) / 1000
+        )
+    if provider != "openai":
+        raise ValueError(f"Unknown LLM_PROVIDER '{provider}'")
+    return ChatOpenAI(
+        model="gpt-4",
+        temperature=temperature,
+        http_client=http_client,
+        http_async_client=http_async_client
+    )
@@ -0,0 +1,189 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.database import models
+from app.database.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_SEPARATOR_RE = re.compile(r"[,;\n]")
+
+
+def normalize_symptoms(symptoms: str) -> str:
+    """Lowercase, collapse whitespace and sort the comma-separated parts of a symptom description."""
+    text = _WHITESPACE_RE.sub(" ", symptoms.lower()).strip()
+    parts = [part.strip(" .") for part in _SEPARATOR_RE.split(text)]
+    return ",".join(sorted(part for part in parts if part))
+
+
+def roster_fingerprint(doctors: List[Dict]) -> str:
+    """Stable digest of the active doctor roster; changes whenever a doctor is added, edited or removed."""
+    entries = sorted(f"{d['doctor_name']}\x1f{d.get('specialization') or ''}" for d in doctors)
+    return hashlib.sha1("\x1e".join(entries).encode("utf-8")).hexdigest()
+
+
+def cache_key(symptoms: str, doctors: List[Dict]) -> str:
+    raw = f"{roster_fingerprint(doctors)}|{normalize_symptoms(symptoms)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class RecommendationCache(ABC):
+    """Base class for DoctorRecommendation caches; subclasses implement _get/_set on plain dicts."""
+    # Whether get/set do I/O, so async callers should run them in a worker thread
+    blocking = False
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, symptoms: str, doctors: List[Dict]) -> Optional[Dict]:
+        value = self._get(cache_key(symptoms, doctors))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, symptoms: str, doctors: List[Dict], value: Dict) -> None:
+        try:
+            self._set(cache_key(symptoms, doctors), value)
+        except Exception as e:
+            logger.warning(f"Could not store recommendation in cache: {e}")
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def _set(self, key: str, value: Dict) -> None:
+        ...
+
+    @abstractmethod
+    def size(self) -> int:
+        ...
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend_name,
+            "entries": self.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class InMemoryRecommendationCache(RecommendationCache):
+    backend_name = "memory"
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        super().__init__(ttl_seconds, max_entries)
+        self._entries: "OrderedDict[str, Tuple[Dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _set(self, key: str, value: Dict) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class SQLRecommendationCache(RecommendationCache):
+    """Cache kept in the `recommendation_cache` table so it is shared by all workers and survives restarts."""
+    backend_name = "sqlite"
+    blocking = True
+
+    def __init__(self, ttl_seconds: float, max_entries: int,
+                 session_factory: Callable[[], Session] = SessionLocal):
+        super().__init__(ttl_seconds, max_entries)
+        self.session_factory = session_factory
+
+    def _get(self, key: str) -> Optional[Dict]:
+        db = self.session_factory()
+        try:
+            entry = db.query(models.RecommendationCacheEntry).filter(
+                models.RecommendationCacheEntry.cache_key == key,
+                models.RecommendationCacheEntry.expires_at > datetime.utcnow()
+            ).first()
+            return entry.value if entry else None
+        finally:
+            db.close()
+
+    def _set(self, key: str, value: Dict) -> None:
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            db.merge(models.RecommendationCacheEntry(
+                cache_key=key,
+                value=value,
+                created_at=now,
+                expires_at=now + timedelta(seconds=self.ttl_seconds)
+            ))
+            db.query(models.RecommendationCacheEntry).filter(
+                models.RecommendationCacheEntry.expires_at <= now
+            ).delete(synchronize_session=False)
+
+            overflow = db.query(models.RecommendationCacheEntry).count() - self.max_entries
+            if overflow > 0:
+                oldest = select(models.RecommendationCacheEntry.cache_key).order_by(
+                    models.RecommendationCacheEntry.created_at
+                ).limit(overflow)
+                db.query(models.RecommendationCacheEntry).filter(
+                    models.RecommendationCacheEntry.cache_key.in_(oldest)
+                ).delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def size(self) -> int:
+        db = self.session_factory()
+        try:
+            return db.query(models.RecommendationCacheEntry).count()
+        finally:
+            db.close()
+
+
+def get_recommendation_cache() -> Optional[RecommendationCache]:
+    """Resolve the cache named by RECOMMENDATION_CACHE_BACKEND (memory, sqlite or none)."""
+    backend = os.getenv("RECOMMENDATION_CACHE_BACKEND", "memory").lower()
+    ttl_seconds = float(os.getenv("RECOMMENDATION_CACHE_TTL_SECONDS", "86400"))
+    max_entries = int(os.getenv("RECOMMENDATION_CACHE_MAX_ENTRIES", "10000"))
+    if backend == "memory":
+        return InMemoryRecommendationCache(ttl_seconds, max_entries)
+    if backend in ("sqlite", "sql", "database"):
+        return SQLRecommendationCache(ttl_seconds, max_entries)
+    if backend not in ("none", ""):
+        logger.warning(f"Unknown RECOMMENDATION_CACHE_BACKEND '{backend}', recommendation caching disabled")
+    return None
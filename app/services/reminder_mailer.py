@@ -0,0 +1,206 @@
+import argparse
+import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Callable, Dict, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.database import models
+from app.database.database import SessionLocal, engine
+from app.database.migrations import migrate
+from app.services.email_service import EmailService
+
+logger = logging.getLogger(__name__)
+
+SYNC_NAME = "appointment_reminders"
+
+
+class ReminderMailer:
+    """
+    Sends reminder emails for one day's scheduled appointments.
+
+    Due appointments are read in keyset-ordered pages of `batch_size` by one
+    indexed query that joins patient and doctor and skips appointments already
+    reminded. Each page is rendered and sent concurrently over `concurrency`
+    persistent SMTP connections, and every reminder's outcome is committed to
+    `appointment_reminders` as soon as its send returns. A rerun after a crash
+    therefore only resends the few messages that were in flight. Failed sends
+    are retried by later runs until `max_attempts`.
+    """
+
+    def __init__(self, email_service: EmailService, session_factory: Callable[[], Session] = SessionLocal):
+        self.email_service = email_service
+        self.session_factory = session_factory
+        self.batch_size = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+        self.concurrency = int(os.getenv("REMINDER_CONCURRENCY", "4"))
+        self.max_attempts = int(os.getenv("REMINDER_MAX_ATTEMPTS", "3"))
+        self.timezone = ZoneInfo(os.getenv("REMINDER_TIMEZONE", "UTC"))
+
+    def day_window(self, day: date) -> Tuple[datetime, datetime]:
+        """The clinic-local day as a naive UTC range, the way appointment times are stored."""
+        start = datetime.combine(day, dt_time.min, tzinfo=self.timezone)
+        end = datetime.combine(day + timedelta(days=1), dt_time.min, tzinfo=self.timezone)
+        return (start.astimezone(timezone.utc).replace(tzinfo=None),
+                end.astimezone(timezone.utc).replace(tzinfo=None))
+
+    def _due_page(self, db: Session, window: Tuple[datetime, datetime], after: Optional[Tuple[datetime, int]]):
+        Appointment, Reminder = models.Appointment, models.AppointmentReminder
+        query = db.query(
+            Appointment.appointment_id,
+            Appointment.appointment_time,
+            Appointment.end_time,
+            Appointment.reschedule_url,
+            Appointment.cancel_url,
+            models.Patient.first_name,
+            models.Patient.middle_initial,
+            models.Patient.last_name,
+            models.Patient.email,
+            models.Doctor.doctor_name,
+            Reminder.attempts
+        ).join(
+            models.Patient, models.Patient.patient_id == Appointment.patient_id
+        ).join(
+            models.Doctor, models.Doctor.doctor_id == Appointment.doctor_id
+        ).outerjoin(
+            Reminder, Reminder.appointment_id == Appointment.appointment_id
+        ).filter(
+            Appointment.status == 'scheduled',
+            Appointment.appointment_time >= window[0],
+            Appointment.appointment_time < window[1],
+            or_(Reminder.appointment_id.is_(None),
+                and_(Reminder.status == 'failed', Reminder.attempts < self.max_attempts))
+        )
+        if after:
+            query = query.filter(or_(
+                Appointment.appointment_time > after[0],
+                and_(Appointment.appointment_time == after[0], Appointment.appointment_id > after[1])
+            ))
+        return query.order_by(Appointment.appointment_time, Appointment.appointment_id).limit(self.batch_size).all()
+
+    def _render(self, row) -> Tuple[str, str, str]:
+        start = row.appointment_time.replace(tzinfo=timezone.utc).astimezone(self.timezone)
+        end = row.end_time.replace(tzinfo=timezone.utc).astimezone(self.timezone) if row.end_time else None
+        patient_data = {
+            'first_name': row.first_name,
+            'middle_initial': row.middle_initial,
+            'last_name': row.last_name,
+            'email': row.email
+        }
+        appointment_details = {
+            'doctor_name': row.doctor_name,
+            'appointment_date': start.strftime('%A, %B %d, %Y'),
+            'appointment_time': start.strftime('%I:%M %p'),
+            'end_time': end.strftime('%I:%M %p') if end else 'TBD',
+            'reschedule_url': row.reschedule_url,
+            'cancel_url': row.cancel_url
+        }
+        return self.email_service.render_appointment_reminder(patient_data, appointment_details)
+
+    def run(self, day: Optional[date] = None, limit: Optional[int] = None) -> Dict[str, object]:
+        """Remind every due appointment on `day` (default: tomorrow in REMINDER_TIMEZONE); `limit` caps the sends."""
+        if not self.email_service.is_configured():
+            raise ValueError("Email configuration is incomplete")
+        day = day or (datetime.now(self.timezone).date() + timedelta(days=1))
+        window = self.day_window(day)
+        pool = self.email_service.create_pool(self.concurrency)
+
+        def send(message) -> Optional[str]:
+            try:
+                pool.send(message)
+                return None
+            except Exception as e:
+                return str(e) or repr(e)
+
+        stats = Counter()
+        timings = Counter()
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            after = None
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                while limit is None or stats['processed'] < limit:
+                    t0 = time.perf_counter()
+                    rows = self._due_page(db, window, after)
+                    if limit is not None:
+                        rows = rows[:limit - stats['processed']]
+                    if not rows:
+                        break
+                    after = (rows[-1].appointment_time, rows[-1].appointment_id)
+                    t1 = time.perf_counter()
+                    messages = [self.email_service.build_message(*self._render(row)) for row in rows]
+                    t2 = time.perf_counter()
+                    futures = {executor.submit(send, message): row for message, row in zip(messages, rows)}
+                    # Committed one by one as sends finish, so a crash loses at most the sends in flight
+                    for future in as_completed(futures):
+                        t3 = time.perf_counter()
+                        self._record(db, futures[future], future.result(), stats)
+                        timings['record_seconds'] += time.perf_counter() - t3
+                    timings['query_seconds'] += t1 - t0
+                    timings['render_seconds'] += t2 - t1
+                    timings['send_seconds'] += time.perf_counter() - t2
+                    stats['batches'] += 1
+                    stats['processed'] += len(rows)
+        finally:
+            pool.close()
+            db.close()
+
+        elapsed = time.perf_counter() - started
+        result = {
+            'day': day.isoformat(),
+            **stats,
+            **{key: round(value, 3) for key, value in timings.items()},
+            'elapsed_seconds': round(elapsed, 3),
+            'emails_per_second': round(stats['sent'] / elapsed, 1) if elapsed else 0.0,
+            'smtp_connections_opened': pool.connections_opened
+        }
+        self._save_stats(result)
+        logger.info(f"Appointment reminders finished: {result}")
+        return result
+
+    def _record(self, db: Session, row, error: Optional[str], stats: Counter) -> None:
+        now = datetime.utcnow()
+        values = {
+            'appointment_id': row.appointment_id,
+            'status': 'failed' if error else 'sent',
+            'attempts': (row.attempts or 0) + 1,
+            'last_error': error,
+            'sent_at': None if error else now,
+            'updated_at': now
+        }
+        if row.attempts is None:
+            db.bulk_insert_mappings(models.AppointmentReminder, [values])
+        else:
+            db.bulk_update_mappings(models.AppointmentReminder, [values])
+        db.commit()
+        stats['failed' if error else 'sent'] += 1
+        if error:
+            logger.warning(f"Reminder for appointment {row.appointment_id} to {row.email} failed: {error}")
+
+    def _save_stats(self, result: Dict[str, object]) -> None:
+        db = self.session_factory()
+        try:
+            db.merge(models.SyncState(name=SYNC_NAME, last_run_at=datetime.utcnow(), last_run_stats=result))
+            db.commit()
+        finally:
+            db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send reminder emails for a day's scheduled appointments")
+    parser.add_argument("--date", type=date.fromisoformat, help="appointment day, YYYY-MM-DD (default: tomorrow)")
+    parser.add_argument("--limit", type=int, help="send at most this many reminders")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    migrate(engine)
+    print(ReminderMailer(EmailService()).run(args.date, args.limit))
+
+
+if __name__ == "__main__":
+    main()
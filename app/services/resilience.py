@@ -0,0 +1,211 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = frozenset({500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failures in a row the circuit opens and calls fail
+    fast for `reset_seconds`; then a single trial call is let through (half-open),
+    and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait according to a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base_seconds: float, max_seconds: float) -> float:
+    """Full-jitter exponential backoff for the given 1-based retry attempt."""
+    return random.uniform(0, min(max_seconds, base_seconds * (2 ** (attempt - 1))))
+
+
+class LatencyRecorder:
+    """Per-endpoint call counts, error counts and latency percentiles over a sliding window."""
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._calls: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self._samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+            self._calls[endpoint] = self._calls.get(endpoint, 0) + 1
+            if not ok:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            report = {}
+            for endpoint, samples in self._samples.items():
+                ordered = sorted(samples)
+                report[endpoint] = {
+                    "calls": self._calls[endpoint],
+                    "errors": self._errors.get(endpoint, 0),
+                    "p50_ms": ordered[len(ordered) // 2] * 1000,
+                    "p95_ms": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000,
+                    "max_ms": ordered[-1] * 1000,
+                }
+            return report
+
+
+class RetryPolicy:
+    """
+    Retry, backoff and circuit-breaker policy for calls to one HTTP dependency.
+
+    Transport-independent, so the requests and httpx clients of a service share
+    one implementation: each runs its own send/sleep loop around a RetryingCall.
+    Timeouts, 429s, 5xx responses and connection errors are retried with jittered
+    exponential backoff (a Retry-After header takes precedence) up to `max_retries`
+    times; POSTs are only retried on 429 since the server did not act on them.
+    """
+
+    def __init__(self, name: str, breaker: CircuitBreaker, metrics: LatencyRecorder,
+                 max_retries: int, base_seconds: float, max_seconds: float):
+        self.name = name
+        self.breaker = breaker
+        self.metrics = metrics
+        self.max_retries = max_retries
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+
+    def call(self, method: str, endpoint: str, unavailable: Callable[[str], Exception]) -> "RetryingCall":
+        return RetryingCall(self, method, endpoint, unavailable)
+
+
+class RetryingCall:
+    """
+    One logical request under a RetryPolicy. The transport loops:
+
+        call.begin()  # raises `unavailable` while the circuit is open
+        try: send the request
+        except <transport errors> as e: delay = call.transport_failed(e), re-raise if None
+        except BaseException: call.aborted(), re-raise
+        else: delay = call.responded(status, retry_after), return the response if None
+        sleep(delay)
+
+    Every attempt that began records exactly one outcome with the breaker, so a
+    half-open trial is always released.
+    """
+
+    def __init__(self, policy: RetryPolicy, method: str, endpoint: str, unavailable: Callable[[str], Exception]):
+        self.policy = policy
+        self.method = method
+        self.endpoint = endpoint
+        self.unavailable = unavailable
+        self.attempt = 0
+        self._started = 0.0
+
+    def begin(self) -> None:
+        if not self.policy.breaker.allow():
+            raise self.unavailable(
+                f"{self.policy.name} circuit breaker is open, skipping {self.method} {self.endpoint}"
+            )
+        self.attempt += 1
+        self._started = time.perf_counter()
+
+    def _record(self, ok: bool) -> None:
+        self.policy.metrics.record(self.endpoint, time.perf_counter() - self._started, ok=ok)
+
+    def _retry_delay(self, error, retry_after: Optional[float] = None) -> Optional[float]:
+        policy = self.policy
+        delay = retry_after if retry_after is not None else backoff_delay(
+            self.attempt, policy.base_seconds, policy.max_seconds
+        )
+        if delay > policy.max_seconds:
+            logger.warning(f"{policy.name} asked to retry {self.endpoint} after {delay:.0f}s, giving up instead")
+            return None
+        logger.warning(f"{policy.name} {self.method} {self.endpoint} failed ({error}), "
+                       f"retry {self.attempt}/{policy.max_retries} in {delay:.2f}s")
+        return delay
+
+    def transport_failed(self, error: Exception) -> Optional[float]:
+        """A connection error or timeout; returns the delay before retrying, or None to re-raise it."""
+        self._record(ok=False)
+        self.policy.breaker.record_failure()
+        if self.method == 'POST' or self.attempt > self.policy.max_retries:
+            return None
+        return self._retry_delay(error)
+
+    def aborted(self) -> None:
+        """Any other exception, including cancellation: counts as a failure."""
+        self._record(ok=False)
+        self.policy.breaker.record_failure()
+
+    def responded(self, status_code: int, retry_after: Optional[str]) -> Optional[float]:
+        """A response arrived; returns the delay before retrying, or None when it is final."""
+        self._record(ok=status_code < 400)
+        if status_code in RETRYABLE_STATUS:
+            self.policy.breaker.record_failure()
+        else:
+            self.policy.breaker.record_success()
+        retryable = status_code == 429 or (status_code in RETRYABLE_STATUS and self.method != 'POST')
+        if not retryable or self.attempt > self.policy.max_retries:
+            return None
+        return self._retry_delay(f"HTTP {status_code}", parse_retry_after(retry_after))
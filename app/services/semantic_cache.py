@@ -0,0 +1,108 @@
+import hashlib
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.doctor_ranker import tokenize
+from app.services.recommendation_cache import roster_fingerprint
+
+
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % dim, (1.0 if (value >> 63) & 1 else -1.0)
+
+
+def embed(text: str, dim: int) -> np.ndarray:
+    """
+    Local, network-free text vector: signed feature hashing of word unigrams and
+    character trigrams, L2-normalized so a dot product is cosine similarity.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in tokenize(text):
+        index, sign = _bucket(f"w:{word}", dim)
+        vector[index] += 2.0 * sign
+        padded = f"<{word}>"
+        for i in range(len(padded) - 2):
+            index, sign = _bucket(f"c:{padded[i:i + 3]}", dim)
+            vector[index] += sign
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticRecommendationCache:
+    """
+    Near-duplicate cache for doctor recommendations.
+
+    Previously answered symptom texts are kept as rows of a preallocated matrix;
+    a lookup is one matrix-vector product over the rows recorded against the same
+    doctor roster. The least recently used row is overwritten once full.
+    """
+
+    def __init__(self, capacity: Optional[int] = None, threshold: Optional[float] = None,
+                 dim: Optional[int] = None):
+        self.capacity = capacity or int(os.getenv("SEMANTIC_CACHE_CAPACITY", "5000"))
+        self.threshold = threshold if threshold is not None else float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+        self.dim = dim or int(os.getenv("SEMANTIC_CACHE_DIM", "1024"))
+
+        self._vectors = np.zeros((self.capacity, self.dim), dtype=np.float32)
+        self._last_used = np.zeros(self.capacity, dtype=np.int64)
+        self._rosters: List[Optional[str]] = [None] * self.capacity
+        self._values: List[Optional[Dict]] = [None] * self.capacity
+        self._size = 0
+        self._clock = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, symptoms: str, doctors: List[Dict]) -> Optional[Dict]:
+        query = embed(symptoms, self.dim)
+        roster = roster_fingerprint(doctors)
+        with self._lock:
+            if self._size:
+                similarities = self._vectors[:self._size] @ query
+                same_roster = np.fromiter((r == roster for r in self._rosters[:self._size]), dtype=bool, count=self._size)
+                similarities[~same_roster] = -1.0
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self._clock += 1
+                    self._last_used[best] = self._clock
+                    self.hits += 1
+                    return self._values[best]
+            self.misses += 1
+            return None
+
+    def set(self, symptoms: str, doctors: List[Dict], value: Dict) -> None:
+        vector = embed(symptoms, self.dim)
+        roster = roster_fingerprint(doctors)
+        with self._lock:
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+            self._clock += 1
+            self._vectors[slot] = vector
+            self._last_used[slot] = self._clock
+            self._rosters[slot] = roster
+            self._values[slot] = value
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def get_semantic_cache() -> Optional[SemanticRecommendationCache]:
+    if os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"):
+        return SemanticRecommendationCache()
+    return None
@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from langchain.chains import ConversationChain
+
+logger = logging.getLogger(__name__)
+
+
+def serialize_turns(chain: ConversationChain, max_turns: int) -> bytes:
+    """Pack the last `max_turns` exchanges of a chain's memory into compressed JSON."""
+    messages = chain.memory.chat_memory.messages[-max_turns * 2:] if max_turns > 0 else []
+    compact = [[m.type, m.content] for m in messages]
+    return zlib.compress(json.dumps(compact, separators=(",", ":")).encode("utf-8"))
+
+
+def load_turns(chain: ConversationChain, messages: Iterable[Sequence[str]]) -> None:
+    """Replace a chain's memory with the given (role, content) messages."""
+    chain.memory.chat_memory.clear()
+    for role, content in messages:
+        if role == "human":
+            chain.memory.chat_memory.add_user_message(content)
+        else:
+            chain.memory.chat_memory.add_ai_message(content)
+
+
+def restore_turns(chain: ConversationChain, snapshot: bytes) -> None:
+    """Replay a snapshot produced by serialize_turns into a fresh chain's memory."""
+    load_turns(chain, json.loads(zlib.decompress(snapshot).decode("utf-8")))
+
+
+class SessionStore:
+    """
+    Bounded home for per-session ConversationChains.
+
+    Live chains are kept in LRU order, capped at `max_sessions` and dropped after
+    `ttl_seconds` of inactivity. An evicted session leaves behind a small
+    compressed snapshot of its last turns (itself LRU-capped), so a returning
+    user gets a rebuilt chain with the same short-term memory.
+    """
+
+    def __init__(self, max_sessions: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 snapshot_turns: Optional[int] = None, max_snapshots: Optional[int] = None):
+        self.max_sessions = max_sessions or int(os.getenv("CHAT_SESSION_MAX", "1000"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("CHAT_SESSION_TTL_SECONDS", "1800"))
+        self.snapshot_turns = snapshot_turns if snapshot_turns is not None else int(os.getenv("CHAT_SESSION_SNAPSHOT_TURNS", "4"))
+        self.max_snapshots = max_snapshots or int(os.getenv("CHAT_SNAPSHOT_MAX", "100000"))
+
+        self._sessions: "OrderedDict[str, Tuple[ConversationChain, float]]" = OrderedDict()
+        self._snapshots: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.restores = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def get_or_create(self, session_id: str, factory: Callable[[], ConversationChain]) -> ConversationChain:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self.hits += 1
+                self._sessions[session_id] = (entry[0], now)
+                self._sessions.move_to_end(session_id)
+                return entry[0]
+
+            self.misses += 1
+            chain = factory()
+            snapshot = self._snapshots.pop(session_id, None)
+            if snapshot is not None:
+                restore_turns(chain, snapshot)
+                self.restores += 1
+
+            self._sessions[session_id] = (chain, now)
+            while len(self._sessions) > self.max_sessions:
+                self._evict_oldest()
+                self.evictions += 1
+            return chain
+
+    def _expire(self, now: float) -> None:
+        while self._sessions:
+            _, (_, last_used) = next(iter(self._sessions.items()))
+            if now - last_used <= self.ttl_seconds:
+                break
+            self._evict_oldest()
+            self.expirations += 1
+
+    def _evict_oldest(self) -> None:
+        session_id, (chain, _) = self._sessions.popitem(last=False)
+        try:
+            self._snapshots[session_id] = serialize_turns(chain, self.snapshot_turns)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        except Exception as e:
+            logger.warning(f"Could not snapshot chat session {session_id}: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "live_sessions": len(self._sessions),
+            "snapshots": len(self._snapshots),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "restores": self.restores,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
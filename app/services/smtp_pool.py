@@ -0,0 +1,109 @@
+import logging
+import queue
+import smtplib
+import time
+from email.message import Message
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """
+    Small pool of logged-in SMTP connections that are reused across messages.
+
+    A connection is opened (and STARTTLS + login done) only when no idle one is
+    available; idle connections older than `max_idle_seconds` are probed with
+    NOOP before reuse, and a connection the server dropped is replaced and the
+    send retried once.
+    """
+
+    def __init__(self, host: str, port: int, username: Optional[str], password: Optional[str],
+                 use_tls: bool = True, size: int = 2, timeout: float = 30.0, max_idle_seconds: float = 60.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.size = size
+        self.timeout = timeout
+        self.max_idle_seconds = max_idle_seconds
+        self._idle: "queue.LifoQueue[tuple]" = queue.LifoQueue(maxsize=size)
+
+        self.connections_opened = 0
+        self.messages_sent = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            server.starttls()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        self.connections_opened += 1
+        return server
+
+    def _acquire(self) -> smtplib.SMTP:
+        try:
+            server, released_at = self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+        if time.monotonic() - released_at > self.max_idle_seconds:
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except smtplib.SMTPException:
+                pass
+            self._discard(server)
+            return self._connect()
+        return server
+
+    def _release(self, server: smtplib.SMTP) -> None:
+        try:
+            self._idle.put_nowait((server, time.monotonic()))
+        except queue.Full:
+            self._discard(server)
+
+    @staticmethod
+    def _discard(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def send(self, message: Message) -> None:
+        server = self._acquire()
+        try:
+            server.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            server.close()
+            server = self._connect()
+            try:
+                server.send_message(message)
+            except Exception:
+                self._discard(server)
+                raise
+        except smtplib.SMTPRecipientsRefused:
+            # The connection itself is fine; only this message failed
+            self._release(server)
+            raise
+        except Exception:
+            self._discard(server)
+            raise
+        self.messages_sent += 1
+        self._release(server)
+
+    def close(self) -> None:
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(server)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "connections_opened": self.connections_opened,
+            "messages_sent": self.messages_sent,
+        }
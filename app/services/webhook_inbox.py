@@ -0,0 +1,179 @@
+import asyncio
+import json
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_, and_, exists, select, update
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import models
+from app.database.database import AsyncWriteSessionLocal
+
+logger = logging.getLogger(__name__)
+
+WebhookHandler = Callable[[dict, AsyncSession], Awaitable[dict]]
+
+
+class WebhookInbox:
+    """
+    Durable inbox for Calendly webhooks.
+
+    The endpoint only verifies the signature and appends the raw event to the
+    `webhook_events` table; background workers then claim events with a lease,
+    run `handler` on them and retry failures with jittered exponential backoff.
+    Events that still fail after `max_attempts` are parked with status 'dead'.
+    Events of the same invitee run one at a time in arrival order, so a
+    cancellation never overtakes the booking it cancels.
+    """
+
+    def __init__(self, handler: WebhookHandler, session_factory: Callable[[], AsyncSession] = AsyncWriteSessionLocal):
+        self.handler = handler
+        self.session_factory = session_factory
+        self.workers = int(os.getenv("WEBHOOK_WORKERS", "2"))
+        self.max_attempts = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+        self.retry_base_seconds = float(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "5"))
+        self.poll_interval = float(os.getenv("WEBHOOK_POLL_INTERVAL_SECONDS", "2"))
+        self.lease_seconds = float(os.getenv("WEBHOOK_LEASE_SECONDS", "300"))
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    async def enqueue(self, db: AsyncSession, event_type: str, body: str, dedupe_key: Optional[str] = None,
+                      invitee_uri: Optional[str] = None) -> Tuple[models.WebhookEvent, bool]:
+        """
+        Store an event for processing. Returns (event, created); when an event with the
+        same `dedupe_key` is still pending or processing, that one is returned instead.
+        Finished events are deduplicated by the webhook ledger.
+        """
+        if dedupe_key:
+            existing = await db.scalar(select(models.WebhookEvent).where(
+                models.WebhookEvent.dedupe_key == dedupe_key,
+                models.WebhookEvent.status.in_(('pending', 'processing'))
+            ).limit(1))
+            if existing:
+                return existing, False
+        event = models.WebhookEvent(event_type=event_type, dedupe_key=dedupe_key, invitee_uri=invitee_uri, body=body)
+        db.add(event)
+        await db.commit()
+        if self._wakeup:
+            self._wakeup.set()
+        return event, True
+
+    async def start(self) -> None:
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run_worker(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} webhook inbox workers")
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._wakeup:
+            self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run_worker(self, worker_id: int) -> None:
+        while not self._stopping:
+            try:
+                processed = await self.process_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Webhook worker {worker_id} failed to claim an event: {e}")
+                processed = False
+            if processed:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self, db: AsyncSession) -> Optional[models.WebhookEvent]:
+        """Atomically lease the oldest due event; returns None when nothing is due."""
+        now = datetime.utcnow()
+        Event = models.WebhookEvent
+        Earlier = aliased(Event)
+        due = and_(or_(
+            and_(Event.status == 'pending', Event.next_attempt_at <= now),
+            and_(Event.status == 'processing', Event.locked_until < now)
+        ), ~exists().where(
+            # An earlier event of the same invitee (e.g. its booking, still retrying) goes first
+            Earlier.invitee_uri == Event.invitee_uri,
+            Earlier.event_id < Event.event_id,
+            Earlier.status.in_(('pending', 'processing'))
+        ))
+        event_id = await db.scalar(select(Event.event_id).where(due).order_by(Event.event_id).limit(1))
+        if event_id is None:
+            return None
+        claimed = await db.execute(update(Event).where(Event.event_id == event_id, due).values({
+            Event.status: 'processing',
+            Event.attempts: Event.attempts + 1,
+            Event.locked_until: now + timedelta(seconds=self.lease_seconds)
+        }).execution_options(synchronize_session=False))
+        await db.commit()
+        if not claimed.rowcount:
+            return None
+        return await db.get(Event, event_id, populate_existing=True)
+
+    async def process_next(self) -> bool:
+        """Claim and process one due event. Returns False when the inbox had nothing due."""
+        async with self.session_factory() as db:
+            event = await self._claim(db)
+            if not event:
+                return False
+            try:
+                await self.handler(json.loads(event.body), db)
+            except Exception as e:
+                await db.rollback()
+                # The rollback expired the event, and an AsyncSession cannot lazy-load it back
+                await db.refresh(event)
+                await self._record_failure(db, event, e)
+            else:
+                event.status = 'done'
+                event.processed_at = datetime.utcnow()
+                event.locked_until = None
+                event.last_error = None
+                await db.commit()
+            return True
+
+    async def _record_failure(self, db: AsyncSession, event: models.WebhookEvent, error: Exception) -> None:
+        detail = getattr(error, "detail", None) or str(error) or repr(error)
+        event.last_error = detail
+        event.locked_until = None
+        if event.attempts >= self.max_attempts:
+            event.status = 'dead'
+            logger.error(f"Webhook event {event.event_id} moved to dead letters after {event.attempts} attempts: {detail}")
+        else:
+            delay = self.retry_base_seconds * (2 ** (event.attempts - 1))
+            event.status = 'pending'
+            event.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.5, 1.5))
+            logger.warning(f"Webhook event {event.event_id} failed (attempt {event.attempts}), retrying in ~{delay:.1f}s: {detail}")
+        await db.commit()
+
+    async def retry(self, db: AsyncSession, event_id: int) -> Optional[models.WebhookEvent]:
+        """Send a dead-lettered (or failed) event back to the queue with a fresh attempt budget."""
+        event = await db.get(models.WebhookEvent, event_id)
+        if not event:
+            return None
+        event.status = 'pending'
+        event.attempts = 0
+        event.next_attempt_at = datetime.utcnow()
+        event.locked_until = None
+        await db.commit()
+        if self._wakeup:
+            self._wakeup.set()
+        return event
+
+    async def stats(self, db: AsyncSession) -> Dict[str, int]:
+        rows = await db.execute(select(models.WebhookEvent.status, func.count(models.WebhookEvent.event_id)).group_by(
+            models.WebhookEvent.status
+        ))
+        return {status: count for status, count in rows}
@@ -0,0 +1,94 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import models
+
+logger = logging.getLogger(__name__)
+
+
+def dedupe_key(payload: dict) -> Optional[str]:
+    """Identity of a Calendly webhook: its event type plus the invitee URI, which redeliveries share."""
+    invitee_uri = (payload.get("payload") or {}).get("uri")
+    event_type = payload.get("event")
+    if not invitee_uri or not event_type:
+        return None
+    return f"{event_type}:{invitee_uri}"
+
+
+class WebhookLedger:
+    """
+    Record of webhooks that were already processed to a final outcome, so
+    redeliveries are dropped before any Calendly call, database write or email.
+    Outcomes that may still change raise instead and are retried by the inbox,
+    so they are never recorded here.
+
+    The `processed_webhooks` table is the source of truth and is shared by all
+    workers; an in-process LRU of recently seen keys sits in front of it so hot
+    duplicates never reach the database. Only positive answers are cached, since
+    another worker may process an event at any time.
+    """
+
+    def __init__(self, cache_size: Optional[int] = None):
+        self.cache_size = cache_size or int(os.getenv("WEBHOOK_LEDGER_CACHE_SIZE", "10000"))
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.cache_hits = 0
+        self.ledger_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str) -> None:
+        with self._lock:
+            self._recent[key] = None
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.cache_size:
+                self._recent.popitem(last=False)
+
+    async def is_processed(self, db: AsyncSession, key: Optional[str]) -> bool:
+        if not key:
+            return False
+        with self._lock:
+            if key in self._recent:
+                self._recent.move_to_end(key)
+                self.cache_hits += 1
+                return True
+        found = await db.scalar(
+            select(models.ProcessedWebhook.dedupe_key).where(models.ProcessedWebhook.dedupe_key == key)
+        )
+        if found:
+            self.ledger_hits += 1
+            self._remember(key)
+            return True
+        self.misses += 1
+        return False
+
+    async def record(self, db: AsyncSession, key: Optional[str], payload: dict, result: Optional[dict] = None) -> None:
+        if not key:
+            return
+        db.add(models.ProcessedWebhook(
+            dedupe_key=key,
+            event_type=payload.get("event"),
+            invitee_uri=(payload.get("payload") or {}).get("uri"),
+            result=(result or {}).get("status")
+        ))
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Another worker finished the same event first
+            await db.rollback()
+        self._remember(key)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cached_keys": len(self._recent),
+            "cache_hits": self.cache_hits,
+            "ledger_hits": self.ledger_hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,95 @@
+"""
+Per-request overhead of MedicalAIService, excluding the model call itself.
+
+Compares the original per-request construction (new prompt template,
+with_structured_output and chain for every recommendation; new ChatOpenAI and
+prompt for every chat session) against the precompiled, roster-keyed objects.
+
+    python -m benchmarks.ai_overhead
+"""
+import os
+import time
+import uuid
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./medical_appointments.db")
+os.environ["CHAT_HISTORY_BACKEND"] = "memory"
+
+import warnings
+warnings.filterwarnings("ignore")
+
+from langchain_openai import ChatOpenAI
+from langchain.memory import ConversationBufferWindowMemory
+from langchain.chains import ConversationChain
+from langchain_core.prompts import MessagesPlaceholder, HumanMessagePromptTemplate, ChatPromptTemplate
+
+from app.services.ai_service import (
+    MedicalAIService, DoctorRecommendation, CHAT_MEMORY_TURNS,
+    RECOMMENDATION_SYSTEM_PROMPT, RECOMMENDATION_HUMAN_PROMPT, CHAT_SYSTEM_PROMPT,
+)
+
+DOCTORS = [
+    {"doctor_name": "Dr. Sarah Smith", "specialization": "Allergy & Immunology,Asthma,Respiratory Medicine,Rhinitis"},
+    {"doctor_name": "Dr. Michael Johnson", "specialization": "Dermatology,Skin Conditions,Eczema,Acne"},
+    {"doctor_name": "Dr. Emily Williams", "specialization": "Internal Medicine,Pediatrics,Family Medicine,Primary Care"},
+]
+SYMPTOMS = "Headache and dizziness. Current symptoms: headache. Duration: 1-4 weeks."
+ITERATIONS = 500
+
+
+def legacy_recommendation_request():
+    doctor_list_str = "\n".join([f"- {d['doctor_name']}, Specialization: {d['specialization']}" for d in DOCTORS])
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", RECOMMENDATION_SYSTEM_PROMPT),
+        ("human", RECOMMENDATION_HUMAN_PROMPT)
+    ])
+    structured_llm = ChatOpenAI(model="gpt-4", temperature=0.1).with_structured_output(DoctorRecommendation)
+    chain = prompt | structured_llm
+    chain.first.invoke({"doctors": doctor_list_str, "symptoms": SYMPTOMS})
+
+
+def legacy_chat_session():
+    doctor_list_str = "\n".join([f"- {d['doctor_name']} specializes in {d['specialization']}." for d in DOCTORS])
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", CHAT_SYSTEM_PROMPT.replace("{doctors}", doctor_list_str)),
+        MessagesPlaceholder(variable_name="history"),
+        HumanMessagePromptTemplate.from_template("{input}")
+    ])
+    chain = ConversationChain(
+        llm=ChatOpenAI(model="gpt-4", temperature=0.5),
+        prompt=prompt,
+        memory=ConversationBufferWindowMemory(k=CHAT_MEMORY_TURNS, return_messages=True),
+        verbose=False
+    )
+    chain.prompt.format_messages(history=[], input="What are your opening hours?")
+
+
+def time_per_call(fn) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn()
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+def main():
+    service = MedicalAIService()
+
+    def current_recommendation_request():
+        service._recommendation_chain(DOCTORS).first.invoke({"symptoms": SYMPTOMS})
+
+    def current_chat_session():
+        chain = service._get_conversation(str(uuid.uuid4()), DOCTORS)
+        chain.prompt.format_messages(history=[], input="What are your opening hours?")
+
+    rows = [
+        ("recommend_doctor setup", time_per_call(legacy_recommendation_request), time_per_call(current_recommendation_request)),
+        ("new chat session setup", time_per_call(legacy_chat_session), time_per_call(current_chat_session)),
+    ]
+    print(f"{'path':<26}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for name, before, after in rows:
+        print(f"{name:<26}{before:>14.1f}{after:>14.1f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
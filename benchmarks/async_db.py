@@ -0,0 +1,149 @@
+"""
+Database access from the event loop: blocking Session versus AsyncSession.
+
+Runs `--concurrency` coroutines on one event loop for `--seconds`, each
+alternating between the webhook endpoint's database work (ledger lookup,
+dedupe check, insert) and the admin webhook-events listing. One side does it
+the way the `async def` webhook endpoint used to, with a synchronous Session
+called directly on the loop; the other goes through the AsyncSession used by
+the endpoints now. A background thread writes in batches meanwhile, like the
+Calendly reconciler or the reminder mailer, so some calls have to wait for the
+SQLite write lock. Reports operations per second and how late a 5ms ticker on
+the same loop fired (event-loop stalls).
+
+    python -m benchmarks.async_db --concurrency 50 --seconds 10 --background-batch 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+
+from sqlalchemy.exc import OperationalError
+
+
+def configure_environment():
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.db')}"
+
+
+def background_writer(session_factory, models, stop: threading.Event, batch: int):
+    """Holds the write lock for a batch of inserts at a time, like a reconciliation run."""
+    while not stop.is_set():
+        db = session_factory()
+        try:
+            for _ in range(batch):
+                db.add(models.ProcessedWebhook(dedupe_key=f"background:{uuid.uuid4()}", event_type="invitee.created"))
+                db.flush()
+            db.commit()
+        finally:
+            db.close()
+        time.sleep(0.01)
+
+
+async def measure(label, operation, args):
+    lateness = []
+    counts = {"ops": 0, "errors": 0}
+    deadline = time.perf_counter() + args.seconds
+
+    async def ticker():
+        while time.perf_counter() < deadline:
+            expected = time.perf_counter() + 0.005
+            await asyncio.sleep(0.005)
+            lateness.append(max(0.0, time.perf_counter() - expected))
+
+    async def client(n):
+        i = 0
+        while time.perf_counter() < deadline:
+            try:
+                await operation(f"{label}:{n}:{i}", i % 2 == 0)
+                counts["ops"] += 1
+            except OperationalError:
+                counts["errors"] += 1
+            i += 1
+            # Requests are separate tasks in a server, so the loop gets a turn between them
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(ticker(), *(client(n) for n in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    lateness.sort()
+    return {
+        "ops/s": counts["ops"] / elapsed,
+        "lock errors": counts["errors"],
+        "loop lag p50 ms": statistics.median(lateness) * 1000,
+        "loop lag p99 ms": lateness[min(len(lateness) - 1, int(len(lateness) * 0.99))] * 1000,
+        "loop lag max ms": lateness[-1] * 1000,
+    }
+
+
+async def main(args):
+    from sqlalchemy import func, select
+    from app.database import database, models
+    from app.services.webhook_inbox import WebhookInbox
+    from app.services.webhook_ledger import WebhookLedger
+
+    models.Base.metadata.create_all(bind=database.engine)
+    inbox = WebhookInbox(handler=None)
+    ledger = WebhookLedger()
+
+    async def blocking(key, write):
+        # What the endpoints did before: a synchronous Session used directly inside `async def`
+        db = database.SessionLocal()
+        try:
+            if write:
+                if db.query(models.ProcessedWebhook.dedupe_key).filter(models.ProcessedWebhook.dedupe_key == key).first():
+                    return
+                if db.query(models.WebhookEvent).filter(models.WebhookEvent.dedupe_key == key,
+                                                        models.WebhookEvent.status != 'dead').first():
+                    return
+                db.add(models.WebhookEvent(event_type="invitee.created", dedupe_key=key, body="{}"))
+                db.commit()
+            else:
+                db.query(models.WebhookEvent.status, func.count(models.WebhookEvent.event_id)).group_by(
+                    models.WebhookEvent.status).all()
+                db.query(models.WebhookEvent).order_by(models.WebhookEvent.event_id.desc()).limit(100).all()
+        finally:
+            db.close()
+
+    async def non_blocking(key, write):
+        # Writes go through the BEGIN IMMEDIATE session, like the webhook endpoint
+        if write:
+            async with database.AsyncWriteSessionLocal() as db:
+                if not await ledger.is_processed(db, key):
+                    await inbox.enqueue(db, "invitee.created", "{}", dedupe_key=key)
+        else:
+            async with database.AsyncSessionLocal() as db:
+                await inbox.stats(db)
+                await db.scalars(select(models.WebhookEvent).order_by(models.WebhookEvent.event_id.desc()).limit(100))
+
+    stop = threading.Event()
+    writer = threading.Thread(target=background_writer,
+                              args=(database.SessionLocal, models, stop, args.background_batch), daemon=True)
+    writer.start()
+    try:
+        results = {
+            "blocking Session": await measure("blocking", blocking, args),
+            "AsyncSession": await measure("async", non_blocking, args),
+        }
+    finally:
+        stop.set()
+        writer.join()
+
+    print(f"{args.concurrency} concurrent clients, {args.seconds:.0f}s each, background writer batches of "
+          f"{args.background_batch}\n")
+    print(f"{'':<18}{'blocking Session':>18}{'AsyncSession':>14}")
+    for key in results["AsyncSession"]:
+        print(f"{key:<18}{results['blocking Session'][key]:>18.1f}{results['AsyncSession'][key]:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--background-batch", type=int, default=50)
+    args = parser.parse_args()
+    configure_environment()
+    asyncio.run(main(args))
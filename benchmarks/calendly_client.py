@@ -0,0 +1,132 @@
+"""
+Calendly client benchmark against the local stub server.
+
+Compares one-off `requests.get` calls (a new connection per call, as the
+service used to do) with CalendlyService's pooled, retrying session, then
+blocking lookups made from a coroutine with AsyncCalendlyService's coalesced
+ones (event-loop lag shows how long other requests would have been frozen),
+and reports per-endpoint latency metrics and how many connections the stub saw.
+
+    python -m benchmarks.calendly_client --calls 300 --threads 8 --latency-ms 20 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.calendly_stub import start_stub
+
+
+def run(label: str, state, fetch, calls: int, threads: int):
+    connections_before, requests_before = state.connections, state.requests
+    failures = 0
+
+    def one(i):
+        nonlocal failures
+        try:
+            fetch(i)
+        except requests.exceptions.RequestException:
+            failures += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(calls)))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<10}{calls:>8}{failures:>10}{calls / elapsed:>12.1f}"
+          f"{state.requests - requests_before:>14}{state.connections - connections_before:>14}")
+
+
+async def measure_loop_lag(work) -> tuple:
+    """Run `work` while a 5ms ticker measures how late the event loop wakes it up."""
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            expected = time.perf_counter() + 0.005
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - expected)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - started
+    done.set()
+    await tick
+    return elapsed, max(lags) if lags else 0.0
+
+
+async def run_async(state, service, calls: int):
+    """Event-loop view: blocking lookups from a coroutine versus the coalescing async client."""
+    from app.services.async_calendly_service import AsyncCalendlyService
+
+    uris = [f"https://api.calendly.com/event_types/async-{i % 10}" for i in range(calls)]
+
+    async def blocking():
+        for uri in uris[:calls // 10]:
+            try:
+                service.get_event_type_from_uri(uri)
+            except requests.exceptions.RequestException:
+                pass
+
+    client = AsyncCalendlyService(service)
+
+    async def concurrent():
+        await asyncio.gather(*(client.get_event_type_from_uri(uri) for uri in uris), return_exceptions=True)
+
+    print()
+    print(f"{'in event loop':<22}{'lookups':>8}{'seconds':>10}{'stub reqs':>12}{'max loop lag ms':>18}")
+    for label, work, count in (("blocking (sync)", blocking, calls // 10), ("async + coalescing", concurrent, calls)):
+        requests_before = state.requests
+        elapsed, lag = await measure_loop_lag(work)
+        print(f"{label:<22}{count:>8}{elapsed:>10.2f}{state.requests - requests_before:>12}{lag * 1000:>18.1f}")
+    await client.aclose()
+
+
+def main(args):
+    server, state, base_url = start_stub(latency_ms=args.latency_ms, error_rate=args.error_rate,
+                                         throttle_rate=args.throttle_rate, retry_after=0)
+    os.environ["CALENDLY_API_BASE_URL"] = base_url
+    os.environ.setdefault("CALENDLY_API_TOKEN", "benchmark")
+    os.environ.setdefault("CALENDLY_USER_URI", "https://api.calendly.com/users/benchmark")
+    os.environ["NGROK_URL"] = ""
+    os.environ.setdefault("CALENDLY_RETRY_BASE_SECONDS", "0.05")
+
+    from app.services.calendly_service import CalendlyService
+    logging.getLogger().setLevel(logging.ERROR)
+    service = CalendlyService()
+
+    def unpooled(i):
+        response = requests.get(f"{base_url}/event_types/type-{i % 10}",
+                                headers={"Authorization": "Bearer benchmark"})
+        response.raise_for_status()
+
+    def pooled(i):
+        if service.get_event_type_from_uri(f"https://api.calendly.com/event_types/type-{i % 10}") is None:
+            raise requests.exceptions.RequestException("lookup failed")
+
+    print(f"{'client':<10}{'calls':>8}{'failures':>10}{'calls/s':>12}{'stub reqs':>14}{'connections':>14}")
+    run("unpooled", state, unpooled, args.calls, args.threads)
+    run("pooled", state, pooled, args.calls, args.threads)
+    asyncio.run(run_async(state, service, args.calls))
+    print()
+    for endpoint, metrics in service.stats()["endpoints"].items():
+        print(f"{endpoint:<28}" + "  ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}"
+                                           for k, v in metrics.items()))
+    print(f"circuit: {service.breaker.state}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.05, help="fraction of stub responses that are 503s")
+    parser.add_argument("--throttle-rate", type=float, default=0.02, help="fraction of stub responses that are 429s")
+    main(parser.parse_args())
@@ -0,0 +1,106 @@
+"""
+Incremental Calendly reconciliation against the local stub API.
+
+Fills the stub with scheduled events that never reached the app as webhooks,
+then runs CalendlyReconciler repeatedly: a first full sync, a run with nothing
+changed, and a run after some events were rescheduled or canceled. For each run
+it reports the time, the stub requests and what was written.
+
+    python -m benchmarks.calendly_reconcile --events 2000 --changed 50
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def configure_environment(base_url: str):
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    os.environ["CALENDLY_API_BASE_URL"] = base_url
+    os.environ["CALENDLY_API_TOKEN"] = "benchmark"
+    os.environ["CALENDLY_USER_URI"] = "https://api.calendly.com/users/benchmark"
+    os.environ["CALENDLY_CACHE_PATH"] = os.path.join(workdir, "calendly_cache.json")
+
+
+def calendly_time(value: datetime) -> str:
+    return value.strftime('%Y-%m-%dT%H:%M:%S.000000Z')
+
+
+def main(args):
+    from benchmarks.calendly_stub import start_stub
+
+    server, state, base_url = start_stub(latency_ms=args.latency_ms)
+    configure_environment(base_url)
+
+    from app.database import database, models
+    from app.services.calendly_service import CalendlyService
+    from app.services.calendly_sync import CalendlyReconciler
+    from app.services.doctor_resolver import DoctorResolver
+
+    logging.getLogger().setLevel(logging.WARNING)
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    db.add(models.Doctor(doctor_name="Dr. Sarah Smith", specialization="Allergy & Immunology",
+                         calendly_new_patient_url="https://calendly.com/stub/new-patient"))
+    db.commit()
+    db.close()
+
+    now = datetime.utcnow().replace(microsecond=0)
+    for i in range(args.events):
+        start = now + timedelta(hours=i)
+        state.add_scheduled_event(base_url, f"ev-{i}", "new-patient", calendly_time(start),
+                                  calendly_time(start + timedelta(minutes=30)),
+                                  f"patient{i % (args.events // 3 + 1)}@example.com", f"Patient {i}")
+
+    service = CalendlyService()
+    resolver = DoctorResolver(service.get_event_type_from_uri)
+    reconciler = CalendlyReconciler(lambda: service, resolver)
+
+    def reconcile(label: str):
+        requests_before = state.requests
+        started = time.perf_counter()
+        stats = reconciler.run()
+        elapsed = time.perf_counter() - started
+        written = stats.get('created', 0) + stats.get('updated', 0)
+        print(f"{label:<22}{elapsed:>9.2f}{state.requests - requests_before:>11}{stats.get('seen', 0):>8}"
+              f"{stats.get('seen', 0) - stats.get('unchanged', 0) - written:>10}{written:>9}")
+        return stats
+
+    print(f"{'run':<22}{'seconds':>9}{'stub reqs':>11}{'seen':>8}{'skipped':>10}{'written':>9}")
+    reconcile("initial sync")
+    reconcile("nothing changed")
+
+    rng = random.Random(args.seed)
+    touched = rng.sample(state.scheduled_events, args.changed)
+    later = calendly_time(now + timedelta(days=365))
+    for n, event in enumerate(touched):
+        if n % 3 == 0:
+            event["status"] = "canceled"
+        else:
+            start = datetime.strptime(event["start_time"], '%Y-%m-%dT%H:%M:%S.%fZ') + timedelta(days=1)
+            event["start_time"] = calendly_time(start)
+            event["end_time"] = calendly_time(start + timedelta(minutes=30))
+        event["updated_at"] = later
+    reconcile(f"{args.changed} events changed")
+    server.shutdown()
+
+    db = database.SessionLocal()
+    try:
+        appointments = db.query(models.Appointment).count()
+        canceled = db.query(models.Appointment).filter(models.Appointment.status == 'canceled').count()
+    finally:
+        db.close()
+    print(f"\nappointments: {appointments} ({canceled} canceled), stub events: {len(state.scheduled_events)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--changed", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=2)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
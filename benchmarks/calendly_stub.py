@@ -0,0 +1,198 @@
+"""
+Local stand-in for the Calendly API, for exercising CalendlyService offline.
+
+Serves the endpoints the application uses (/users/me, /event_types/{uuid},
+/webhook_subscriptions, /scheduled_events and /scheduled_events/{uuid}/invitees)
+with configurable latency and injected 503 / 429 responses. Point the backend at it with
+CALENDLY_API_BASE_URL=http://127.0.0.1:8765.
+
+    python -m benchmarks.calendly_stub --port 8765 --latency-ms 80 --error-rate 0.05 --throttle-rate 0.02
+"""
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubState:
+    def __init__(self, latency_ms: float = 0, error_rate: float = 0, throttle_rate: float = 0,
+                 retry_after: int = 1, seed: int = 7):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.webhooks = {}
+        self.scheduled_events = []
+        self.invitees = {}
+
+    def add_scheduled_event(self, base_url: str, event_uuid: str, event_type: str, start_time: str,
+                            end_time: str, email: str, name: str) -> dict:
+        """Register a booked event with a single invitee, as Calendly would list it."""
+        event = {
+            "uri": f"{base_url}/scheduled_events/{event_uuid}",
+            "event_type": f"{base_url}/event_types/{event_type}",
+            "status": "active",
+            "start_time": start_time,
+            "end_time": end_time,
+            "updated_at": start_time,
+        }
+        self.scheduled_events.append(event)
+        self.invitees[event_uuid] = [{
+            "uri": f"{event['uri']}/invitees/{event_uuid}-invitee",
+            "email": email,
+            "name": name,
+            "status": "active",
+            "cancel_url": f"https://calendly.com/cancellations/{event_uuid}",
+            "reschedule_url": f"https://calendly.com/reschedulings/{event_uuid}",
+        }]
+        return event
+
+
+def make_handler(state: StubState):
+    class CalendlyStubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible
+
+        def setup(self):
+            super().setup()
+            # Headers and body go out in separate writes; without this, delayed ACKs stall keep-alive clients
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with state.lock:
+                state.connections += 1
+
+        def log_message(self, format, *args):
+            pass
+
+        def _base(self) -> str:
+            return f"http://{self.headers.get('Host')}"
+
+        def _send(self, status: int, body: dict = None, headers: dict = None):
+            payload = b"" if status == 204 else json.dumps(body or {}).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _injected_failure(self) -> bool:
+            with state.lock:
+                state.requests += 1
+                roll = state.random.random()
+            if state.latency_ms:
+                time.sleep(state.latency_ms / 1000)
+            if roll < state.throttle_rate:
+                self._send(429, {"title": "Too Many Requests"}, {"Retry-After": str(state.retry_after)})
+                return True
+            if roll < state.throttle_rate + state.error_rate:
+                self._send(503, {"title": "Service Unavailable"})
+                return True
+            return False
+
+        def _read_json(self) -> dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if self._injected_failure():
+                return
+            if url.path == "/users/me":
+                self._send(200, {"resource": {
+                    "uri": f"{self._base()}/users/stub",
+                    "current_organization": f"{self._base()}/organizations/stub"
+                }})
+            elif url.path.startswith("/event_types/"):
+                slug = url.path.rsplit("/", 1)[-1]
+                self._send(200, {"resource": {
+                    "uri": f"{self._base()}{url.path}",
+                    "name": f"Event {slug}",
+                    "scheduling_url": f"https://calendly.com/stub/{slug}"
+                }})
+            elif url.path == "/webhook_subscriptions":
+                self._send(200, {"collection": list(state.webhooks.values())})
+            elif url.path.startswith("/scheduled_events/") and url.path.endswith("/invitees"):
+                event_uuid = url.path.split("/")[2]
+                self._send(200, {"collection": state.invitees.get(event_uuid, [])})
+            elif url.path == "/scheduled_events":
+                query = parse_qs(url.query)
+                count = int(query.get("count", ["20"])[0])
+                offset = int(query.get("page_token", ["0"])[0])
+                page = state.scheduled_events[offset:offset + count]
+                next_token = str(offset + count) if offset + count < len(state.scheduled_events) else None
+                self._send(200, {
+                    "collection": page,
+                    "pagination": {"next_page_token": next_token}
+                })
+            else:
+                self._send(404, {"title": "Not Found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            body = self._read_json()
+            if self._injected_failure():
+                return
+            if url.path == "/webhook_subscriptions":
+                webhook_uuid = str(uuid.uuid4())
+                webhook = {
+                    "uri": f"{self._base()}/webhook_subscriptions/{webhook_uuid}",
+                    "callback_url": body.get("url"),
+                    "events": body.get("events", []),
+                    "state": "active"
+                }
+                state.webhooks[webhook_uuid] = webhook
+                self._send(201, {"resource": webhook})
+            else:
+                self._send(404, {"title": "Not Found"})
+
+        def do_DELETE(self):
+            url = urlparse(self.path)
+            if self._injected_failure():
+                return
+            webhook_uuid = url.path.rsplit("/", 1)[-1]
+            if url.path.startswith("/webhook_subscriptions/") and state.webhooks.pop(webhook_uuid, None):
+                self._send(204)
+            else:
+                self._send(404, {"title": "Not Found"})
+
+    return CalendlyStubHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    request_queue_size = 128  # the default backlog of 5 drops bursts of new connections
+    daemon_threads = True
+
+
+def start_stub(port: int = 0, **options) -> tuple:
+    """Start the stub on a background thread; returns (server, state, base_url)."""
+    state = StubState(**options)
+    server = StubServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+    server, state, base_url = start_stub(args.port, latency_ms=args.latency_ms, error_rate=args.error_rate,
+                                         throttle_rate=args.throttle_rate, retry_after=args.retry_after)
+    print(f"Calendly stub listening on {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,72 @@
+"""
+Render throughput of the confirmation email templates.
+
+For both templates, compares the old rendering path (a working-directory
+loader with auto-reload checks, `get_template` and dict contexts on every
+send) with `EmailService.render_appointment_confirmation`, and reports how
+long a fresh EmailService takes to compile the templates with an empty and a
+warm bytecode cache.
+
+    python -m benchmarks.email_render --renders 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+PATIENT = {
+    'first_name': "Jane", 'middle_initial': "Q", 'last_name': "Doe", 'email': "jane.doe@example.com",
+    'date_of_birth': "January 01, 1990", 'cell_phone': "555-0100", 'home_phone': None,
+    'street_address': "1 Main St", 'city': "Springfield", 'state': "IL", 'zip_code': "62701",
+    'primary_insurance_company': "Acme Health", 'primary_member_id': "ACME123",
+    'primary_reason_for_visit': "Seasonal allergies", 'symptom_duration': "1-3 months",
+    'current_symptoms': ["Sneezing", "Itchy eyes"], 'known_allergies_list': "Pollen",
+    'had_severe_allergic_reaction': "No", 'understands_medication_instructions': "Yes"
+}
+APPOINTMENT = {
+    'doctor_name': "Dr. Sarah Smith", 'appointment_date': "Monday, March 02, 2026",
+    'appointment_time': "09:00 AM", 'end_time': "09:30 AM", 'duration': 30,
+    'cancel_url': "https://calendly.com/cancellations/benchmark",
+    'reschedule_url': "https://calendly.com/reschedulings/benchmark"
+}
+
+
+def timed(call, count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        call()
+    return time.perf_counter() - started
+
+
+def main(args):
+    os.environ["EMAIL_TEMPLATE_CACHE_DIR"] = tempfile.mkdtemp()
+    from jinja2 import Environment, FileSystemLoader
+    from app.services.email_service import CONFIRMATION_TEMPLATES, TEMPLATES_DIR, EmailService
+
+    started = time.perf_counter()
+    EmailService()
+    cold = time.perf_counter() - started
+    started = time.perf_counter()
+    service = EmailService()
+    warm = time.perf_counter() - started
+    print(f"EmailService() compiling templates: {cold * 1000:.1f}ms cold, {warm * 1000:.1f}ms with bytecode cache\n")
+
+    legacy_env = Environment(loader=FileSystemLoader(str(TEMPLATES_DIR)))
+
+    print(f"{'template':<30}{'old renders/s':>15}{'new renders/s':>15}{'speedup':>9}")
+    for patient_type, name in CONFIRMATION_TEMPLATES.items():
+        old = timed(lambda: legacy_env.get_template(name).render(patient=PATIENT, appointment=APPOINTMENT),
+                    args.renders)
+        new = timed(lambda: service.render_appointment_confirmation(PATIENT, APPOINTMENT, patient_type),
+                    args.renders)
+        print(f"{name:<30}{args.renders / old:>15.0f}{args.renders / new:>15.0f}{old / new:>8.1f}x")
+
+        expected = legacy_env.get_template(name).render(patient=PATIENT, appointment=APPOINTMENT)
+        assert service.render_appointment_confirmation(PATIENT, APPOINTMENT, patient_type)[2] == expected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=5000)
+    main(parser.parse_args())
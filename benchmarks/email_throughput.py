@@ -0,0 +1,182 @@
+"""
+Confirmation email delivery against a local SMTP sink.
+
+The sink speaks just enough SMTP (EHLO, AUTH PLAIN, MAIL, RCPT, DATA, NOOP,
+RSET, QUIT) for smtplib and delays every reply by `--latency-ms`, like a remote
+provider would. The benchmark sends the same rendered messages two ways:
+
+  * inline: what the webhook handler used to do, one connection and login per
+    email, with the request waiting for it;
+  * outbox: the handler only inserts into `email_outbox`, and the
+    EmailOutboxSender workers drain it over the pooled connections.
+
+    python -m benchmarks.email_throughput --emails 200 --latency-ms 20
+"""
+import argparse
+import asyncio
+import logging
+import os
+import smtplib
+import socketserver
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        time.sleep(self.server.latency)
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        try:
+            self.serve()
+        except ConnectionError:  # the client went away, e.g. a killed benchmark run
+            pass
+
+    def serve(self):
+        self.server.counts["connections"] += 1
+        self.reply("220 benchmark sink ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip().split(" ", 1)[0].upper()
+            self.server.counts[command] += 1
+            if command in ("EHLO", "HELO"):
+                self.reply("250-benchmark\r\n250-AUTH PLAIN\r\n250 8BITMIME")
+            elif command == "AUTH":
+                self.reply("235 2.7.0 Authentication successful")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                self.server.counts["messages"] += 1
+                self.reply("250 2.0.0 queued")
+            elif command == "QUIT":
+                self.reply("221 2.0.0 bye")
+                return
+            else:
+                self.reply("250 2.0.0 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, latency_ms: float):
+        super().__init__(("127.0.0.1", 0), SMTPSinkHandler)
+        self.latency = latency_ms / 1000
+        self.counts = Counter()
+
+
+def configure_environment(port: int, pool_size: int):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.db')}"
+    os.environ["SMTP_SERVER"] = "127.0.0.1"
+    os.environ["SMTP_PORT"] = str(port)
+    os.environ["SMTP_USERNAME"] = "benchmark"
+    os.environ["SMTP_PASSWORD"] = "benchmark"
+    os.environ["FROM_EMAIL"] = "clinic@example.com"
+    os.environ["SMTP_USE_TLS"] = "false"
+    os.environ["SMTP_POOL_SIZE"] = str(pool_size)
+    os.environ["EMAIL_POLL_INTERVAL_SECONDS"] = "0.05"
+
+
+def render_messages(email_service, count: int):
+    appointment = {
+        'doctor_name': "Dr. Sarah Smith", 'appointment_date': "Monday, March 02, 2026",
+        'appointment_time': "09:00 AM", 'end_time': "09:30 AM", 'duration': 30,
+        'cancel_url': "https://calendly.com/cancellations/benchmark",
+        'reschedule_url': "https://calendly.com/reschedulings/benchmark"
+    }
+    messages = []
+    for i in range(count):
+        patient = {'first_name': f"Patient{i}", 'last_name': "Benchmark", 'email': f"patient{i}@example.com",
+                   'current_symptoms': []}
+        messages.append(email_service.render_appointment_confirmation(patient, appointment, 'new'))
+    return messages
+
+
+def send_inline(email_service, to_email: str, subject: str, html_content: str):
+    """The pre-outbox send path: a fresh connection, STARTTLS (when enabled) and login per email."""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = email_service.from_email
+    msg['To'] = to_email
+    msg.attach(MIMEText(html_content, 'html'))
+    with smtplib.SMTP(email_service.smtp_server, int(email_service.smtp_port)) as server:
+        if email_service.use_tls:
+            server.starttls()
+        server.login(email_service.smtp_username, email_service.smtp_password)
+        server.send_message(msg)
+
+
+def report(label: str, per_request, elapsed: float, count: int, connections: int):
+    per_request = sorted(per_request)
+    p95 = per_request[int(len(per_request) * 0.95) - 1] if per_request else 0
+    print(f"{label:<10}{statistics.median(per_request) * 1000:>13.2f}{p95 * 1000:>12.2f}"
+          f"{elapsed:>11.2f}{count / elapsed:>11.1f}{connections:>8}")
+
+
+async def run_outbox(sender, messages, database, models):
+    per_request = []
+    started = time.perf_counter()
+    await sender.start()
+    db = database.SessionLocal()
+    try:
+        for to_email, subject, html_content in messages:
+            t0 = time.perf_counter()
+            sender.enqueue(db, to_email, subject, html_content, dedupe_key=f"confirmation:{to_email}")
+            per_request.append(time.perf_counter() - t0)
+        while db.query(models.EmailOutbox).filter(models.EmailOutbox.status != 'sent').count():
+            await asyncio.sleep(0.02)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    await sender.stop()
+    return per_request, elapsed
+
+
+def main(args):
+    sink = SMTPSink(args.latency_ms)
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    configure_environment(sink.server_address[1], args.pool_size)
+
+    from app.database import database, models
+    from app.services.email_outbox import EmailOutboxSender
+    from app.services.email_service import EmailService
+
+    logging.getLogger().setLevel(logging.WARNING)
+    models.Base.metadata.create_all(bind=database.engine)
+    email_service = EmailService()
+    messages = render_messages(email_service, args.emails)
+
+    print(f"{'path':<10}{'request p50ms':>13}{'p95ms':>12}{'drain s':>11}{'emails/s':>11}{'conns':>8}")
+
+    per_request = []
+    started = time.perf_counter()
+    for message in messages:
+        t0 = time.perf_counter()
+        send_inline(email_service, *message)
+        per_request.append(time.perf_counter() - t0)
+    report("inline", per_request, time.perf_counter() - started, args.emails, sink.counts["connections"])
+
+    sink.counts.clear()
+    sender = EmailOutboxSender(email_service)
+    per_request, elapsed = asyncio.run(run_outbox(sender, messages, database, models))
+    report("outbox", per_request, elapsed, args.emails, sink.counts["connections"])
+    print(f"\nsmtp pool: {email_service.pool.stats()}, sink messages: {sink.counts['messages']}")
+    sink.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=20, help="delay before every SMTP reply")
+    parser.add_argument("--pool-size", type=int, default=2)
+    main(parser.parse_args())
@@ -0,0 +1,135 @@
+"""
+Offline throughput and tail-latency harness for the AI endpoints.
+
+Runs the full FastAPI stack in-process against the deterministic fake LLM
+(LLM_PROVIDER=fake), replaying a configurable model-latency distribution, and
+reports throughput and latency percentiles for /api/chat and /api/recommend-doctor,
+plus how far the event loop fell behind (lag) while serving them. Requests beyond
+LLM_MAX_CONCURRENCY (default 100) wait for a free LLM slot.
+
+    python -m benchmarks.llm_replay --latency lognormal:800,0.6 --requests 1000 --concurrency 200
+    python -m benchmarks.llm_replay --latency replay:recorded_latencies_ms.txt --endpoint chat
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+
+def configure_environment(args):
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_LATENCY"] = args.latency
+    os.environ["FAKE_LLM_TOKEN_DELAY_MS"] = str(args.token_delay_ms)
+    os.environ["FAKE_LLM_SEED"] = str(args.seed)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.db')}"
+    os.environ.setdefault("CALENDLY_API_TOKEN", "benchmark")
+    os.environ.setdefault("CALENDLY_USER_URI", "https://api.calendly.com/users/benchmark")
+    os.environ["NGROK_URL"] = ""
+    if args.no_cache:
+        os.environ["RECOMMENDATION_CACHE_BACKEND"] = "none"
+        os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+
+
+def seed_doctors():
+    from app.database.database import SessionLocal
+    from app.database.models import Doctor
+
+    db = SessionLocal()
+    try:
+        db.add_all([
+            Doctor(doctor_name="Dr. Sarah Smith", specialization="Allergy & Immunology,Asthma,Respiratory Medicine,Rhinitis"),
+            Doctor(doctor_name="Dr. Michael Johnson", specialization="Dermatology,Skin Conditions,Eczema,Acne"),
+            Doctor(doctor_name="Dr. Emily Williams", specialization="Internal Medicine,Pediatrics,Family Medicine,Primary Care"),
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+async def run_load(client, name: str, make_request: Callable[[int], Dict], url: str,
+                   total: int, concurrency: int):
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal errors, next_index
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            start = time.perf_counter()
+            response = await client.post(url, json=make_request(index))
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    # How late a 5ms ticker on the same loop fires: anything blocking the loop shows up here
+    lateness: List[float] = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            expected = time.perf_counter() + 0.005
+            await asyncio.sleep(0.005)
+            lateness.append(max(0.0, time.perf_counter() - expected))
+
+    started = time.perf_counter()
+    ticking = asyncio.create_task(ticker())
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticking
+
+    print(f"{name:<18}{total:>8}{errors:>8}{total / elapsed:>12.1f}"
+          f"{statistics.median(latencies) * 1000:>10.0f}{percentile(latencies, 90) * 1000:>10.0f}"
+          f"{percentile(latencies, 99) * 1000:>10.0f}{max(latencies) * 1000:>10.0f}"
+          f"{percentile(lateness, 99) * 1000:>10.0f}{max(lateness) * 1000:>10.0f}")
+
+
+async def main(args):
+    import httpx
+    from app.main import app
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    seed_doctors()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        print(f"{'endpoint':<18}{'requests':>8}{'errors':>8}{'req/s':>12}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+              f"{'lag p99':>10}{'lag max':>10}")
+        if args.endpoint in ("recommend", "both"):
+            await run_load(
+                client, "recommend-doctor",
+                lambda i: {"symptoms": f"Persistent headache and dizziness, episode {i}. Duration: 1-4 weeks."},
+                "/api/recommend-doctor", args.requests, args.concurrency
+            )
+        if args.endpoint in ("chat", "both"):
+            await run_load(
+                client, "chat",
+                lambda i: {"session_id": f"benchmark-{i % args.sessions}", "query": f"What are your opening hours? ({i})"},
+                "/api/chat", args.requests, args.concurrency
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", choices=["recommend", "chat", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--sessions", type=int, default=200, help="distinct chat session ids to cycle through")
+    parser.add_argument("--latency", default="lognormal:800,0.5", help="fake model latency spec (see LatencyModel)")
+    parser.add_argument("--token-delay-ms", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--no-cache", action="store_true", help="disable recommendation caches so every request reaches the model")
+    args = parser.parse_args()
+    configure_environment(args)
+    asyncio.run(main(args))
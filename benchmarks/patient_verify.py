@@ -0,0 +1,102 @@
+"""
+Patient verification latency as the patients table grows.
+
+For each size in `--sizes`, seeds that many patients into a fresh database the
+way one from before the lookup migration looks (no normalized columns filled
+in), runs `migrate()` to backfill them, then times `--lookups` verifications
+with the old leading-wildcard ILIKE filter and with the normalized lookup used
+by `/api/verify-patient` now. Lookups use differently cased input and a first
+name prefix, and count how many found the right patient.
+
+    python -m benchmarks.patient_verify --sizes 10000,100000,1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import date
+
+
+def seed(engine, models, count: int):
+    from sqlalchemy import insert
+
+    Patient = models.Patient.__table__
+    for index in Patient.indexes:
+        if index.name == "ix_patients_lookup":
+            index.drop(bind=engine)
+    with engine.begin() as connection:
+        for offset in range(0, count, 50000):
+            connection.execute(insert(Patient), [
+                {"patient_id": str(uuid.uuid4()), "first_name": f"Jennifer{i}", "last_name": f"Taylor{i}",
+                 "email": f"jennifer.taylor{i}@example.com", "date_of_birth": date(1990, 1, 1)}
+                for i in range(offset, min(offset + 50000, count))
+            ])
+
+
+def old_query(db, models, first_name, last_name, email):
+    return db.query(models.Patient).filter(
+        models.Patient.first_name.ilike(f"%{first_name}%"),
+        models.Patient.last_name.ilike(f"%{last_name}%"),
+        models.Patient.email.ilike(f"%{email}%")
+    ).first()
+
+
+def new_query(db, models, first_name, last_name, email):
+    return db.query(models.Patient).filter(
+        models.Patient.email_normalized == models.normalize_lookup(email),
+        models.Patient.last_name_normalized.startswith(models.normalize_lookup(last_name), autoescape=True),
+        models.Patient.first_name_normalized.startswith(models.normalize_lookup(first_name), autoescape=True)
+    ).first()
+
+
+def time_lookups(session_factory, models, query, count: int, lookups: int):
+    latencies, found = [], 0
+    db = session_factory()
+    try:
+        for _ in range(lookups):
+            i = random.randrange(count)
+            started = time.perf_counter()
+            patient = query(db, models, "JENNIFER", f"taylor{i}", f"Jennifer.Taylor{i}@Example.com")
+            latencies.append(time.perf_counter() - started)
+            found += patient is not None and patient.email == f"jennifer.taylor{i}@example.com"
+            db.expunge_all()
+    finally:
+        db.close()
+    return statistics.median(latencies) * 1000, found
+
+
+def run(size: int, args):
+    from sqlalchemy.orm import sessionmaker
+    from app.database import models
+    from app.database.database import create_app_engine
+    from app.database.migrations import migrate
+
+    engine = create_app_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.db')}")
+    models.Base.metadata.create_all(bind=engine)
+    seed(engine, models, size)
+    started = time.perf_counter()
+    migrate(engine)
+    migrate_seconds = time.perf_counter() - started
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    old_ms, old_found = time_lookups(Session, models, old_query, size, args.lookups)
+    new_ms, new_found = time_lookups(Session, models, new_query, size, args.lookups)
+    engine.dispose()
+    return migrate_seconds, old_ms, old_found, new_ms, new_found
+
+
+def main(args):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'unused.db')}"
+    print(f"{'patients':>10}{'migrate s':>11}{'ILIKE p50 ms':>14}{'found':>7}{'lookup p50 ms':>15}{'found':>7}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        migrate_seconds, old_ms, old_found, new_ms, new_found = run(size, args)
+        print(f"{size:>10}{migrate_seconds:>11.1f}{old_ms:>14.2f}{old_found:>7}{new_ms:>15.3f}{new_found:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--lookups", type=int, default=50)
+    main(parser.parse_args())
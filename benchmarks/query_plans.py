@@ -0,0 +1,152 @@
+"""
+Query plans of the admin and patient endpoints on a large appointments table.
+
+Seeds `--appointments` appointments (a million by default) spread over
+`--doctors` doctors and `--patients` patients, created the way a database from
+before the index migration looks (tables only), then runs `EXPLAIN QUERY PLAN`
+and times the queries behind `/api/admin/appointments` (first page, a later
+page, each filter and the total), `/api/admin/doctor-stats`,
+`/api/admin/patient/{id}/appointments` and the active-doctor lookup, before and
+after `migrate()`. After the migration each query must read `appointments`
+through an index and must not sort it in a temporary B-tree; the script exits
+non-zero otherwise.
+
+    python -m benchmarks.query_plans --appointments 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+
+def configure_environment():
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.db')}"
+
+
+def seed(engine, models, args):
+    from sqlalchemy import insert
+
+    # Tables as they were before migration 1, so the migration has to add the indexes
+    for table in (models.Appointment.__table__, models.Doctor.__table__):
+        for index in list(table.indexes):
+            index.drop(bind=engine, checkfirst=True)
+
+    patient_ids = [str(uuid.uuid4()) for _ in range(args.patients)]
+    start = datetime(2024, 1, 1, 8)
+    with engine.begin() as connection:
+        connection.execute(insert(models.Doctor.__table__), [
+            {"doctor_id": i + 1, "doctor_name": f"Dr. Benchmark {i}", "specialization": "Allergy & Immunology",
+             "is_active": i % 10 != 0} for i in range(args.doctors)
+        ])
+        connection.execute(insert(models.Patient.__table__), [
+            {"patient_id": patient_id, "first_name": f"Patient{i}", "last_name": "Benchmark",
+             "email": f"patient{i}@example.com", "date_of_birth": date(1990, 1, 1)}
+            for i, patient_id in enumerate(patient_ids)
+        ])
+        for offset in range(0, args.appointments, 50000):
+            connection.execute(insert(models.Appointment.__table__), [
+                {"patient_id": patient_ids[(i * 7919) % args.patients], "doctor_id": i % args.doctors + 1,
+                 "calendly_event_uri": f"https://api.calendly.com/scheduled_events/ev-{i}",
+                 "calendly_invitee_uri": f"https://api.calendly.com/scheduled_events/ev-{i}/invitees/inv-{i}",
+                 "appointment_time": start + timedelta(minutes=15 * ((i * 104729) % args.appointments)),
+                 "end_time": start + timedelta(minutes=15 * ((i * 104729) % args.appointments) + 30),
+                 "status": "canceled" if i % 9 == 0 else "scheduled", "created_at": start}
+                for i in range(offset, min(offset + 50000, args.appointments))
+            ])
+    return patient_ids
+
+
+def endpoint_queries(patient_id, patient_email, middle):
+    """The statements the endpoints execute, from the same builders in app.database.queries."""
+    from app.database import queries
+
+    page = queries.appointments_page
+    filters = queries.appointment_filters
+    return {
+        "admin appointments": page(filters()),
+        "admin, next page": page(filters(), cursor=(middle, 10 ** 9)),
+        "admin, status": page(filters(status='canceled'), cursor=(middle, 10 ** 9)),
+        "admin, doctor": page(filters(doctor_id=7), cursor=(middle, 10 ** 9)),
+        "admin, date range": page(filters(date_from=(middle - timedelta(days=7)).date(), date_to=middle.date())),
+        "admin, patient email": page(filters(patient_email=patient_email)),
+        "admin, total": queries.appointments_count(filters()),
+        "doctor stats": queries.doctor_stats(),
+        "patient appointments": queries.patient_appointments(patient_id),
+        "active doctors": queries.active_doctors(),
+    }
+
+
+def explain(connection, statement):
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+    return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")]
+
+
+def problems(name, plan):
+    """Full scans of appointments, automatic indexes and sorts of the result; doctors may be scanned."""
+    found = []
+    for step in plan:
+        if step.startswith("SCAN appointments") and "INDEX" not in step:
+            found.append(step)
+        # SQLite builds a throwaway index over the whole table for this query
+        if "AUTOMATIC" in step:
+            found.append(step)
+        # The patient-email page only sorts that patient's own appointments, found through the lookup index
+        if "TEMP B-TREE" in step and name not in ("active doctors", "admin, patient email"):
+            found.append(step)
+    if name == "active doctors" and not any("ix_doctors_is_active" in step for step in plan):
+        found.append("ix_doctors_is_active not used")
+    return found
+
+
+def measure(engine, models, queries, label):
+    timings, failures = {}, []
+    with engine.connect() as connection:
+        for name, statement in queries.items():
+            plan = explain(connection, statement)
+            started = time.perf_counter()
+            connection.execute(statement).all()
+            timings[name] = (time.perf_counter() - started) * 1000
+            print(f"{label} / {name}:")
+            for step in plan:
+                print(f"    {step}")
+            failures += [f"{name}: {problem}" for problem in problems(name, plan)]
+    return timings, failures
+
+
+def main(args):
+    configure_environment()
+    from app.database import database, models
+    from app.database.migrations import migrate
+
+    models.Base.metadata.create_all(bind=database.engine)
+    started = time.perf_counter()
+    patient_ids = seed(database.engine, models, args)
+    print(f"Seeded {args.appointments} appointments in {time.perf_counter() - started:.1f}s\n")
+    patient_id = patient_ids[len(patient_ids) // 2]
+    queries = endpoint_queries(patient_id, f"patient{len(patient_ids) // 2}@example.com",
+                               datetime(2024, 1, 1, 8) + timedelta(minutes=15 * (args.appointments // 2)))
+
+    before, _ = measure(database.engine, models, queries, "before")
+    started = time.perf_counter()
+    applied = migrate(database.engine)
+    print(f"\nApplied migrations {applied} in {time.perf_counter() - started:.1f}s\n")
+    after, failures = measure(database.engine, models, queries, "after")
+
+    print(f"\n{'query':<24}{'before ms':>12}{'after ms':>12}")
+    for name in before:
+        print(f"{name:<24}{before[name]:>12.1f}{after[name]:>12.1f}")
+    if failures:
+        print("\nQueries not served by an index:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nEvery query reads appointments through an index.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--appointments", type=int, default=1000000)
+    parser.add_argument("--patients", type=int, default=50000)
+    parser.add_argument("--doctors", type=int, default=40)
+    main(parser.parse_args())
@@ -0,0 +1,130 @@
+"""
+Bulk appointment reminders against a local SMTP sink.
+
+Seeds `--appointments` scheduled appointments for tomorrow (plus some on other
+days and some canceled, which must not be reminded), then runs ReminderMailer
+three times: `python -m app.services.reminder_mailer` in a subprocess that is
+killed with SIGKILL once the sink has received `--interrupt-after` reminders
+(pick a number that is not a multiple of `--batch-size` to crash mid-page), a
+rerun that must resume without resending more than the sends that were in
+flight, and a final run that must find nothing left. Reports each run's
+counters and what the sink received; exits non-zero if the resumed runs did not
+deliver every due reminder or resent more than `--concurrency` of them.
+
+    python -m benchmarks.reminder_batch --appointments 20000 --latency-ms 2
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+from benchmarks.email_throughput import SMTPSink
+
+
+def configure_environment(port: int, args):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.db')}"
+    os.environ["SMTP_SERVER"] = "127.0.0.1"
+    os.environ["SMTP_PORT"] = str(port)
+    os.environ["SMTP_USERNAME"] = "benchmark"
+    os.environ["SMTP_PASSWORD"] = "benchmark"
+    os.environ["FROM_EMAIL"] = "clinic@example.com"
+    os.environ["SMTP_USE_TLS"] = "false"
+    os.environ["REMINDER_BATCH_SIZE"] = str(args.batch_size)
+    os.environ["REMINDER_CONCURRENCY"] = str(args.concurrency)
+
+
+def seed(database, models, count: int, day: date):
+    db = database.SessionLocal()
+    try:
+        doctors = [models.Doctor(doctor_name=f"Dr. Benchmark {i}", specialization="Allergy & Immunology")
+                   for i in range(3)]
+        db.add_all(doctors)
+        db.commit()
+
+        patients, appointments = [], []
+        start_of_day = datetime.combine(day, datetime.min.time())
+        # One extra appointment in five lands on another day or is canceled and must be skipped
+        for i in range(count + count // 5):
+            patient_id = str(uuid.uuid4())
+            patients.append({'patient_id': patient_id, 'first_name': f"Patient{i}", 'last_name': "Benchmark",
+                             'email': f"patient{i}@example.com", 'date_of_birth': date(1990, 1, 1)})
+            on_day = i < count
+            start = start_of_day + timedelta(minutes=(i % 48) * 15) + (timedelta() if on_day else timedelta(days=2))
+            appointments.append({
+                'patient_id': patient_id, 'doctor_id': doctors[i % 3].doctor_id,
+                'calendly_event_uri': f"https://api.calendly.com/scheduled_events/ev-{i}",
+                'calendly_invitee_uri': f"https://api.calendly.com/scheduled_events/ev-{i}/invitees/inv-{i}",
+                'appointment_time': start, 'end_time': start + timedelta(minutes=30),
+                'status': 'scheduled' if on_day or i % 2 else 'canceled',
+                'reschedule_url': f"https://calendly.com/reschedulings/inv-{i}",
+                'cancel_url': f"https://calendly.com/cancellations/inv-{i}"
+            })
+        db.bulk_insert_mappings(models.Patient, patients)
+        db.bulk_insert_mappings(models.Appointment, appointments)
+        db.commit()
+    finally:
+        db.close()
+
+
+def crash_mid_run(sink, day: date, after: int) -> int:
+    """Runs the mailer CLI in a subprocess and kills it once `after` messages have arrived."""
+    process = subprocess.Popen([sys.executable, "-m", "app.services.reminder_mailer", "--date", day.isoformat()],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    while sink.counts["messages"] < after and process.poll() is None:
+        time.sleep(0.001)
+    process.kill()
+    process.wait()
+    return sink.counts["messages"]
+
+
+def main(args):
+    sink = SMTPSink(args.latency_ms)
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    configure_environment(sink.server_address[1], args)
+
+    from app.database import database, models
+    from app.services.email_service import EmailService
+    from app.services.reminder_mailer import ReminderMailer
+
+    logging.getLogger().setLevel(logging.ERROR)
+    models.Base.metadata.create_all(bind=database.engine)
+    day = date.today() + timedelta(days=1)
+    seed(database, models, args.appointments, day)
+
+    received = crash_mid_run(sink, day, args.interrupt_after)
+    db = database.SessionLocal()
+    recorded = db.query(models.AppointmentReminder).filter(models.AppointmentReminder.status == 'sent').count()
+    db.close()
+    print(f"killed:       {received} messages received by the sink, {recorded} recorded as sent\n")
+
+    mailer = ReminderMailer(EmailService())
+    print(f"{'run':<14}{'sent':>8}{'failed':>8}{'batches':>9}{'seconds':>9}{'emails/s':>10}"
+          f"{'render s':>10}{'send s':>9}{'conns':>7}")
+    for label in ("resumed", "rerun"):
+        stats = mailer.run(day)
+        print(f"{label:<14}{stats.get('sent', 0):>8}{stats.get('failed', 0):>8}{stats.get('batches', 0):>9}"
+              f"{stats['elapsed_seconds']:>9.2f}{stats['emails_per_second']:>10.1f}"
+              f"{stats.get('render_seconds', 0):>10.2f}{stats.get('send_seconds', 0):>9.2f}"
+              f"{stats['smtp_connections_opened']:>7}")
+    sink.shutdown()
+    resent = sink.counts['messages'] - args.appointments
+    print(f"\ndue reminders: {args.appointments}, messages received by the sink: {sink.counts['messages']} "
+          f"({resent} resent after the kill)")
+    if resent < 0 or resent > args.concurrency:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--appointments", type=int, default=20000)
+    parser.add_argument("--interrupt-after", type=int, default=7250)
+    parser.add_argument("--latency-ms", type=float, default=2, help="delay before every SMTP reply")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    main(parser.parse_args())
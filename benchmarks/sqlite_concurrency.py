@@ -0,0 +1,129 @@
+"""
+Concurrent SQLite readers and writers with and without the engine profile.
+
+Writer threads do what the webhook inbox does per delivery (insert an event,
+then claim and finish it, each in its own transaction); reader threads run the
+admin webhook-events listing (status counts and the newest 100 events). Both
+run for `--seconds` against a fresh database file, first with the engine the
+app used to create (rollback journal, default synchronous and pooling) and then
+with `create_app_engine`'s profile. Reports operations per second, p95 latency
+and "database is locked" errors for each side.
+
+    python -m benchmarks.sqlite_concurrency --writers 8 --readers 8 --seconds 10
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+
+def configure_environment():
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'unused.db')}"
+
+
+def run(engine, args):
+    from sqlalchemy import func
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.orm import sessionmaker
+    from app.database import models
+
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    db.bulk_insert_mappings(models.WebhookEvent, [
+        {"event_type": "invitee.created", "body": "{}" * 200, "status": "done"} for _ in range(args.seed_rows)
+    ])
+    db.commit()
+    db.close()
+
+    latencies = defaultdict(list)
+    counts = Counter()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def write():
+        db = Session()
+        event = models.WebhookEvent(event_type="invitee.created", body="{}" * 200)
+        db.add(event)
+        db.commit()
+        # Claim: look the event up, then update it in the same transaction
+        claimed = db.query(models.WebhookEvent).filter(models.WebhookEvent.event_id == event.event_id).first()
+        claimed.status = "processing"
+        claimed.attempts += 1
+        db.commit()
+        db.query(models.WebhookEvent).filter(models.WebhookEvent.event_id == event.event_id).update(
+            {"status": "done", "processed_at": datetime.utcnow()})
+        db.commit()
+        db.close()
+
+    def read():
+        db = Session()
+        db.query(models.WebhookEvent.status, func.count(models.WebhookEvent.event_id)).group_by(
+            models.WebhookEvent.status).all()
+        db.query(models.WebhookEvent).order_by(models.WebhookEvent.event_id.desc()).limit(100).all()
+        db.close()
+
+    def worker(kind, operation):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                operation()
+            except OperationalError as e:
+                with lock:
+                    counts[f"{kind}_errors"] += 1
+                    counts["locked" if "locked" in str(e) else "other_errors"] += 1
+                continue
+            elapsed = time.perf_counter() - started
+            with lock:
+                counts[kind] += 1
+                latencies[kind].append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=("writes", write)) for _ in range(args.writers)]
+    threads += [threading.Thread(target=worker, args=("reads", read)) for _ in range(args.readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+
+    def p95(kind):
+        values = sorted(latencies[kind])
+        return values[int(len(values) * 0.95) - 1] * 1000 if values else 0.0
+
+    return {
+        "writes/s": counts["writes"] / elapsed, "write p95 ms": p95("writes"), "write errors": counts["writes_errors"],
+        "reads/s": counts["reads"] / elapsed, "read p95 ms": p95("reads"), "read errors": counts["reads_errors"],
+        "locked": counts["locked"]
+    }
+
+
+def main(args):
+    configure_environment()
+    from sqlalchemy import create_engine
+    from app.database.database import create_app_engine
+
+    def database_url():
+        return f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.db')}"
+
+    results = {
+        "default": run(create_engine(database_url(), connect_args={"check_same_thread": False}), args),
+        "profile": run(create_app_engine(database_url()), args),
+    }
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:.0f}s each\n")
+    print(f"{'':<16}{'default':>12}{'profile':>12}")
+    for key in results["default"]:
+        print(f"{key:<16}{results['default'][key]:>12.1f}{results['profile'][key]:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--seed-rows", type=int, default=20000)
+    main(parser.parse_args())
@@ -0,0 +1,87 @@
+"""
+Time-to-ready of `uvicorn app.main:app`.
+
+Starts the backend as a subprocess against a fresh database and polls
+/api/health, reporting when the app answers as ready and when the Calendly
+background startup settles. Calendly is either the local stub with a given
+latency, or an unreachable address (--offline).
+
+    python -m benchmarks.startup_time --calendly-latency-ms 2000
+    python -m benchmarks.startup_time --offline
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from benchmarks.calendly_stub import start_stub
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main(args):
+    if args.offline:
+        calendly_url = f"http://127.0.0.1:{free_port()}"  # nothing listens here
+    else:
+        _, _, calendly_url = start_stub(latency_ms=args.calendly_latency_ms)
+
+    workdir = tempfile.mkdtemp()
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+        "CALENDLY_API_BASE_URL": calendly_url,
+        "CALENDLY_API_TOKEN": env.get("CALENDLY_API_TOKEN", "benchmark"),
+        "CALENDLY_USER_URI": env.get("CALENDLY_USER_URI", "https://api.calendly.com/users/benchmark"),
+        "CALENDLY_CACHE_PATH": os.path.join(workdir, "calendly_cache.json"),
+        "NGROK_URL": "https://benchmark.ngrok-free.app",
+        "LLM_PROVIDER": "fake",
+    })
+
+    for run in range(args.runs):
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        ready_at = calendly_at = None
+        health = {}
+        try:
+            while time.perf_counter() - started < args.timeout:
+                try:
+                    health = requests.get(f"http://127.0.0.1:{port}/api/health", timeout=1).json()
+                except requests.exceptions.RequestException:
+                    time.sleep(0.02)
+                    continue
+                if ready_at is None and health.get("status") == "ready":
+                    ready_at = time.perf_counter() - started
+                if health.get("calendly", {}).get("state") != "pending":
+                    calendly_at = time.perf_counter() - started
+                    break
+                time.sleep(0.02)
+        finally:
+            server.terminate()
+            server.wait()
+
+        calendly = health.get("calendly", {})
+        print(f"run {run + 1}: ready after {ready_at or float('nan'):.2f}s, "
+              f"calendly {calendly.get('state')} after {calendly_at or float('nan'):.2f}s "
+              f"(organization from {calendly.get('organization_source')})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calendly-latency-ms", type=float, default=1000)
+    parser.add_argument("--offline", action="store_true", help="point the backend at an address where nothing listens")
+    parser.add_argument("--runs", type=int, default=2, help="later runs reuse the on-disk organization cache")
+    parser.add_argument("--timeout", type=float, default=60)
+    main(parser.parse_args())
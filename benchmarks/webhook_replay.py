@@ -0,0 +1,176 @@
+"""
+Replay harness for duplicate-heavy Calendly webhook traffic.
+
+Posts signed invitee.created / invitee.canceled deliveries, each redelivered
+several times in shuffled order, through the FastAPI stack in-process, then
+drains the webhook inbox with `--workers` concurrent workers. Cancellations are
+mixed in shortly after their booking, so workers race on the same invitee. The
+Calendly event-type lookup is replaced by a counter with a configurable latency
+and confirmation emails are counted in the outbox, so the report shows how many
+external calls and emails the traffic actually caused. Exits non-zero if a
+canceled booking is left scheduled, or a booking has no appointment.
+Run with `--redeliveries 1` to check the ordering without later redeliveries to
+fall back on.
+
+    python -m benchmarks.webhook_replay --bookings 200 --redeliveries 4 --cancel-ratio 0.2
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+WEBHOOK_SECRET = "benchmark-secret"
+EVENT_TYPE_URI = "https://api.calendly.com/event_types/benchmark"
+SCHEDULING_URL = "https://calendly.com/benchmark/new-patient"
+
+
+def configure_environment():
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.db')}"
+    os.environ["CALENDLY_WEBHOOK_SECRET"] = WEBHOOK_SECRET
+    os.environ.setdefault("CALENDLY_API_TOKEN", "benchmark")
+    os.environ.setdefault("CALENDLY_USER_URI", "https://api.calendly.com/users/benchmark")
+    os.environ["NGROK_URL"] = ""
+    os.environ["LLM_PROVIDER"] = "fake"
+    # Confirmations are only queued when email is configured; no outbox worker runs, so none is sent
+    os.environ["SMTP_SERVER"] = "127.0.0.1"
+    os.environ["SMTP_PORT"] = "2525"
+    os.environ["SMTP_USERNAME"] = "benchmark"
+    os.environ["SMTP_PASSWORD"] = "benchmark"
+    os.environ["FROM_EMAIL"] = "clinic@example.com"
+
+
+def seed_doctor():
+    from app.database.database import SessionLocal
+    from app.database.models import Doctor
+
+    db = SessionLocal()
+    try:
+        db.add(Doctor(doctor_name="Dr. Sarah Smith", specialization="Allergy & Immunology",
+                      calendly_new_patient_url=SCHEDULING_URL))
+        db.commit()
+    finally:
+        db.close()
+
+
+def make_delivery(event: str, booking: int) -> bytes:
+    invitee = f"https://api.calendly.com/scheduled_events/ev-{booking}/invitees/inv-{booking}"
+    return json.dumps({
+        "event": event,
+        "payload": {
+            "uri": invitee,
+            "email": f"patient{booking}@example.com",
+            "name": f"Patient {booking}",
+            "cancel_url": f"https://calendly.com/cancellations/inv-{booking}",
+            "reschedule_url": f"https://calendly.com/reschedulings/inv-{booking}",
+            "scheduled_event": {
+                "uri": f"https://api.calendly.com/scheduled_events/ev-{booking}",
+                "event_type": EVENT_TYPE_URI,
+                "start_time": "2030-01-07T15:00:00.000000Z",
+                "end_time": "2030-01-07T16:00:00.000000Z",
+            },
+        },
+    }).encode("utf-8")
+
+
+def sign(body: bytes) -> str:
+    timestamp = str(int(time.time()))
+    signature = hmac.new(WEBHOOK_SECRET.encode(), msg=f"{timestamp}.{body.decode('utf-8')}".encode(),
+                         digestmod=hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+async def main(args):
+    import httpx
+    from app import main as app_main
+
+    logging.getLogger().setLevel(logging.WARNING)
+    seed_doctor()
+
+    external = Counter()
+
+    async def fake_event_type(uri):
+        external["calendly_lookups"] += 1
+        await asyncio.sleep(args.external_latency_ms / 1000)
+        return {"scheduling_url": SCHEDULING_URL, "name": "New Patient"}
+
+    app_main.get_async_calendly_service().get_event_type_from_uri = fake_event_type
+
+    # Redeliveries arrive in random order; a cancellation is first sent right after its booking,
+    # so both usually sit in the inbox together
+    rng = random.Random(args.seed)
+    deliveries, canceled_bookings = [], set()
+    for booking in rng.sample(range(args.bookings), args.bookings):
+        deliveries.append(make_delivery("invitee.created", booking))
+        if rng.random() < args.cancel_ratio:
+            canceled_bookings.add(booking)
+            deliveries.append(make_delivery("invitee.canceled", booking))
+    for body in list(deliveries):
+        for _ in range(args.redeliveries - 1):
+            deliveries.insert(rng.randrange(deliveries.index(body) + 1, len(deliveries) + 1), body)
+
+    async def drain():
+        while await app_main.webhook_inbox.process_next():
+            pass
+
+    statuses = Counter()
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        started = time.perf_counter()
+        for rounds in range(args.rounds):
+            for body in deliveries:
+                response = await client.post("/api/webhooks/calendly", content=body,
+                                             headers={"calendly-webhook-signature": sign(body)})
+                statuses[response.json().get("status") if response.status_code == 200 else response.status_code] += 1
+            await asyncio.gather(*(drain() for _ in range(args.workers)))
+        elapsed = time.perf_counter() - started
+
+    from app.database.database import AsyncSessionLocal, SessionLocal
+    from app.database.models import Appointment, EmailOutbox
+    db = SessionLocal()
+    try:
+        appointments = db.query(Appointment).count()
+        scheduled = {int(uri.rsplit("-", 1)[1]) for (uri,) in db.query(Appointment.calendly_invitee_uri).filter(
+            Appointment.status == 'scheduled'
+        )}
+        emails = db.query(EmailOutbox).count()
+    finally:
+        db.close()
+    async with AsyncSessionLocal() as adb:
+        inbox = await app_main.webhook_inbox.stats(adb)
+
+    total = len(deliveries) * args.rounds
+    print(f"deliveries:        {total} ({args.bookings} bookings x {args.redeliveries} redeliveries x {args.rounds} rounds)")
+    print(f"elapsed:           {elapsed:.2f}s ({total / elapsed:.0f} deliveries/s incl. processing)")
+    print(f"responses:         {dict(statuses)}")
+    print(f"inbox events:      {inbox}")
+    print(f"appointments:      {appointments}")
+    print(f"calendly lookups:  {external['calendly_lookups']}")
+    print(f"emails queued:     {emails}")
+    print(f"ledger:            {app_main.webhook_ledger.stats()}")
+    still_scheduled = scheduled & canceled_bookings
+    print(f"canceled bookings: {len(canceled_bookings)} ({len(still_scheduled)} left scheduled)")
+    if still_scheduled or appointments != args.bookings:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, default=200)
+    parser.add_argument("--redeliveries", type=int, default=4, help="copies of every delivery")
+    parser.add_argument("--rounds", type=int, default=2, help="replay the whole stream this many times")
+    parser.add_argument("--cancel-ratio", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=2, help="concurrent inbox workers, like WEBHOOK_WORKERS")
+    parser.add_argument("--external-latency-ms", type=float, default=50,
+                        help="simulated latency of the Calendly lookup")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    configure_environment()
+    asyncio.run(main(args))
@@ -2,6 +2,7 @@ import streamlit as st
 import requests
 import datetime
 import uuid
+import json
 import pandas as pd
 
 st.set_page_config(page_title="MediCare Wellness Center", layout="wide")
@@ -499,14 +500,6 @@ def admin_page():
         return
     
     try:
-        # Get appointments data
-        appointments_response = requests.get(f"{API_BASE_URL}/admin/appointments")
-        if appointments_response.status_code != 200:
-            st.error("Failed to fetch appointments data")
-            return
-            
-        appointments_data = appointments_response.json()
-        
         # Get doctor statistics
         stats_response = requests.get(f"{API_BASE_URL}/admin/doctor-stats")
         if stats_response.status_code != 200:
@@ -525,12 +518,12 @@ def admin_page():
             total_appointments = sum(stat['appointment_count'] for stat in doctor_stats)
             st.metric("Total Appointments", total_appointments)
         with col3:
-            active_appointments = sum(1 for apt in appointments_data if apt['status'] == 'scheduled')
+            active_appointments = sum(stat['scheduled_count'] for stat in doctor_stats)
             st.metric("Active Appointments", active_appointments)
         
         st.subheader("👨‍⚕️ Doctor Appointment Summary")
         if doctor_stats:
-            df_stats = pd.DataFrame(doctor_stats)
+            df_stats = pd.DataFrame(doctor_stats).drop(columns=['doctor_id'], errors='ignore')
             df_stats = df_stats.rename(columns={
                 'doctor_name': 'Doctor Name',
                 'specialization': 'Specialization',
@@ -543,6 +536,52 @@ def admin_page():
         # Detailed Appointments View
         st.subheader("📅 All Appointments")
         
+        # Filters, applied by the backend
+        doctor_ids = {stat['doctor_name']: stat['doctor_id'] for stat in doctor_stats}
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            status_filter = st.selectbox("Filter by Status", ["All", "scheduled", "canceled"])
+        with col2:
+            doctor_filter = st.selectbox("Filter by Doctor", ["All"] + list(doctor_ids))
+        with col3:
+            date_filter = st.date_input("Filter by Date Range", value=())
+        with col4:
+            email_filter = st.text_input("Filter by Patient Email")
+        page_size = st.selectbox("Appointments per page", [25, 50, 100, 250], index=1)
+        
+        filters = {"limit": page_size}
+        if status_filter != "All":
+            filters["status"] = status_filter
+        if doctor_filter != "All":
+            filters["doctor_id"] = doctor_ids[doctor_filter]
+        if date_filter:
+            filters["date_from"] = date_filter[0].isoformat()
+            filters["date_to"] = date_filter[-1].isoformat()
+        if email_filter.strip():
+            filters["patient_email"] = email_filter.strip()
+        
+        # Pages are fetched one at a time; the cursors of the pages seen so far allow going back
+        if st.session_state.get("admin_filters") != filters:
+            st.session_state.admin_filters = filters
+            st.session_state.admin_cursors = [None]
+            st.session_state.admin_total = None
+        cursors = st.session_state.admin_cursors
+        
+        params = dict(filters)
+        if cursors[-1]:
+            params["cursor"] = cursors[-1]
+        else:
+            params["include_total"] = True
+        appointments_response = requests.get(f"{API_BASE_URL}/admin/appointments", params=params)
+        if appointments_response.status_code != 200:
+            st.error("Failed to fetch appointments data")
+            return
+        
+        page = appointments_response.json()
+        if page.get("total") is not None:
+            st.session_state.admin_total = page["total"]
+        appointments_data = page["appointments"]
+        
         if appointments_data:
             df_appointments = pd.DataFrame(appointments_data)
             
@@ -566,35 +605,25 @@ def admin_page():
             available_columns = {k: v for k, v in display_columns.items() if k in df_appointments.columns}
             df_display = df_appointments[list(available_columns.keys())].rename(columns=available_columns)
             
-            # Filters
-            col1, col2, col3 = st.columns(3)
+            # Display the current page
+            first = (len(cursors) - 1) * page_size + 1
+            total = st.session_state.admin_total
+            st.caption(f"Showing {first}–{first + len(df_display) - 1}" + (f" of {total}" if total is not None else ""))
+            st.dataframe(df_display, use_container_width=True)
+            
+            col1, col2 = st.columns(2)
             with col1:
-                status_filter = st.selectbox("Filter by Status", ["All"] + df_appointments['status'].unique().tolist())
+                if len(cursors) > 1 and st.button("⬅️ Previous page"):
+                    cursors.pop()
+                    st.rerun()
             with col2:
-                doctor_filter = st.selectbox("Filter by Doctor", ["All"] + df_appointments['doctor_name'].unique().tolist())
-            with col3:
-                date_filter = st.date_input("Filter by Date", value=None)
-            
-            # Apply filters
-            filtered_df = df_display.copy()
-            
-            if status_filter != "All":
-                filtered_df = filtered_df[df_appointments['status'] == status_filter]
-            
-            if doctor_filter != "All":
-                filtered_df = filtered_df[df_appointments['doctor_name'] == doctor_filter]
-            
-            if date_filter:
-                date_str = date_filter.strftime('%Y-%m-%d')
-                mask = df_appointments['appointment_time'].str.contains(date_str, na=False)
-                filtered_df = filtered_df[mask]
-            
-            # Display filtered results
-            st.dataframe(filtered_df, use_container_width=True)
+                if page.get("next_cursor") and st.button("Next page ➡️"):
+                    cursors.append(page["next_cursor"])
+                    st.rerun()
             
             # Export functionality
-            if st.button("📥 Export to CSV"):
-                csv = filtered_df.to_csv(index=False)
+            if st.button("📥 Export page to CSV"):
+                csv = df_display.to_csv(index=False)
                 st.download_button(
                     label="Download CSV",
                     data=csv,
@@ -618,6 +647,29 @@ def admin_page():
         navigate_to("home")
         st.rerun()
 
+def stream_chat_reply(payload, message_placeholder):
+    """Render /chat/stream tokens as they arrive; returns the full reply, or None on error"""
+    with requests.post(f"{API_BASE_URL}/chat/stream", json=payload, stream=True) as response:
+        if response.status_code != 200:
+            return None
+        
+        reply = ""
+        event = "message"
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                event = "message"
+                continue
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                if event == "error":
+                    return None
+                if event == "done":
+                    break
+                reply += json.loads(line[len("data:"):].strip()).get("token", "")
+                message_placeholder.markdown(reply + "▌")
+        return reply
+
 def chat_page():
     st.title("💬 AI Assistant")
     st.write("Ask me questions about our services or doctors.")
@@ -633,27 +685,25 @@ def chat_page():
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        # Get assistant response
+        # Stream assistant response
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
-            with st.spinner("Thinking..."):
-                try:
-                    payload = {
-                        "session_id": st.session_state.chat_session_id,
-                        "query": prompt
-                    }
-                    response = requests.post(f"{API_BASE_URL}/chat", json=payload)
-                    
-                    if response.status_code == 200:
-                        assistant_response = response.json()["response"]
-                        message_placeholder.markdown(assistant_response)
-                        st.session_state.messages.append({"role": "assistant", "content": assistant_response})
-                    else:
-                        error_message = "I'm having trouble connecting. Please try again later."
-                        message_placeholder.markdown(error_message)
-                        st.session_state.messages.append({"role": "assistant", "content": error_message})
-                except requests.exceptions.ConnectionError:
-                    st.error("Connection Error: Could not connect to the AI assistant.")
+            try:
+                payload = {
+                    "session_id": st.session_state.chat_session_id,
+                    "query": prompt
+                }
+                assistant_response = stream_chat_reply(payload, message_placeholder)
+                
+                if assistant_response is not None:
+                    message_placeholder.markdown(assistant_response)
+                    st.session_state.messages.append({"role": "assistant", "content": assistant_response})
+                else:
+                    error_message = "I'm having trouble connecting. Please try again later."
+                    message_placeholder.markdown(error_message)
+                    st.session_state.messages.append({"role": "assistant", "content": error_message})
+            except requests.exceptions.ConnectionError:
+                st.error("Connection Error: Could not connect to the AI assistant.")
 
     if st.button("⬅️ Go Back to Home"):
         navigate_to("home")